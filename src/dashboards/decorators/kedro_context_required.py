@@ -1,9 +1,9 @@
+from copy import deepcopy
 from functools import wraps
 
 import streamlit as st
-from kedro.config import ConfigLoader  # noqa: I201,I100
-from kedro.framework.context import KedroContext
-from kedro.framework.hooks import _create_hook_manager
+
+from dashboards.kedro_wrapper.context import load_shared_context, session_catalog
 
 
 def kedro_context_required(
@@ -17,15 +17,11 @@ def kedro_context_required(
         @wraps(page_handler)
         def wrapper(*args, **kwargs):
             if "catalog" not in st.session_state:
-                config_loader = ConfigLoader(conf_source=project_conf_dir)
-                context = KedroContext(
-                    package_name=package_name,
-                    project_path=project_dir,
-                    config_loader=config_loader,
-                    hook_manager=_create_hook_manager(),
+                shared = load_shared_context(
+                    project_dir, project_conf_dir, package_name
                 )
-                st.session_state["catalog"] = context.catalog
-                st.session_state["parameters"] = context.params
+                st.session_state["catalog"] = session_catalog(shared["catalog"])
+                st.session_state["parameters"] = deepcopy(shared["parameters"])
             return page_handler(*args, **kwargs)
 
         return wrapper
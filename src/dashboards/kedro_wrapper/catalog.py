@@ -5,9 +5,10 @@ import typing as tp
 
 import pandas as pd  # noqa: I201
 import streamlit as st  # noqa: I201
-from kedro.io import DataSetError
+from kedro.io import DataSetError, PartitionedDataSet
 
 from dashboards.kedro_wrapper import context
+from dashboards.kedro_wrapper.partitions import get_partition_index
 
 logger = logging.getLogger(__name__)
 
@@ -46,13 +47,25 @@ def load(
 
 def list_partition(
     dataset: str,
+    prefix: str | None = None,
+    offset: int = 0,
+    limit: int | None = None,
 ) -> list:
+    """Sorted partition names starting with `prefix`, `limit` of them from `offset`.
+    Listings of partitioned data sets are cached, see `partitions.PartitionIndex`."""
     logging.info(f"Listing partitions: `{dataset}`")
+    data_set = st.session_state["kedro"]["catalog"]._get_dataset(dataset)
+    if isinstance(data_set, PartitionedDataSet):
+        return get_partition_index().list(data_set, prefix, offset, limit)
     files = load_full_partition(dataset)
     if files is None:
         return []
     else:
-        return list(files.keys())
+        partitions = sorted(
+            key for key in files.keys() if prefix is None or key.startswith(prefix)
+        )
+        end = None if limit is None else offset + limit
+        return partitions[offset:end]
 
 
 def save(
@@ -67,5 +80,8 @@ def save(
         data = {key: data}
     data = catalog.save(dataset, data)
     logger.info(f"Saved data: `{dataset}` with key `{key}`")
+    data_set = catalog._get_dataset(dataset)
+    if key is not None and isinstance(data_set, PartitionedDataSet):
+        get_partition_index().add(data_set, key)
     if reload_catalog:
-        context.reload_catalog()
+        context.reload_catalog(datasets=[dataset])
@@ -1,16 +1,30 @@
 import logging
 import os
 import sys
+import threading
+import typing as tp
+from copy import deepcopy
 from functools import wraps
 
 import streamlit as st  # noqa: I201
-from kedro.config import ConfigLoader  # noqa: I201,I100
+from kedro.config import ConfigLoader, MissingConfigException  # noqa: I201,I100
 from kedro.framework.context import KedroContext
 from kedro.framework.hooks import _create_hook_manager
 from kedro.framework.startup import bootstrap_project
+from kedro.io import AbstractDataSet, DataCatalog, MemoryDataSet
+
+from dashboards.kedro_wrapper.watcher import (
+    affected_datasets,
+    get_catalog_watcher,
+    release_datasets,
+)
 
 logger = logging.getLogger(__name__)
 
+CONTEXT_CACHE_TTL_SECONDS = 600
+CONTEXT_CACHE_MAX_ENTRIES = 8
+CONFIG_FILE_SUFFIXES = (".yml", ".yaml", ".json")
+
 
 def get_project_dir() -> str:
     return st.session_state["kedro"]["config"]["project_dir"]
@@ -64,22 +78,219 @@ def load_context():
     return context
 
 
+def config_fingerprint(project_conf_dir: str) -> tuple:
+    """Paths and modification times of all configuration files, so cached contexts
+    are rebuilt as soon as any of them changes."""
+    files = []
+    for root, _, filenames in os.walk(project_conf_dir):
+        for filename in filenames:
+            if filename.endswith(CONFIG_FILE_SUFFIXES):
+                path = os.path.join(root, filename)
+                files.append((path, os.stat(path).st_mtime_ns))
+    return tuple(sorted(files))
+
+
+@st.cache_resource(
+    ttl=CONTEXT_CACHE_TTL_SECONDS,
+    max_entries=CONTEXT_CACHE_MAX_ENTRIES,
+    show_spinner=False,
+)
+def _load_shared_context(
+    project_dir: str,
+    project_conf_dir: str,
+    package_name: str,
+    env: str | None,
+    fingerprint: tuple,
+) -> dict[str, tp.Any]:
+    logger.info(f"Building shared Kedro context for {project_conf_dir}")
+    config_loader = ConfigLoader(conf_source=project_conf_dir, env=env)
+    context = KedroContext(
+        package_name=package_name,
+        project_path=project_dir,
+        config_loader=config_loader,
+        hook_manager=_create_hook_manager(),
+        env=env,
+    )
+    try:
+        catalog_config = config_loader["catalog"]
+    except MissingConfigException:
+        catalog_config = {}
+    return {
+        "catalog": context.catalog,
+        "parameters": context.params,
+        "catalog_config": catalog_config,
+        "fingerprint": fingerprint,
+        "catalog_sequence": get_catalog_watcher().changes.sequence,
+        "lock": threading.Lock(),
+    }
+
+
+def load_shared_context(
+    project_dir: str,
+    project_conf_dir: str,
+    package_name: str,
+    env: str | None = None,
+) -> dict[str, tp.Any]:
+    """Catalog and parameters shared by all sessions of the app process, parsed once
+    per configuration version. Never modify them, use `session_catalog` and a copy of
+    the parameters instead."""
+    return _load_shared_context(
+        project_dir,
+        project_conf_dir,
+        package_name,
+        env,
+        config_fingerprint(project_conf_dir),
+    )
+
+
+def _session_data_set(data_set: AbstractDataSet) -> AbstractDataSet:
+    if isinstance(data_set, MemoryDataSet) and not data_set.exists():
+        return MemoryDataSet(copy_mode=data_set._copy_mode)
+    return data_set
+
+
+def _replace_data_set(catalog: DataCatalog, name: str, data_set: AbstractDataSet):
+    # removed first, `DataCatalog.add` warns about every replaced entry
+    catalog._data_sets.pop(name, None)
+    catalog.add(name, data_set)
+
+
+def session_catalog(catalog: DataCatalog) -> DataCatalog:
+    """Per-session copy of a shared catalog. Data sets are shared, except empty
+    `MemoryDataSet`s which are replaced so sessions never see each other's data.
+    Shared data sets are never released here, see `_sync_shared_catalog`."""
+    catalog = catalog.shallow_copy()
+    for name, data_set in list(catalog._data_sets.items()):
+        session_data_set = _session_data_set(data_set)
+        if session_data_set is not data_set:
+            _replace_data_set(catalog, name, session_data_set)
+    return catalog
+
+
+def _load_session_context() -> dict[str, tp.Any]:
+    return load_shared_context(
+        get_project_dir(), get_project_conf_dir(), get_package_name()
+    )
+
+
+def _sync_shared_catalog(shared: dict[str, tp.Any]) -> int:
+    """Release the shared data sets whose files changed since they were last synced,
+    as `refresh_catalog` does, and return the change sequence they are synced to.
+    Data sets of unchanged files keep their cached listings for all sessions."""
+    watcher = get_catalog_watcher()
+    with shared["lock"]:
+        sequence, paths = watcher.changes.changes_since(shared["catalog_sequence"])
+        if paths is None:
+            names = set(shared["catalog"]._data_sets)
+        else:
+            names = affected_datasets(shared["catalog"], paths)
+        release_datasets(shared["catalog"], names)
+        shared["catalog_sequence"] = sequence
+    return sequence
+
+
+def _set_session_catalog(shared: dict[str, tp.Any]):
+    watcher = get_catalog_watcher()
+    st.session_state["kedro"]["catalog_sequence"] = _sync_shared_catalog(shared)
+    st.session_state["kedro"]["catalog"] = session_catalog(shared["catalog"])
+    st.session_state["kedro"]["catalog_config"] = shared["catalog_config"]
+    st.session_state["kedro"]["catalog_parameters"] = shared["parameters"]
+    st.session_state["kedro"]["catalog_fingerprint"] = shared["fingerprint"]
+    watcher.watch_catalog(st.session_state["kedro"]["catalog"])
+
+
+def _parameter_entries(parameters: dict[str, tp.Any]) -> dict[str, tp.Any]:
+    """Catalog entries Kedro derives from `parameters`: `parameters` itself and
+    `params:<key>` for every key, nested keys joined with dots."""
+    entries = {"parameters": parameters}
+
+    def _add_entries(name: str, value: tp.Any):
+        entries[f"params:{name}"] = value
+        if isinstance(value, dict):
+            for key, nested_value in value.items():
+                _add_entries(f"{name}.{key}", nested_value)
+
+    for key, value in parameters.items():
+        _add_entries(key, value)
+    return entries
+
+
+def _changed_entries(previous: dict[str, tp.Any], current: dict[str, tp.Any]) -> set:
+    """Names whose value differs between two mappings, added and removed ones included."""
+    missing = object()
+    return {
+        name
+        for name in previous.keys() | current.keys()
+        if previous.get(name, missing) != current.get(name, missing)
+    }
+
+
+def _refresh_changed_config(shared: dict[str, tp.Any]) -> bool:
+    """Swap in the catalog entries whose configuration or parameters changed. Returns
+    False when a full reload is needed instead, i.e. when credentials changed."""
+    kedro = st.session_state["kedro"]
+    changed_files = set(kedro["catalog_fingerprint"]) ^ set(shared["fingerprint"])
+    if any("credentials" in os.path.basename(path) for path, _ in changed_files):
+        return False
+    catalog = kedro["catalog"]
+    changed = _changed_entries(kedro["catalog_config"], shared["catalog_config"])
+    changed |= _changed_entries(
+        _parameter_entries(kedro["catalog_parameters"]),
+        _parameter_entries(shared["parameters"]),
+    )
+    logger.info(f"Catalog entries changed in configuration: {sorted(changed)}")
+    for name in changed:
+        data_set = shared["catalog"]._data_sets.get(name)
+        if data_set is None:
+            catalog._data_sets.pop(name, None)
+        else:
+            _replace_data_set(catalog, name, _session_data_set(data_set))
+    kedro["catalog_config"] = shared["catalog_config"]
+    kedro["catalog_parameters"] = shared["parameters"]
+    kedro["catalog_fingerprint"] = shared["fingerprint"]
+    return True
+
+
+def refresh_catalog(datasets: list[str] | None = None):
+    """Refresh only the catalog entries whose configuration, files or partitions
+    changed, plus `datasets`, e.g. the ones just saved. Data held in memory by other
+    entries is kept."""
+    kedro = st.session_state["kedro"]
+    shared = _load_session_context()
+    if shared["fingerprint"] != kedro["catalog_fingerprint"]:
+        if not _refresh_changed_config(shared):
+            _set_session_catalog(shared)
+            return
+    catalog = kedro["catalog"]
+    watcher = get_catalog_watcher()
+    sequence, paths = watcher.changes.changes_since(kedro["catalog_sequence"])
+    names = set(datasets or [])
+    if paths is None:
+        names |= set(catalog._data_sets)
+    else:
+        names |= affected_datasets(catalog, paths)
+    release_datasets(catalog, names)
+    watcher.watch_catalog(catalog)
+    kedro["catalog_sequence"] = sequence
+
+
 def initiate_context():
-    context = load_context()
     if "catalog" in st.session_state["kedro"]:
         logger.info("Kedro catalog already initiated.")
     else:
         st.session_state["kedro"][
             "catalog_counter"
         ] = 0  # useful to force update cashed functions
-        st.session_state["kedro"]["catalog"] = context.catalog
+        _set_session_catalog(_load_session_context())
     if "parameters" in st.session_state["kedro"]:
         logger.info("Kedro parameters already initiated")
     else:
         st.session_state["kedro"][
             "parameters_counter"
         ] = 0  # useful to force update cashed functions
-        st.session_state["kedro"]["parameters"] = context.params
+        st.session_state["kedro"]["parameters"] = deepcopy(
+            _load_session_context()["parameters"]
+        )
 
 
 def start_kedro_session(project_dir: str | None = None):
@@ -94,22 +305,27 @@ def reload_parameters():
         st.session_state["kedro"][
             "parameters_counter"
         ] += 1  # useful to force update cashed functions
-    context = load_context()
-    st.session_state["kedro"]["parameters"] = context.params
+    st.session_state["kedro"]["parameters"] = deepcopy(
+        _load_session_context()["parameters"]
+    )
 
 
-def reload_catalog():
-    logger.info("Reloading Kedro parameters")
+def reload_catalog(datasets: list[str] | None = None, full: bool = False):
+    """Refresh the catalog entries affected by configuration, file and partition
+    changes and `datasets`, or rebuild the whole session catalog when `full`."""
+    logger.info("Reloading Kedro catalog")
     if "catalog" in st.session_state["kedro"]:
-        logger.warning("Kedro catalog already initiated and will be overwritten")
         st.session_state["kedro"][
             "catalog_counter"
         ] += 1  # useful to force update cashed functions
-    context = load_context()
-    st.session_state["kedro"]["catalog"] = context.catalog
+    if full or "catalog_fingerprint" not in st.session_state["kedro"]:
+        logger.warning("Kedro catalog will be overwritten")
+        _set_session_catalog(_load_session_context())
+    else:
+        refresh_catalog(datasets)
 
 
 def reload_context():
     logger.info("Reloading Kedro context")
     reload_parameters()
-    reload_catalog()
+    reload_catalog(full=True)
@@ -0,0 +1,74 @@
+"""Background pipeline jobs shared by all sessions of the app. Sessions remember their job ids by name, so pages attach to running jobs again after a rerun instead of starting them twice."""
+
+import logging
+import typing as tp
+
+import streamlit as st  # noqa: I201
+
+from shared.jobs import Job, JobManager
+from shared.memoise import PipelineResultCache
+
+logger = logging.getLogger(__name__)
+
+JOB_POLL_SECONDS = 1.0
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_manager() -> JobManager:
+    return JobManager()
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache() -> PipelineResultCache:
+    """Outputs of earlier runs, for pipelines submitted with `cache=` only, see
+    `runner.execute_pipeline`."""
+    return PipelineResultCache()
+
+
+def attach_job(name: str) -> Job | None:
+    """The job last submitted under `name` by this session, if still known."""
+    job_id = st.session_state.setdefault("jobs", {}).get(name)
+    if job_id is None:
+        return None
+    return get_job_manager().get(job_id)
+
+
+def submit_job(
+    name: str,
+    package_name: str,
+    project_path: str,
+    pipeline_name: str,
+    extra_params: dict[str, tp.Any] | None = None,
+    inputs: dict[str, tp.Any] | None = None,
+    cache: PipelineResultCache | None = None,
+) -> Job:
+    """Submit a pipeline run under `name`, unless this session still runs one."""
+    job = attach_job(name)
+    if job is not None and not job.is_finished:
+        logger.info(f"Job `{name}` is still running, attaching to {job.job_id}")
+        return job
+    job = get_job_manager().submit(
+        package_name, project_path, pipeline_name, extra_params, inputs, cache
+    )
+    st.session_state["jobs"][name] = job.job_id
+    return job
+
+
+def show_progress(job: Job, cache: PipelineResultCache | None = None):
+    """Progress bar and node timings of a job, and the stats of its result cache."""
+    st.progress(job.progress)
+    st.caption(f"`{job.pipeline_name}`: {job.status}, {job.elapsed:.1f}s")
+    if cache is not None:
+        stats = cache.stats()
+        st.caption(f"Result cache: {stats['hits']} hits, {stats['misses']} misses")
+    st.dataframe(job.node_table())
+    if job.status == "failed":
+        st.error(f"Pipeline failed: {job.error}")
+
+
+def poll_job(job: Job, interval: float = JOB_POLL_SECONDS):
+    """Rerun the page once the job finishes, or after `interval` seconds while it is
+    still running."""
+    if not job.is_finished:
+        job.wait(timeout=interval)
+        st.experimental_rerun()
@@ -0,0 +1,141 @@
+"""Cached partition listings of `PartitionedDataSet`s. Local listings are validated against the modification times of the partition folders, remote ones (e.g. S3 prefixes) are re-listed after `PARTITION_INDEX_TTL_SECONDS`. Partitions saved through the app are added without listing again."""
+
+import bisect
+import logging
+import os
+import threading
+import time
+import typing as tp
+
+import streamlit as st  # noqa: I201
+from kedro.io import PartitionedDataSet
+
+logger = logging.getLogger(__name__)
+
+PARTITION_INDEX_TTL_SECONDS = 30
+
+
+class PartitionListing:
+    """Sorted partition names of a data set, with the folder modification times they
+    were listed at (local data sets only)."""
+
+    partitions: list[str]
+    folder_mtimes: dict[str, int] | None
+    listed_at: float
+
+    def __init__(self, partitions: list[str], folder_mtimes: dict[str, int] | None):
+        self.partitions = sorted(partitions)
+        self.folder_mtimes = folder_mtimes
+        self.listed_at = time.monotonic()
+
+
+def _folder_mtimes(folders: tp.Iterable[str]) -> dict[str, int]:
+    mtimes = {}
+    for folder in folders:
+        try:
+            mtimes[folder] = os.stat(folder).st_mtime_ns
+        except FileNotFoundError:
+            mtimes[folder] = None
+    return mtimes
+
+
+def _partition_folders(root: str, paths: tp.Iterable[str]) -> set[str]:
+    """The root folder and every folder between it and the partitions, a partition
+    added or removed anywhere below the root changes one of their mtimes."""
+    root = os.path.abspath(root)
+    folders = {root}
+    for path in paths:
+        folder = os.path.dirname(os.path.abspath(path))
+        while folder.startswith(root + os.sep) and folder not in folders:
+            folders.add(folder)
+            folder = os.path.dirname(folder)
+    return folders
+
+
+class PartitionIndex:
+    """Process-wide cache of partition listings, keyed by data set location."""
+
+    def __init__(self, ttl: float = PARTITION_INDEX_TTL_SECONDS):
+        self._ttl = ttl
+        self._listings: dict[tuple[str, str], PartitionListing] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(data_set: PartitionedDataSet) -> tuple[str, str]:
+        return data_set._protocol, data_set._normalized_path
+
+    @staticmethod
+    def _is_local(data_set: PartitionedDataSet) -> bool:
+        return data_set._protocol == "file"
+
+    def _scan(self, data_set: PartitionedDataSet) -> PartitionListing:
+        logger.info(f"Listing partitions: `{data_set._path}`")
+        paths = [
+            path
+            for path in data_set._filesystem.find(
+                data_set._normalized_path, **data_set._load_args
+            )
+            if path.endswith(data_set._filename_suffix)
+        ]
+        folder_mtimes = None
+        if self._is_local(data_set):
+            folder_mtimes = _folder_mtimes(
+                _partition_folders(data_set._normalized_path, paths)
+            )
+        return PartitionListing(
+            [data_set._path_to_partition(path) for path in paths], folder_mtimes
+        )
+
+    def _is_valid(self, listing: PartitionListing) -> bool:
+        if listing.folder_mtimes is None:
+            return time.monotonic() - listing.listed_at < self._ttl
+        return _folder_mtimes(listing.folder_mtimes) == listing.folder_mtimes
+
+    def partitions(self, data_set: PartitionedDataSet) -> list[str]:
+        """All partition names, sorted, listed again only when the folders changed."""
+        key = self._key(data_set)
+        with self._lock:
+            listing = self._listings.get(key)
+        if listing is None or not self._is_valid(listing):
+            listing = self._scan(data_set)
+            with self._lock:
+                self._listings[key] = listing
+        return listing.partitions
+
+    def add(self, data_set: PartitionedDataSet, partition: str):
+        """Record a partition just saved, without listing the data set again."""
+        key = self._key(data_set)
+        with self._lock:
+            listing = self._listings.get(key)
+            if listing is None:
+                return
+            partitions = set(listing.partitions) | {partition}
+            folder_mtimes = None
+            if listing.folder_mtimes is not None:
+                path = data_set._partition_to_path(partition)
+                folders = _partition_folders(data_set._normalized_path, [path])
+                folder_mtimes = _folder_mtimes(folders | set(listing.folder_mtimes))
+            self._listings[key] = PartitionListing(list(partitions), folder_mtimes)
+
+    def list(
+        self,
+        data_set: PartitionedDataSet,
+        prefix: str | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> list[str]:
+        """Sorted partition names starting with `prefix`, `limit` of them from `offset`."""
+        partitions = self.partitions(data_set)
+        start, end = 0, len(partitions)
+        if prefix:
+            start = bisect.bisect_left(partitions, prefix)
+            end = bisect.bisect_left(partitions, prefix + "\U0010ffff", lo=start)
+        start = min(start + offset, end)
+        if limit is not None:
+            end = min(start + limit, end)
+        return partitions[start:end]
+
+
+@st.cache_resource(show_spinner=False)
+def get_partition_index() -> PartitionIndex:
+    return PartitionIndex()
@@ -3,9 +3,10 @@ import typing as tp
 from copy import deepcopy
 
 import streamlit as st
+from kedro.framework.project import pipelines as kedro_pipelines
 from kedro.framework.session import KedroSession
 
-from dashboards.kedro_wrapper import catalog, context
+from dashboards.kedro_wrapper import catalog, context, jobs
 from dashboards.kedro_wrapper.params import load, load_all, save
 
 logger = logging.getLogger(__name__)
@@ -51,6 +52,7 @@ class PipelineSession:
         self.key = key
         self.pipeline_name = pipeline_name
         self.parameters_path = "parameters__" + pipeline_name
+        self._collected = set()
         if reload is True or self.parameters_path not in st.session_state["kedro"]:
             st.session_state["kedro"][self.parameters_path] = deepcopy(load_all())
 
@@ -96,11 +98,48 @@ class PipelineSession:
         extra_params = self.params()
         catalog.save(self.parameters_path, extra_params, key, reload_catalog=False)
         execute_pipeline(extra_params, self.pipeline_name)
-        context.reload_catalog()
+        outputs = kedro_pipelines[self.pipeline_name].all_outputs()
+        context.reload_catalog(datasets=sorted(outputs))
 
-    def list_param_files(self):
-        """List available parameter files"""
-        return catalog.list_partition(self.parameters_path)
+    def submit(self, key: str | None = None) -> jobs.Job:
+        """Run pipeline in the background, see `collect` for its results"""
+        if key is None:
+            key = self.key
+        extra_params = self.params()
+        catalog.save(self.parameters_path, extra_params, key, reload_catalog=False)
+        return jobs.submit_job(
+            self.pipeline_name,
+            context.get_package_name(),
+            context.get_project_dir(),
+            self.pipeline_name,
+            extra_params,
+        )
+
+    def job(self) -> jobs.Job | None:
+        """Background run of this pipeline in the current session, if any"""
+        return jobs.attach_job(self.pipeline_name)
+
+    def collect(self) -> jobs.Job | None:
+        """Deliver the results of a finished background run into the session catalog:
+        free outputs as memory data sets, persisted outputs refreshed"""
+        job = self.job()
+        if job is None or job.status != "done" or job.job_id in self._collected:
+            return job
+        session_catalog = st.session_state["kedro"]["catalog"]
+        session_catalog.add_feed_dict(job.result, replace=True)
+        outputs = kedro_pipelines[self.pipeline_name].all_outputs()
+        context.reload_catalog(datasets=sorted(outputs - set(job.result)))
+        self._collected.add(job.job_id)
+        return job
+
+    def list_param_files(
+        self,
+        prefix: str | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ):
+        """List available parameter files, `limit` of those starting with `prefix` from `offset`"""
+        return catalog.list_partition(self.parameters_path, prefix, offset, limit)
 
 
 def initiate_pipeline(
@@ -0,0 +1,121 @@
+"""Watch data folders of the catalog, so a reload only refreshes the data sets whose files or partitions changed instead of rebuilding the whole catalog."""
+
+import logging
+import os
+import threading
+import typing as tp
+from collections import deque
+
+import streamlit as st  # noqa: I201
+from kedro.io import AbstractDataSet, DataCatalog, MemoryDataSet
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+logger = logging.getLogger(__name__)
+
+WATCHER_MAX_CHANGES = 10000
+
+
+class ChangeLog(FileSystemEventHandler):
+    """Sequence-numbered log of changed paths, read by every session from the last
+    sequence number it has seen."""
+
+    def __init__(self, max_changes: int = WATCHER_MAX_CHANGES):
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._changes = deque(maxlen=max_changes)
+
+    def on_any_event(self, event: FileSystemEvent):
+        if event.is_directory and event.event_type == "modified":
+            return
+        self.mark(event.src_path)
+        if getattr(event, "dest_path", None):
+            self.mark(event.dest_path)
+
+    def mark(self, path: str):
+        with self._lock:
+            self._sequence += 1
+            self._changes.append((self._sequence, os.path.abspath(path)))
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    def changes_since(self, sequence: int) -> tuple[int, set[str] | None]:
+        """Latest sequence number and paths changed after `sequence`, None when older
+        changes were already dropped from the log."""
+        with self._lock:
+            if self._changes and self._changes[0][0] > sequence + 1:
+                return self._sequence, None
+            paths = {path for number, path in self._changes if number > sequence}
+            return self._sequence, paths
+
+
+class CatalogWatcher:
+    """Process-wide watchdog observer of local data folders."""
+
+    def __init__(self):
+        self.changes = ChangeLog()
+        self._watched = set()
+        self._lock = threading.Lock()
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.start()
+
+    def watch(self, directory: str, recursive: bool = True):
+        directory = os.path.abspath(directory)
+        with self._lock:
+            if directory in self._watched or not os.path.isdir(directory):
+                return
+            self._observer.schedule(self.changes, directory, recursive=recursive)
+            self._watched.add(directory)
+        logger.info(f"Watching {directory} for catalog changes")
+
+    def watch_catalog(self, catalog: DataCatalog):
+        """Watch partition folders and the folders of file data sets, folders created
+        since the last call included."""
+        for data_set in catalog._data_sets.values():
+            path = dataset_path(data_set)
+            if path is None:
+                continue
+            if os.path.isdir(path):
+                self.watch(path)
+            else:
+                self.watch(os.path.dirname(path), recursive=False)
+
+
+@st.cache_resource(show_spinner=False)
+def get_catalog_watcher() -> CatalogWatcher:
+    return CatalogWatcher()
+
+
+def dataset_path(data_set: AbstractDataSet) -> str | None:
+    """Absolute local path of a file or partitioned data set, None otherwise."""
+    path = getattr(data_set, "_path", None) or getattr(data_set, "_filepath", None)
+    protocol = getattr(data_set, "_protocol", "file")
+    if path is None or protocol not in ("file", None):
+        return None
+    return os.path.abspath(str(path))
+
+
+def affected_datasets(catalog: DataCatalog, paths: tp.Iterable[str]) -> set[str]:
+    """Names of the data sets whose file or folder holds any of `paths`."""
+    paths = list(paths)
+    affected = set()
+    for name, data_set in catalog._data_sets.items():
+        root = dataset_path(data_set)
+        if root is None:
+            continue
+        if any(path == root or path.startswith(root + os.sep) for path in paths):
+            affected.add(name)
+    return affected
+
+
+def release_datasets(catalog: DataCatalog, names: tp.Iterable[str]):
+    """Drop cached listings and versions of the given data sets, keeping the data
+    held by `MemoryDataSet`s."""
+    for name in names:
+        data_set = catalog._data_sets.get(name)
+        if data_set is not None and not isinstance(data_set, MemoryDataSet):
+            logger.info(f"Refreshing catalog entry `{name}`")
+            data_set.release()
@@ -12,8 +12,8 @@ bootstrap_project(PROJECT_DIR)
 
 from src.dashboards import config  # noqa: I100,I201,E402
 from src.dashboards.shared import io  # noqa: I100,I201,E402
-from src.shared import runner  # noqa: I100,I201,E402
 from src.dashboards import decorators  # noqa: I100,I201,E402
+from dashboards.kedro_wrapper import jobs  # noqa: I100,I201,E402
 
 
 @decorators.kedro_context_required(
@@ -52,19 +52,31 @@ def handler():
         is_aggregation_triggered = st.button(label="Run data aggregation")
 
     if is_aggregation_triggered:
-        aggregated_iris_dataset = runner.execute_pipeline(
+        jobs.submit_job(
+            name=config.PIPELINE_IRIS_AGG,
             package_name=config.PROJECT_PACKAGE_NAME,
             project_path=config.PROJECT_DIR,
+            pipeline_name=config.PIPELINE_IRIS_AGG,
             extra_params={
                 "agg.group_columns": group_columns,
                 "agg.agg_columns": agg_columns,
                 "agg.agg_params": agg_params,
-                config.PIPELINE_IRIS_AGG_INPUT: iris,
             },
-            pipeline_name=config.PIPELINE_IRIS_AGG,
+            inputs={config.PIPELINE_IRIS_AGG_INPUT: iris},
+            cache=jobs.get_result_cache(),
         )
-        aggregated_iris_dataset = aggregated_iris_dataset[config.PIPELINE_IRIS_AGG_OUTPUT]
-        st.dataframe(aggregated_iris_dataset)
+
+    job = jobs.attach_job(config.PIPELINE_IRIS_AGG)
+    if job is not None:
+        jobs.show_progress(job, jobs.get_result_cache())
+        if job.status == "done":
+            aggregated_iris_dataset = job.result[config.PIPELINE_IRIS_AGG_OUTPUT]
+            io.cache_data(
+                memory_registry=config.PIPELINE_IRIS_AGG_OUTPUT,
+                data=aggregated_iris_dataset,
+            )
+            st.dataframe(aggregated_iris_dataset)
+        jobs.poll_job(job)
 
 
 if __name__ == "__main__":
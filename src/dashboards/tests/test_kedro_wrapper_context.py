@@ -100,7 +100,7 @@ st.write(df_head)
 
 
 st.write("Check context reset")
-context.reload_catalog()
+context.reload_catalog(full=True)
 st.write("Should give an error again:")
 try:
     df_head = catalog.load("example_iris_data_save")
@@ -185,3 +185,23 @@ st.write("Save partition file with auto context reload")
 catalog.save("empty_partition", df, "iris2")
 df_list = catalog.list_partition("empty_partition")
 st.write(df_list)
+
+
+st.header("Test catalog parameters after a parameters file edit")
+
+parameters_path = (
+    st.session_state["kedro"]["config"]["project_conf_dir"] + "/base/parameters.yml"
+)
+with open(parameters_path) as f:
+    parameters_file = f.read()
+st.write("Before edit:", catalog.load("params:random_state"))
+with open(parameters_path, "w") as f:
+    f.write(parameters_file.replace("random_state: 3", "random_state: 4", 1))
+context.reload_catalog()
+st.write("After edit, should be 4:")
+st.success(catalog.load("params:random_state"))
+with open(parameters_path, "w") as f:
+    f.write(parameters_file)
+context.reload_catalog()
+st.write("After restoring the file, should be 3:")
+st.success(catalog.load("params:random_state"))
@@ -64,6 +64,9 @@ st.write(test_pipeline.list_param_files())
 test_pipeline.run()
 st.write("Available parameter files (new auto saved)")
 st.write(test_pipeline.list_param_files())
+st.write("Parameter files starting with `test_run`, one per page")
+st.write(test_pipeline.list_param_files(prefix="test_run", limit=1))
+st.write(test_pipeline.list_param_files(prefix="test_run", offset=1, limit=1))
 st.write("Available pipeline output")
 st.write(catalog.list_partition("example_iris_data_head_partitioned"))
 st.write("Output")
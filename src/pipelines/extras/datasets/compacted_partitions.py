@@ -0,0 +1,175 @@
+import json
+import time
+import uuid
+from pathlib import PurePosixPath
+from typing import Any, Callable, Dict, Iterable, List, Union
+
+import fsspec
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from kedro.io import AbstractDataSet
+from kedro.io.core import get_protocol_and_path
+
+from pipelines.utils.partitioned_data import call_callable
+
+COMPACTED_INDEX_FILENAME = "index.parquet"
+COMPACTED_SEGMENTS_DIRNAME = "segments"
+COMPACTED_MAX_SEGMENTS = 32
+
+
+class CompactedPartitionsDataSet(
+    AbstractDataSet[Dict[str, Union[Any, Callable[[], Any]]], Dict[str, Any]]
+):
+    def __init__(
+        self,
+        path: str,
+        credentials: Dict[str, Any] = None,
+        fs_args: Dict[str, Any] = None,
+        max_segments: int = COMPACTED_MAX_SEGMENTS,
+    ):
+        """Creates a new instance of CompactedPartitionsDataSet to keep many small JSON
+        partitions, e.g. one geocoding result per address, as a few append-only Parquet
+        segments with a lookup index of which segment holds every partition.
+
+        Saving appends a segment with the partitions that are not in the index yet, so
+        `PartitionedDataSet` load functions of partitions already compacted are never
+        called. Once there are more than `max_segments` segments they are merged into one.
+
+        Args:
+            path: directory holding `index.parquet` and the `segments` folder.
+            credentials: credentials of the underlying filesystem, e.g. S3 keys.
+            fs_args: extra arguments of the underlying filesystem.
+            max_segments: number of segments above which all segments are merged.
+        """
+        protocol, root = get_protocol_and_path(path)
+        self._protocol = protocol
+        self._root = PurePosixPath(root)
+        self._fs = fsspec.filesystem(protocol, **(credentials or {}), **(fs_args or {}))
+        self._max_segments = max_segments
+
+    @property
+    def _index_path(self) -> str:
+        return str(self._root / COMPACTED_INDEX_FILENAME)
+
+    def _segment_path(self, segment: str) -> str:
+        return str(self._root / COMPACTED_SEGMENTS_DIRNAME / segment)
+
+    def _read_index(self) -> Dict[str, str]:
+        if not self._fs.exists(self._index_path):
+            return {}
+        with self._fs.open(self._index_path, "rb") as f:
+            index = pq.read_table(f).to_pydict()
+        return dict(zip(index["partition"], index["segment"]))
+
+    def _write_parquet(self, path: str, table: pa.Table):
+        self._fs.makedirs(str(PurePosixPath(path).parent), exist_ok=True)
+        with self._fs.open(path, "wb") as f:
+            pq.write_table(table, f)
+
+    def _read_segments(
+        self, segments: Iterable[str], partitions: List[str] = None
+    ) -> Dict[str, Any]:
+        values = {}
+        for segment in segments:
+            with self._fs.open(self._segment_path(segment), "rb") as f:
+                table = pq.read_table(f)
+            if partitions is not None:
+                table = table.filter(
+                    pc.is_in(table["partition"], pa.array(partitions))
+                )
+            for partition, value in zip(
+                table["partition"].to_pylist(), table["value"].to_pylist()
+            ):
+                values[partition] = json.loads(value)
+        return values
+
+    def _read_indexed(self, partitions: Iterable[str] = None) -> Dict[str, Any]:
+        """
+        Values of `partitions`, or of all partitions, through the index. A merge may
+        remove the segments of an index read just before it, so the index is read
+        again when a segment is gone.
+        """
+        if partitions is not None:
+            partitions = list(partitions)
+        for attempt in range(2):
+            index = self._read_index()
+            if partitions is None:
+                wanted, segments = None, sorted(set(index.values()))
+            else:
+                wanted = [partition for partition in partitions if partition in index]
+                segments = sorted({index[partition] for partition in wanted})
+            try:
+                return self._read_segments(segments, wanted)
+            except FileNotFoundError:
+                if attempt > 0:
+                    raise
+                self._logger.info("Re-reading merged segments of `%s`", self._root)
+
+    def lookup(self, partitions: Iterable[str]) -> Dict[str, Any]:
+        """Values of the given partitions, reading only the segments that hold them."""
+        return self._read_indexed(partitions)
+
+    def _load(self) -> Dict[str, Any]:
+        """Load all partitions as a dictionary of partition name to value."""
+        return self._read_indexed()
+
+    def _save(self, data: Dict[str, Union[Any, Callable[[], Any]]]) -> None:
+        """Append the partitions missing from the index as a new segment."""
+        index = self._read_index()
+        new = sorted(partition for partition in data if partition not in index)
+        if new:
+            segment = f"segment-{time.time_ns()}.parquet"
+            values = [json.dumps(call_callable(data[partition])) for partition in new]
+            self._write_parquet(
+                self._segment_path(segment),
+                pa.table({"partition": new, "value": values}),
+            )
+            # the index is written last, a segment without index entries is never read
+            index.update(dict.fromkeys(new, segment))
+            self._write_index(index)
+        self._logger.info(
+            "Compacted %i new partitions into `%s`, %i in total",
+            len(new),
+            self._root,
+            len(index),
+        )
+        if len(set(index.values())) > self._max_segments:
+            self._merge_segments(index)
+
+    def _write_index(self, index: Dict[str, str]):
+        # readers never see a partly written index, it is staged and then moved
+        staging = str(self._root / f".{COMPACTED_INDEX_FILENAME}.{uuid.uuid4().hex}")
+        self._write_parquet(
+            staging,
+            pa.table({"partition": list(index), "segment": list(index.values())}),
+        )
+        self._fs.mv(staging, self._index_path)
+
+    def _merge_segments(self, index: Dict[str, str]):
+        old_segments = sorted(set(index.values()))
+        values = self._read_segments(old_segments)
+        segment = f"segment-{time.time_ns()}.parquet"
+        partitions = sorted(values)
+        self._write_parquet(
+            self._segment_path(segment),
+            pa.table(
+                {
+                    "partition": partitions,
+                    "value": [json.dumps(values[partition]) for partition in partitions],
+                }
+            ),
+        )
+        self._write_index(dict.fromkeys(partitions, segment))
+        for old_segment in old_segments:
+            self._fs.rm(self._segment_path(old_segment))
+
+    def _exists(self) -> bool:
+        return self._fs.exists(self._index_path)
+
+    def _describe(self) -> Dict[str, Any]:
+        return {
+            "path": str(self._root),
+            "protocol": self._protocol,
+            "max_segments": self._max_segments,
+        }
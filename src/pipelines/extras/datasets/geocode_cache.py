@@ -0,0 +1,53 @@
+from pathlib import Path
+from typing import Any, Callable, Dict, Union
+
+from kedro.io import AbstractDataSet
+
+from pipelines.utils.geocoding import GeocodeCache, address_hash
+from pipelines.utils.partitioned_data import call_callable
+
+
+class GeocodeCacheDataSet(
+    AbstractDataSet[
+        Dict[str, Union[Dict[str, Any], Callable[[], Dict[str, Any]]]], GeocodeCache
+    ]
+):
+    def __init__(self, filepath: str):
+        """Creates a new instance of GeocodeCacheDataSet to read and write the SQLite
+        geocoding cache used by `GeocodingService`.
+
+        Args:
+            filepath: location of the SQLite database, the same as the
+                `cache_filepath` of the `GmapsGeocoder` reading it.
+        """
+        self._filepath = filepath
+
+    def _load(self) -> GeocodeCache:
+        """Load the geocoding cache."""
+        return GeocodeCache(self._filepath)
+
+    def _save(
+        self, data: Dict[str, Union[Dict[str, Any], Callable[[], Dict[str, Any]]]]
+    ) -> None:
+        """
+        Add the geocoding records, or their load functions, of the addresses missing
+        from the cache. Records of addresses already cached are never loaded.
+        """
+        cache = GeocodeCache(self._filepath)
+        hashes = {address: address_hash(address) for address in data}
+        cached = cache.get_many(hashes.values())
+        new = [address for address in data if hashes[address] not in cached]
+        cache.put_many([call_callable(data[address]) for address in new])
+        self._logger.info(
+            "Imported %i new geocodes into `%s`, %i in total",
+            len(new),
+            self._filepath,
+            len(cache),
+        )
+
+    def _exists(self) -> bool:
+        # opening a `GeocodeCache` would create the database, so only look for it
+        return Path(self._filepath).exists()
+
+    def _describe(self) -> Dict[str, Any]:
+        return {"filepath": self._filepath}
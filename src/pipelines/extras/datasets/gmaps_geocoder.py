@@ -1,19 +1,40 @@
+from typing import Any, Dict, Union
+
 from geopy.geocoders import GoogleV3
 from kedro.io import AbstractDataSet
 
+from pipelines.utils.geocoding import GeocodeCache, GeocodingService
+
 
-class GmapsGeocoder(AbstractDataSet[GoogleV3, None]):
-    def __init__(self, credentials: str):
-        """Creates a new instance of ImageDataSet to load / save image data for given filepath.
+class GmapsGeocoder(AbstractDataSet[Union[GoogleV3, GeocodingService], None]):
+    def __init__(
+        self,
+        credentials: str,
+        cache_filepath: str = None,
+        service_args: Dict[str, Any] = None,
+    ):
+        """Creates a new instance of GmapsGeocoder to load a Google Maps geocoder.
 
         Args:
-            filepath: The location of the image file to load / save data.
+            credentials: Google Maps API key.
+            cache_filepath: when given, a `GeocodingService` backed by a SQLite
+                geocoding cache at this location is loaded instead of the raw
+                `GoogleV3` geocoder.
+            service_args: keyword arguments of the `GeocodingService`, e.g.
+                `max_workers` or `min_interval`.
         """
         self._credentials = credentials
+        self._cache_filepath = cache_filepath
+        self._service_args = service_args or {}
 
-    def _load(self) -> GoogleV3:
+    def _load(self) -> Union[GoogleV3, GeocodingService]:
         """Load geocoder."""
-        return GoogleV3(api_key=self._credentials)
+        geocoder = GoogleV3(api_key=self._credentials)
+        if self._cache_filepath is None:
+            return geocoder
+        return GeocodingService(
+            geocoder, GeocodeCache(self._cache_filepath), **self._service_args
+        )
 
     def _save(self) -> None:
         raise NotImplementedError("Saving is not supported for GmapsGeocoder")
@@ -1,18 +1,31 @@
+from typing import Any, Dict, Union
+
 from kedro.io import AbstractDataSet
 
+from pipelines.utils.OSRM.client import OsrmClient
+
 
-class OsrmPorts(AbstractDataSet[str, None]):
-    def __init__(self, credentials: str):
-        """Creates a new instance of ImageDataSet to load / save image data for given filepath.
+class OsrmPorts(AbstractDataSet[Union[str, OsrmClient], None]):
+    def __init__(self, credentials: str, client_args: Dict[str, Any] = None):
+        """Creates a new instance of OsrmPorts to load OSRM access ports.
 
         Args:
-            filepath: The location of the image file to load / save data.
+            credentials: OSRM access port.
+            client_args: when given, a pooled `OsrmClient` for the port is loaded
+                instead of the port itself, with these keyword arguments. The same
+                client is returned on every load, so its connections are shared.
         """
         self._credentials = credentials
+        self._client_args = client_args
+        self._client = None
 
-    def _load(self) -> str:
+    def _load(self) -> Union[str, OsrmClient]:
         """Load OSRM access ports."""
-        return self._credentials
+        if self._client_args is None:
+            return self._credentials
+        if self._client is None:
+            self._client = OsrmClient(self._credentials, **self._client_args)
+        return self._client
 
     def _save(self) -> None:
         raise NotImplementedError("Saving is not supported for OSRM access ports")
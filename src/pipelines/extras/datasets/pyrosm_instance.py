@@ -1,20 +1,47 @@
+from functools import partial
+from typing import Dict, List, Union
+
 from kedro.io import AbstractDataSet
 from pyrosm import OSM
 
+from pipelines.utils.osm_cache import CachedOsm, bounding_box_list
+
 
-class PyrosmInstance(AbstractDataSet[OSM, None]):
-    def __init__(self, filepath: str, credentials: str | None = None):
-        """Creates a new instance of ImageDataSet to load / save image data for given filepath.
+class PyrosmInstance(AbstractDataSet[Union[OSM, CachedOsm], None]):
+    def __init__(
+        self,
+        filepath: str,
+        credentials: str | None = None,
+        bounding_box: Union[Dict[str, float], List[float], None] = None,
+        cache_dir: str | None = None,
+    ):
+        """Creates a new instance of PyrosmInstance to load an OSM PBF file.
 
         Args:
-            filepath: The location of the image file to load / save data.
+            filepath: The location of the PBF file.
+            bounding_box: area to extract, as `[min_lon, min_lat, max_lon, max_lat]` or
+                a dictionary like `osrm_get_routes.BOUNDING_BOX`.
+            cache_dir: when given, a `CachedOsm` is loaded instead of `pyrosm.OSM`,
+                which caches extracted networks and POIs as GeoParquet in this
+                directory and only parses the PBF on a miss.
         """
         self._credentials = credentials
         self._filepath = filepath
+        self._bounding_box = bounding_box_list(bounding_box)
+        self._cache_dir = cache_dir
+        self._instance = None
 
-    def _load(self) -> OSM:
-        """Load geocoder."""
-        return OSM(self._filepath)
+    def _load(self) -> Union[OSM, CachedOsm]:
+        """Load OSM reader, the same one on every load."""
+        if self._instance is None:
+            osm_factory = partial(OSM, self._filepath, bounding_box=self._bounding_box)
+            if self._cache_dir is None:
+                self._instance = osm_factory()
+            else:
+                self._instance = CachedOsm(
+                    self._filepath, osm_factory, self._cache_dir, self._bounding_box
+                )
+        return self._instance
 
     def _save(self) -> None:
         raise NotImplementedError("Saving is not supported for OSM")
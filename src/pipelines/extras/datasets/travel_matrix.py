@@ -0,0 +1,113 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Union
+
+import numpy as np
+from kedro.io import AbstractDataSet
+
+from pipelines.utils.OSRM.matrix_service import TravelMatrices
+
+TRAVEL_MATRIX_CHUNK_ROWS = 1024
+TRAVEL_MATRIX_DTYPES = ("float32", "uint32")
+UNROUTABLE_UINT32 = np.iinfo(np.uint32).max
+
+
+def _to_uint32(values: np.ndarray) -> np.ndarray:
+    """Round to whole units, storing unroutable (NaN or infinite) pairs as the maximum."""
+    rounded = np.rint(values)
+    unroutable = ~np.isfinite(rounded)
+    rounded[unroutable] = UNROUTABLE_UINT32
+    return np.clip(rounded, 0, UNROUTABLE_UINT32).astype(np.uint32)
+
+
+class TravelMatrixDataSet(
+    AbstractDataSet[
+        Union[Dict[str, np.ndarray], TravelMatrices], Dict[str, np.ndarray]
+    ]
+):
+    def __init__(
+        self,
+        filepath: str,
+        time_dtype: str = "float32",
+        chunk_rows: int = TRAVEL_MATRIX_CHUNK_ROWS,
+    ):
+        """Creates a new instance of TravelMatrixDataSet to store time and distance
+        matrices on local disk and load them memory-mapped, so large matrices can be
+        sliced without reading them into memory.
+
+        Args:
+            filepath: directory holding `time_matrix.npy`, `distance_matrix.npy`,
+                `coordinates.npy` and `meta.json`.
+            time_dtype: `"float32"` seconds, or `"uint32"` whole seconds, in which case
+                unroutable pairs are stored as `UNROUTABLE_UINT32`.
+            chunk_rows: number of rows converted and written at once.
+        """
+        if time_dtype not in TRAVEL_MATRIX_DTYPES:
+            raise ValueError(
+                f"Unknown time dtype `{time_dtype}`, use one of {TRAVEL_MATRIX_DTYPES}"
+            )
+        self._filepath = Path(filepath)
+        self._time_dtype = time_dtype
+        self._chunk_rows = chunk_rows
+
+    def _load(self) -> Dict[str, np.ndarray]:
+        """Load read-only memory-maps of the matrices and their coordinates."""
+        return {
+            "time_matrix": np.load(self._filepath / "time_matrix.npy", mmap_mode="r"),
+            "distance_matrix": np.load(
+                self._filepath / "distance_matrix.npy", mmap_mode="r"
+            ),
+            "coordinates": np.load(self._filepath / "coordinates.npy"),
+        }
+
+    def _write_matrix(self, name: str, matrix: np.ndarray, dtype: str):
+        """Write to a temporary file first, `matrix` may be a memory-map of the target."""
+        target = self._filepath / f"{name}.npy"
+        staging = self._filepath / f".{name}.{uuid.uuid4().hex}.npy"
+        out = np.lib.format.open_memmap(
+            staging, mode="w+", dtype=dtype, shape=matrix.shape
+        )
+        for start in range(0, matrix.shape[0], self._chunk_rows):
+            rows = slice(start, start + self._chunk_rows)
+            if dtype == "uint32":
+                out[rows] = _to_uint32(np.asarray(matrix[rows], dtype=float))
+            else:
+                out[rows] = matrix[rows]
+        out.flush()
+        del out
+        os.replace(staging, target)
+
+    def _save(self, data: Union[Dict[str, np.ndarray], TravelMatrices]) -> None:
+        """Save matrices with their `[lon, lat]` coordinate index, chunk by chunk."""
+        if isinstance(data, TravelMatrices):
+            data = {**data.as_dict(), "coordinates": data.coordinates}
+        if "coordinates" not in data:
+            raise ValueError("Travel matrices need their `coordinates` to be saved")
+        n_stops = len(data["coordinates"])
+        for name in ("time_matrix", "distance_matrix"):
+            if data[name].shape != (n_stops, n_stops):
+                raise ValueError(
+                    f"`{name}` has shape {data[name].shape}, expected "
+                    f"{(n_stops, n_stops)} for {n_stops} coordinates"
+                )
+        self._filepath.mkdir(parents=True, exist_ok=True)
+        np.save(
+            self._filepath / "coordinates.npy",
+            np.asarray(data["coordinates"], dtype=float),
+        )
+        self._write_matrix("time_matrix", data["time_matrix"], self._time_dtype)
+        self._write_matrix("distance_matrix", data["distance_matrix"], "float32")
+        with open(self._filepath / "meta.json", "w") as f:
+            json.dump({"n_stops": n_stops, "time_dtype": self._time_dtype}, f)
+
+    def _exists(self) -> bool:
+        return (self._filepath / "meta.json").exists()
+
+    def _describe(self) -> Dict[str, Any]:
+        return {
+            "filepath": str(self._filepath),
+            "time_dtype": self._time_dtype,
+            "chunk_rows": self._chunk_rows,
+        }
@@ -0,0 +1,4 @@
+from .pipeline import create_pipeline
+
+
+__version__ = "0.1"
@@ -0,0 +1,55 @@
+"""
+Compaction of the partitioned JSON geocoding caches into Parquet segments, and their
+import into the SQLite geocoding cache of `GeocodingService`.
+"""
+from functools import partial
+from typing import Any, Callable, Dict
+
+from pipelines.utils.geocoding import google_result_records
+from pipelines.utils.partitioned_data import call_callable
+
+
+def compact_partitions(
+    partitions: Dict[str, Callable[[], Any]]
+) -> Dict[str, Callable[[], Any]]:
+    """
+    Hand the lazily loaded partitions over to a `CompactedPartitionsDataSet`, which
+    only loads and appends those it does not hold yet. Running it again later compacts
+    the partitions written since.
+    """
+    return {
+        partition: load
+        for partition, load in sorted(partitions.items())
+        if partition
+    }
+
+
+def _load_record(
+    address: str, load: Callable[[], Any], failed: bool
+) -> Dict[str, Any]:
+    return google_result_records({address: call_callable(load)}, failed=failed)[0]
+
+
+def import_geocodes(
+    geocoded: Dict[str, Callable[[], Any]], failed: Dict[str, Callable[[], Any]]
+) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    """
+    Hand the lazily loaded Google results and failures over to the SQLite cache as
+    records per address, so `GeocodingService` answers them without requesting them
+    again. The cache only loads the addresses it does not hold yet, so running it again
+    later imports the partitions written since. A result wins over a failure of the
+    same address.
+    """
+    records = {
+        address: partial(_load_record, address, load, True)
+        for address, load in sorted(failed.items())
+        if address
+    }
+    records.update(
+        {
+            address: partial(_load_record, address, load, False)
+            for address, load in sorted(geocoded.items())
+            if address
+        }
+    )
+    return records
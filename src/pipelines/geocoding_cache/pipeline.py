@@ -0,0 +1,37 @@
+"""
+Compact the `geocoded_address_google_cash` and `geocoded_address_google_failed`
+partitioned JSON caches into Parquet segments with a lookup index, and import the
+addresses missing from the SQLite cache read and written by `GeocodingService`.
+"""
+
+from kedro.pipeline import Pipeline, node, pipeline
+
+from . import nodes
+
+
+def create_pipeline(**kwargs) -> Pipeline:
+    return pipeline(
+        [
+            node(
+                func=nodes.compact_partitions,
+                inputs="geocoded_address_google_cash",
+                outputs="geocoded_address_google_compacted",
+                name="compact_geocoded_address_google_cash",
+            ),
+            node(
+                func=nodes.compact_partitions,
+                inputs="geocoded_address_google_failed",
+                outputs="geocoded_address_google_failed_compacted",
+                name="compact_geocoded_address_google_failed",
+            ),
+            node(
+                func=nodes.import_geocodes,
+                inputs=[
+                    "geocoded_address_google_cash",
+                    "geocoded_address_google_failed",
+                ],
+                outputs="geocoded_address_google_sqlite",
+                name="import_geocodes_into_sqlite_cache",
+            ),
+        ],
+    )
@@ -23,7 +23,7 @@ def create_pipeline(**kwargs) -> Pipeline:
             node(
                 func=nodes.aggregate_dataset,
                 inputs=[
-                    "params:iris_dataset",
+                    "iris_dataset",
                     "params:agg.group_columns",
                     "agg_params",
                 ],
@@ -3,7 +3,7 @@ from typing import Dict
 
 from kedro.pipeline import Pipeline
 
-from . import iris_agg, iris_agg_v2, test
+from . import geocoding_cache, iris_agg, iris_agg_v2, test
 
 
 def register_pipelines() -> Dict[str, Pipeline]:
@@ -17,5 +17,6 @@ def register_pipelines() -> Dict[str, Pipeline]:
         "iris_agg": iris_agg.create_pipeline(),
         "iris_agg_v2": iris_agg_v2.create_pipeline(),
         "test": test.create_pipeline(),
+        "geocoding_cache": geocoding_cache.create_pipeline(),
     }
     return pipelines
@@ -0,0 +1,184 @@
+"""
+Pooled HTTP client shared by the OSRM table, route and trip helpers. Keeps connections
+alive between requests, retries transient failures with backoff and limits the number of
+concurrent requests per endpoint and service.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+OSRM_CLIENT_POOL_SIZE = 16
+OSRM_CLIENT_MAX_RETRIES = 3
+OSRM_CLIENT_BACKOFF_FACTOR = 0.5
+OSRM_CLIENT_MAX_CONCURRENCY = 8
+OSRM_CLIENT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class OsrmResponseError(requests.HTTPError):
+    """OSRM answered with an error status, still so after retrying transient ones.
+
+    Args:
+        response: the failed response; its JSON body gives OSRM's `code` and `message`.
+    """
+
+    code: Union[str, None]
+    message: str
+
+    def __init__(self, response: requests.Response):
+        try:
+            content = response.json()
+        except ValueError:
+            content = None
+        if not isinstance(content, dict):
+            content = {}
+        self.code = content.get("code")
+        self.message = content.get("message", response.reason)
+        super().__init__(
+            f"OSRM request failed with status {response.status_code} "
+            f"`{self.code}`: {self.message}",
+            response=response,
+        )
+
+
+class OsrmClient:
+    """Keep-alive OSRM client with retries and per-endpoint concurrency limits.
+
+    Args:
+        endpoint: default port to OSRM RestAPI, used when helpers get no endpoint.
+        pool_size: number of connections kept alive per host.
+        max_retries: retries on connection errors and `OSRM_CLIENT_RETRY_STATUSES`.
+        backoff_factor: exponential backoff between retries, in seconds.
+        max_concurrency: maximum in-flight requests per host and service (`table`,
+            `route`, `trip`, ...), either one limit for all or a mapping per service.
+        timeout: default request timeout in seconds.
+
+    Examples:
+
+        '''python
+        client = OsrmClient("http://localhost:5000", max_concurrency={"table": 2})
+        matrices = get_time_dist_matrix(stops, client=client)
+        routes = return_route_osrm_info(assigned_stops, client)
+        '''
+    """
+
+    endpoint: Union[str, None]
+    timeout: float
+    _session: requests.Session
+    _max_concurrency: Union[int, Dict[str, int]]
+    _semaphores: Dict[Tuple[str, str], threading.BoundedSemaphore]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        endpoint: Union[str, None] = None,
+        pool_size: int = OSRM_CLIENT_POOL_SIZE,
+        max_retries: int = OSRM_CLIENT_MAX_RETRIES,
+        backoff_factor: float = OSRM_CLIENT_BACKOFF_FACTOR,
+        max_concurrency: Union[int, Dict[str, int]] = OSRM_CLIENT_MAX_CONCURRENCY,
+        timeout: float = 120,
+    ):
+        if endpoint is not None:
+            endpoint = endpoint.rstrip("/")
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._max_concurrency = max_concurrency
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=OSRM_CLIENT_RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def _semaphore(self, url: str) -> threading.BoundedSemaphore:
+        parts = urlsplit(url)
+        service = parts.path.strip("/").split("/")[0]
+        key = (parts.netloc, service)
+        with self._lock:
+            if key not in self._semaphores:
+                limit = self._max_concurrency
+                if isinstance(limit, dict):
+                    limit = limit.get(service, OSRM_CLIENT_MAX_CONCURRENCY)
+                self._semaphores[key] = threading.BoundedSemaphore(limit)
+            return self._semaphores[key]
+
+    @contextmanager
+    def stream(
+        self, url: str, timeout: Union[float, None] = None
+    ) -> Iterator[requests.Response]:
+        """Open a streamed GET request, holding a concurrency slot until closed."""
+        with self._semaphore(url):
+            with self._session.get(
+                url, timeout=timeout or self.timeout, stream=True
+            ) as response:
+                if not response.ok:
+                    raise OsrmResponseError(response)
+                yield response
+
+    def get_json(self, url: str, timeout: Union[float, None] = None) -> dict:
+        """
+        Send a GET request and return the decoded JSON content. Raises
+        `OsrmResponseError` on an error status, e.g. a 429 or 5xx that is still
+        returned after the retries.
+        """
+        logger.debug("OSRM request: `%s`", url)
+        with self._semaphore(url):
+            response = self._session.get(url, timeout=timeout or self.timeout)
+        if not response.ok:
+            raise OsrmResponseError(response)
+        return response.json()
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self) -> "OsrmClient":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> OsrmClient:
+    """Process-wide client used by helpers that are not given one."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = OsrmClient()
+        return _default_client
+
+
+def resolve_client(
+    endpoint: Union[str, OsrmClient, None] = None,
+    client: Union[OsrmClient, None] = None,
+) -> Tuple[Union[str, None], OsrmClient]:
+    """
+    Return the endpoint and client to use. `endpoint` may itself be a client, e.g. as
+    loaded by the `OsrmPorts` dataset, in which case its endpoint is used.
+    """
+    if isinstance(endpoint, OsrmClient):
+        endpoint, client = endpoint.endpoint, endpoint
+    if client is None:
+        client = get_default_client()
+    if endpoint is None:
+        endpoint = client.endpoint
+    return endpoint.rstrip("/") if endpoint else endpoint, client
@@ -1,14 +1,33 @@
 """
 Retrieve and return OSRM table info. See https://project-osrm.org/docs/v5.24.0/api/#table-service
-"""
 
+Thin wrappers around `matrix_service` with the OSRM backend.
+"""
 from typing import Dict, Union
 
 import numpy as np
 import pandas as pd
-import requests
 
-PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT = 1000
+from pipelines.utils.OSRM.client import OsrmClient
+from pipelines.utils.OSRM.matrix_cache import MatrixCache
+from pipelines.utils.OSRM.matrix_service import (  # noqa: F401
+    PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT,
+    SNAP_PRECISION,
+    TABLE_MAX_WORKERS,
+    MatrixService,
+    OsrmBackend,
+    TravelMatrices,
+    deduplicate_coordinates,
+    fetch_time_dist_block,
+)
+
+
+def _writable(matrices: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Copy read-only matrices, e.g. memory-mapped cache hits, into memory."""
+    return {
+        name: matrix if matrix.flags.writeable else np.array(matrix)
+        for name, matrix in matrices.items()
+    }
 
 
 def get_time_dist_matrix(
@@ -18,6 +37,14 @@ def get_time_dist_matrix(
     lat_col: str = "latitude",
     timeout: float = 120,
     slow_down: float = 1,
+    tile_size: Union[int, None] = None,
+    max_workers: int = TABLE_MAX_WORKERS,
+    profile: str = "driving",
+    cache: Union[MatrixCache, None] = None,
+    streaming: bool = False,
+    null_value: float = np.nan,
+    client: Union[OsrmClient, None] = None,
+    precision: Union[int, None] = SNAP_PRECISION,
 ) -> Dict[str, np.ndarray]:
     """
     Calculate the time (seconds) and distance (meters) of the shortest-time path between all stops.
@@ -28,43 +55,85 @@ def get_time_dist_matrix(
     lat: column name of longitude coordinate
     timeout: time before time-out error occurs for API
     slow_down: factor by which to slow-down travel speed and increase duration.
+    tile_size: split the request into blocks of at most `tile_size` sources and
+        destinations. Defaults to `PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT`, smaller
+        problems are sent in a single request.
+    max_workers: maximum number of blocks requested concurrently in tiled mode.
+    profile: OSRM routing profile.
+    cache: optional on-disk matrix cache; only stops missing from it are requested.
+    streaming: decode the response chunk by chunk straight into float32 matrices
+        instead of parsing the full JSON, keeping peak memory close to the result size.
+    null_value: value of unroutable pairs when streaming, e.g. `np.nan` or `np.inf`.
+    client: pooled OSRM client shared between requests, defaults to the process-wide
+        client. `endpoint` may also be given as a client.
+    precision: decimals stops are snapped to before requesting; stops at the same
+        snapped point, e.g. several bins per site, are requested once and expanded
+        back afterwards. `None` only merges exactly equal coordinates.
     Return:
-    time_matrix: short-time path time (seconds) between stops i and j.
-    distance_matrix: short-time path distance (meters) between stops i and j.
+    time_matrix: short-time path time (seconds) between stops i and j, float32.
+    distance_matrix: short-time path distance (meters) between stops i and j, float32.
+    Both are writable in-memory arrays, cache hits are copied out of the cache. Use
+    `MatrixService.get_matrices` to keep them memory-mapped.
     """
+    backend = OsrmBackend(
+        endpoint,
+        client,
+        profile=profile,
+        tile_size=tile_size,
+        max_workers=max_workers,
+        timeout=timeout,
+        streaming=streaming,
+        null_value=null_value,
+    )
+    service = MatrixService(backend, cache=cache, precision=precision)
+    return _writable(service.get_matrices(data, lon_col, lat_col, slow_down).as_dict())
 
-    def _construct_url_using_coordinates(data: pd.DataFrame, endpoint: str) -> str:
-        """
-        Function takes lat & lon & builds url request
-        """
-        coordinates = (
-            data[lon_col].astype(str) + "," + data[lat_col].astype(str)
-        ).tolist()
-        coordinates = ";".join(coordinates)
-        url = f"{endpoint}{coordinates}?annotations=distance,duration"
-        return url
-
-    def _send_get_request(url: str) -> dict:
-        with requests.Session() as session:
-            response_content = session.get(
-                url, timeout=timeout, headers={"Connection": "close"}
-            ).json()
-        return response_content
 
-    def _get_time_matrix(
-        api_response: dict, slow_down: Union[float, int]
-    ) -> np.ndarray:
-        time_matrix = np.array(api_response["durations"]) * slow_down
-        return time_matrix
-
-    def _get_distance_matrix(api_response) -> np.ndarray:
-        distance_matrix = np.array(api_response["distances"])
-        return distance_matrix
-
-    table_end_point = f"{endpoint}/table/v1/driving/"
-    url = _construct_url_using_coordinates(data, table_end_point)
-    api_response = _send_get_request(url)
-    time_matrix = _get_time_matrix(api_response, slow_down)
-    distance_matrix = _get_distance_matrix(api_response)
-
-    return {"time_matrix": time_matrix, "distance_matrix": distance_matrix}
+def update_time_dist_matrix(
+    previous_matrices: Dict[str, np.ndarray],
+    previous_data: pd.DataFrame,
+    data: pd.DataFrame,
+    endpoint: str = None,
+    lon_col: str = "longitude",
+    lat_col: str = "latitude",
+    timeout: float = 120,
+    slow_down: float = 1,
+    tile_size: int = PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT,
+    max_workers: int = TABLE_MAX_WORKERS,
+    profile: str = "driving",
+    client: Union[OsrmClient, None] = None,
+    precision: Union[int, None] = SNAP_PRECISION,
+) -> Dict[str, np.ndarray]:
+    """
+    Update the matrices of `get_time_dist_matrix` after stops were added or removed.
+    Stops of `data` already in `previous_data` keep their travel times and distances,
+    only the rows and columns of new stops are requested, and removed stops are dropped.
+    Args:
+    previous_matrices: `time_matrix` and `distance_matrix` of `previous_data`
+    previous_data: data-frame with lat-lon coordinates the matrices were built for
+    data: data-frame with lat-lon coordinates of the new stop set
+    endpoint: port to OSRM RestAPI
+    slow_down: factor by which to slow-down travel speed and increase duration, the
+        same as used for `previous_matrices`.
+    precision: decimals stops are snapped to when matching them to previous stops.
+    See `get_time_dist_matrix` for the other arguments.
+    Return:
+    time_matrix: short-time path time (seconds) between stops i and j of `data`.
+    distance_matrix: short-time path distance (meters) between stops i and j of `data`.
+    """
+    backend = OsrmBackend(
+        endpoint,
+        client,
+        profile=profile,
+        tile_size=tile_size,
+        max_workers=max_workers,
+        timeout=timeout,
+    )
+    previous = TravelMatrices(
+        previous_matrices["time_matrix"],
+        previous_matrices["distance_matrix"],
+        previous_data[[lon_col, lat_col]].to_numpy(dtype=float),
+        slow_down,
+    )
+    service = MatrixService(backend, precision=precision)
+    return service.update_matrices(previous, data, lon_col, lat_col).as_dict()
@@ -1,5 +1,8 @@
 """
 Retrieve and return OSRM table info. See https://project-osrm.org/docs/v5.24.0/api/#table-service
+
+Thin wrapper around `matrix_service` returning tuples, limited to
+`PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT` stops on the public OSRM server.
 """
 
 from pprint import pprint
@@ -7,7 +10,10 @@ from typing import List, Tuple, Union
 
 import numpy as np
 import pandas as pd
-import requests
+
+from pipelines.utils.OSRM import get_osrm_tables
+from pipelines.utils.OSRM.client import OsrmClient, resolve_client
+from pipelines.utils.OSRM.matrix_cache import MatrixCache
 
 PORT_TYPE_MAPPING_DEFAULT = "http://router.project-osrm.org"
 PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT = 100
@@ -20,6 +26,10 @@ def get_time_dist_matrix(
     lat_col: str = "latitude",
     timeout: float = 120,
     slow_down: float = 1,
+    cache: Union[MatrixCache, None] = None,
+    streaming: bool = False,
+    null_value: float = np.nan,
+    client: Union[OsrmClient, None] = None,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Calculate the time (seconds) and distance (meters) of the shortest-time path between all stops.
@@ -30,39 +40,17 @@ def get_time_dist_matrix(
     lat: column name of longitude coordinate
     timeout: time before time-out error occurs for API
     slow_down: factor by which to slow-down travel speed and increase duration.
+    cache: optional on-disk matrix cache; only stops missing from it are requested.
+    streaming: decode the response chunk by chunk straight into float32 matrices
+        instead of parsing the full JSON, keeping peak memory close to the result size.
+    null_value: value of unroutable pairs when streaming, e.g. `np.nan` or `np.inf`.
+    client: pooled OSRM client shared between requests, defaults to the process-wide
+        client. `endpoint` may also be given as a client.
     Return:
     time_matrix: short-time path time (seconds) between stops i and j.
     distance_matrix: short-time path distance (meters) between stops i and j.
     """
-
-    def _construct_url_using_coordinates(data: pd.DataFrame, endpoint: str) -> str:
-        """
-        Function takes lat & lon & builds url request
-        """
-        coordinates = (
-            data[lon_col].astype(str) + "," + data[lat_col].astype(str)
-        ).tolist()
-        coordinates = ";".join(coordinates)
-        url = f"{endpoint}{coordinates}?annotations=distance,duration"
-        return url
-
-    def _send_get_request(url: str) -> dict:
-        with requests.Session() as session:
-            response_content = session.get(
-                url, timeout=timeout, headers={"Connection": "close"}
-            ).json()
-        return response_content
-
-    def _get_time_matrix(
-        api_response: dict, slow_down: Union[float, int]
-    ) -> np.ndarray:
-        time_matrix = np.array(api_response["durations"]) * slow_down
-        return time_matrix
-
-    def _get_distance_matrix(api_response) -> np.ndarray:
-        distance_matrix = np.array(api_response["distances"])
-        return distance_matrix
-
+    endpoint, client = resolve_client(endpoint, client)
     if endpoint is None:
         if data.shape[0] > PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT:
             raise ValueError(
@@ -70,13 +58,19 @@ def get_time_dist_matrix(
             )
         endpoint = PORT_TYPE_MAPPING_DEFAULT
 
-    table_end_point = f"{endpoint}/table/v1/driving/"
-    url = _construct_url_using_coordinates(data, table_end_point)
-    api_response = _send_get_request(url)
-    time_matrix = _get_time_matrix(api_response, slow_down)
-    distance_matrix = _get_distance_matrix(api_response)
-
-    return time_matrix, distance_matrix
+    matrices = get_osrm_tables.get_time_dist_matrix(
+        data,
+        endpoint,
+        lon_col=lon_col,
+        lat_col=lat_col,
+        timeout=timeout,
+        slow_down=slow_down,
+        cache=cache,
+        streaming=streaming,
+        null_value=null_value,
+        client=client,
+    )
+    return matrices["time_matrix"], matrices["distance_matrix"]
 
 
 def get_interstops_time_distance(
@@ -102,6 +96,52 @@ def get_interstops_time_distance(
     return travel_time, travel_dist
 
 
+def get_routes_interstops_time_distance(
+    time_matrix: np.ndarray,
+    distance_matrix: np.ndarray,
+    stop_indices: np.ndarray,
+    route_offsets: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched `get_interstops_time_distance` for many routes sharing one global matrix.
+    Legs are gathered straight from the matrices, without building per-route submatrices.
+    Args:
+    time_matrix: OSRM time distance matrix of all stops, may be memory-mapped
+    distance_matrix: OSRM distance matrix of all stops, may be memory-mapped
+    stop_indices: matrix indices of the stops of all routes in visiting order, one
+        route after the other
+    route_offsets: position in `stop_indices` where every route starts, followed by
+        the total number of stops, e.g. `[0, 3, 7]` for routes of 3 and 4 stops.
+        Raises `ValueError` when the offsets do not start at 0, decrease or do not end
+        at the number of stops.
+    Returns:
+    time distance: time from the previous stop of the same route, 0 at route starts
+    spatial distance: distance from the previous stop of the same route, 0 at route starts
+    """
+    stop_indices = np.asarray(stop_indices, dtype=np.intp)
+    route_offsets = np.asarray(route_offsets, dtype=np.intp)
+    if route_offsets.shape[0] == 0 or route_offsets[0] != 0:
+        raise ValueError("`route_offsets` must start at 0")
+    if np.any(np.diff(route_offsets) < 0):
+        raise ValueError("`route_offsets` must be non-decreasing")
+    if route_offsets[-1] != stop_indices.shape[0]:
+        raise ValueError(
+            f"`route_offsets` must end at the number of stops {stop_indices.shape[0]}, "
+            f"got {route_offsets[-1]}"
+        )
+    is_leg = np.ones(stop_indices.shape[0], dtype=bool)
+    is_leg[route_offsets[:-1][route_offsets[:-1] < stop_indices.shape[0]]] = False
+    legs = np.flatnonzero(is_leg)
+    origins, destinations = stop_indices[legs - 1], stop_indices[legs]
+
+    def _get_stopwise_measures(matrix: np.ndarray):
+        measures = np.zeros(stop_indices.shape[0], dtype=matrix.dtype)
+        measures[legs] = matrix[origins, destinations]
+        return measures
+
+    return _get_stopwise_measures(time_matrix), _get_stopwise_measures(distance_matrix)
+
+
 if __name__ == "__main__":
     stop_test = pd.read_csv(
         "data/testing/force_assign_milti_job_route_payload_unassigned_stops_df_test.csv"
@@ -0,0 +1,126 @@
+"""
+Straight-line (great-circle) travel matrices between `[lon, lat]` coordinates.
+
+Good enough for candidate pruning, rough clustering or previews without a routing
+server. Matrices are computed in blocks of rows straight into float32 outputs, so the
+float64 temporaries stay `chunk_size` x `n_destinations` and 50k points fit in memory.
+"""
+from typing import Dict, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_M = 6371008.8
+HAVERSINE_SPEED_KMH = 30
+HAVERSINE_CHUNK_SIZE = 1024
+
+
+def haversine_matrix(sources: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+    """Great-circle distance (meters) between `[lon, lat]` sources and destinations."""
+    lon_s, lat_s = np.radians(sources).T
+    lon_d, lat_d = np.radians(destinations).T
+    dlat = lat_d[None, :] - lat_s[:, None]
+    dlon = lon_d[None, :] - lon_s[:, None]
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(lat_s)[:, None] * np.cos(lat_d)[None, :] * np.sin(dlon / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def haversine_time_dist_block(
+    sources: np.ndarray,
+    destinations: np.ndarray,
+    speed_kmh: float = HAVERSINE_SPEED_KMH,
+    slow_down: float = 1,
+    chunk_size: int = HAVERSINE_CHUNK_SIZE,
+    out: Union[Dict[str, np.ndarray], None] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Straight-line travel durations and distances from `sources` to `destinations`.
+    Args:
+    sources: `[lon, lat]` coordinates to travel from
+    destinations: `[lon, lat]` coordinates to travel to
+    speed_kmh: average travel speed
+    slow_down: factor by which to slow-down travel speed and increase duration.
+    chunk_size: number of source rows computed at once
+    out: optional preallocated `durations` and `distances` arrays, e.g. memory-maps.
+    Return:
+    durations: travel times (seconds), float32 unless given in `out`.
+    distances: travel distances (meters), float32 unless given in `out`.
+    """
+    lon_s, lat_s = np.radians(np.asarray(sources, dtype=float)).T
+    lon_d, lat_d = np.radians(np.asarray(destinations, dtype=float)).T
+    cos_lat_s, cos_lat_d = np.cos(lat_s), np.cos(lat_d)
+    shape = (lon_s.shape[0], lon_d.shape[0])
+    out = {} if out is None else out
+    if "durations" in out:
+        durations = out["durations"]
+    else:
+        durations = np.empty(shape, dtype=np.float32)
+    if "distances" in out:
+        distances = out["distances"]
+    else:
+        distances = np.empty(shape, dtype=np.float32)
+    seconds_per_meter = slow_down / (speed_kmh / 3.6)
+
+    for start in range(0, shape[0], chunk_size):
+        rows = slice(start, start + chunk_size)
+        a = np.sin((lat_d[None, :] - lat_s[rows, None]) / 2) ** 2
+        a += (
+            cos_lat_s[rows, None]
+            * cos_lat_d[None, :]
+            * np.sin((lon_d[None, :] - lon_s[rows, None]) / 2) ** 2
+        )
+        np.clip(a, 0, 1, out=a)
+        np.sqrt(a, out=a)
+        np.arcsin(a, out=a)
+        a *= 2 * EARTH_RADIUS_M
+        distances[rows] = a
+        a *= seconds_per_meter
+        durations[rows] = a
+    return durations, distances
+
+
+def get_haversine_time_dist_matrix(
+    data: pd.DataFrame,
+    lon_col: str = "longitude",
+    lat_col: str = "latitude",
+    speed_kmh: float = HAVERSINE_SPEED_KMH,
+    slow_down: float = 1,
+    chunk_size: int = HAVERSINE_CHUNK_SIZE,
+    out: Union[Dict[str, np.ndarray], None] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Approximate the time (seconds) and distance (meters) between all stops by the
+    straight-line distance at an average speed, as a drop-in for
+    `get_osrm_tables.get_time_dist_matrix` when precision is not required.
+    Args:
+    data: data-frame with lat-lon coordinates
+    lon_col: column name of longitude coordinate
+    lat_col: column name of latitude coordinate
+    speed_kmh: average travel speed
+    slow_down: factor by which to slow-down travel speed and increase duration.
+    chunk_size: number of rows computed at once
+    out: optional preallocated `time_matrix` and `distance_matrix`, e.g. memory-maps
+        from `np.lib.format.open_memmap`, filled in place so matrices larger than
+        memory can be built.
+    Return:
+    time_matrix: straight-line travel time (seconds) between stops i and j, float32
+        unless given in `out`.
+    distance_matrix: straight-line distance (meters) between stops i and j, float32
+        unless given in `out`.
+    """
+    coordinates = data[[lon_col, lat_col]].to_numpy(dtype=float)
+    block_out = None
+    if out is not None:
+        block_out = {"durations": out["time_matrix"], "distances": out["distance_matrix"]}
+    time_matrix, distance_matrix = haversine_time_dist_block(
+        coordinates,
+        coordinates,
+        speed_kmh=speed_kmh,
+        slow_down=slow_down,
+        chunk_size=chunk_size,
+        out=block_out,
+    )
+    return {"time_matrix": time_matrix, "distance_matrix": distance_matrix}
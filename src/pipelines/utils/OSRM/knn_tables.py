@@ -0,0 +1,148 @@
+"""
+Sparse k-nearest-neighbour OSRM time and distance matrices.
+
+Candidates are prefiltered by straight-line distance with a haversine `BallTree` and
+only the travel times and distances from every stop to its `k` candidates are requested,
+in batches of spatially close stops. Memory and request volume grow with `N * k`
+instead of `N * N`, so matrices stay usable for tens of thousands of stops.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.neighbors import BallTree
+
+from pipelines.utils.OSRM.client import OsrmClient, resolve_client
+from pipelines.utils.OSRM.matrix_service import (
+    PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT,
+    TABLE_MAX_WORKERS,
+    construct_coordinates,
+    construct_table_url,
+    get_distance_matrix,
+    get_time_matrix,
+    send_get_request,
+)
+
+logger = logging.getLogger(__name__)
+
+KNN_DEFAULT_NEIGHBOURS = 10
+
+
+def nearest_candidates(
+    data: pd.DataFrame, k: int, lon_col: str = "longitude", lat_col: str = "latitude"
+) -> Dict[str, np.ndarray]:
+    """
+    Find the `k` closest other stops of every stop by straight-line distance.
+
+    Returns:
+        candidates: `n_stops` x `k` stop indices, closest first.
+        order: stop indices in the tree's leaf order, which keeps spatially close
+            stops together and is used to batch requests.
+    """
+    n_stops = data.shape[0]
+    k = min(k, n_stops - 1)
+    tree = BallTree(np.radians(data[[lat_col, lon_col]].to_numpy()), metric="haversine")
+    _, neighbours = tree.query(
+        np.radians(data[[lat_col, lon_col]].to_numpy()), k=k + 1
+    )
+    # drop the stop itself, or the furthest candidate when a duplicate came first
+    is_self = neighbours == np.arange(n_stops)[:, None]
+    is_self[~is_self.any(axis=1), -1] = True
+    candidates = neighbours[~is_self].reshape(n_stops, k)
+    return {"candidates": candidates, "order": tree.get_arrays()[1].copy()}
+
+
+def get_knn_time_dist_matrix(
+    data: pd.DataFrame,
+    k: int = KNN_DEFAULT_NEIGHBOURS,
+    endpoint: Union[str, OsrmClient, None] = None,
+    lon_col: str = "longitude",
+    lat_col: str = "latitude",
+    timeout: float = 120,
+    slow_down: float = 1,
+    batch_size: Union[int, None] = None,
+    max_workers: int = TABLE_MAX_WORKERS,
+    profile: str = "driving",
+    client: Union[OsrmClient, None] = None,
+) -> Dict[str, sparse.csr_matrix]:
+    """
+    Calculate the time (seconds) and distance (meters) from every stop to its `k`
+    nearest stops.
+    Args:
+    data: data-frame with lat-lon coordinates
+    k: number of straight-line nearest stops requested per stop
+    endpoint: port to OSRM RestAPI, or a pooled `OsrmClient`
+    lon_col: column name of longitude coordinate
+    lat_col: column name of latitude coordinate
+    timeout: time before time-out error occurs for API, per request
+    slow_down: factor by which to slow-down travel speed and increase duration.
+    batch_size: number of stops per `/table` request, defaults to as many as fit
+        `PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT` coordinates with their candidates.
+    max_workers: maximum number of requests sent concurrently.
+    profile: OSRM routing profile.
+    client: pooled OSRM client, defaults to the process-wide client.
+    Return:
+    time_matrix: CSR matrix with the travel time from stop i to each of its candidates j.
+    distance_matrix: CSR matrix with the travel distance from stop i to each of its
+        candidates j. Pairs that are not candidates are not stored, unroutable
+        candidates are stored as NaN.
+    """
+    endpoint, client = resolve_client(endpoint, client)
+    n_stops = data.shape[0]
+    shape = (n_stops, n_stops)
+    if n_stops < 2 or k < 1:
+        empty = sparse.csr_matrix(shape)
+        return {"time_matrix": empty, "distance_matrix": empty.copy()}
+    if batch_size is None:
+        batch_size = max(1, PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT // (k + 1))
+
+    neighbours = nearest_candidates(data, k, lon_col, lat_col)
+    candidates = neighbours["candidates"]
+    k = candidates.shape[1]
+    coordinates = construct_coordinates(data, lon_col, lat_col)
+    table_end_point = f"{endpoint}/table/v1/{profile}/"
+    durations = np.empty(candidates.shape)
+    distances = np.empty(candidates.shape)
+
+    def _fetch_batch(sources: np.ndarray):
+        destinations = np.unique(candidates[sources])
+        points = np.union1d(sources, destinations)
+        url = construct_table_url(
+            table_end_point,
+            coordinates[points],
+            sources=np.searchsorted(points, sources),
+            destinations=np.searchsorted(points, destinations),
+        )
+        api_response = send_get_request(url, timeout, client)
+        columns = np.searchsorted(destinations, candidates[sources])
+        rows = np.arange(sources.shape[0])[:, None]
+        durations[sources] = get_time_matrix(api_response, slow_down)[rows, columns]
+        distances[sources] = get_distance_matrix(api_response)[rows, columns]
+
+    order = neighbours["order"]
+    batches = [order[start : start + batch_size] for start in range(0, n_stops, batch_size)]
+    logger.info(
+        "Requesting %i nearest stops for %i stops in %i batches",
+        k,
+        n_stops,
+        len(batches),
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_fetch_batch, sources) for sources in batches]
+        for future in as_completed(futures):
+            future.result()
+
+    indptr = np.arange(0, n_stops * k + 1, k)
+    indices = candidates.reshape(-1)
+    time_matrix = sparse.csr_matrix(
+        (durations.reshape(-1), indices, indptr), shape=shape
+    )
+    distance_matrix = sparse.csr_matrix(
+        (distances.reshape(-1), indices.copy(), indptr.copy()), shape=shape
+    )
+    time_matrix.sort_indices()
+    distance_matrix.sort_indices()
+    return {"time_matrix": time_matrix, "distance_matrix": distance_matrix}
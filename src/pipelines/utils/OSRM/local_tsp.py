@@ -0,0 +1,167 @@
+"""
+Local open-path TSP solver over a (possibly asymmetric) duration matrix, e.g. from
+`get_osrm_tables.get_time_dist_matrix`. Builds a nearest-neighbour path and improves it
+with vectorised 2-opt and Or-opt moves, without the stop limits of the OSRM trip service.
+"""
+import logging
+from typing import Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TSP_MAX_ITERATIONS = 10000
+LOCAL_TSP_OR_OPT_SEGMENTS = (1, 2, 3)
+_IMPROVEMENT_TOLERANCE = 1e-9
+
+
+def path_cost(path: np.ndarray, matrix: np.ndarray) -> float:
+    """Total cost of visiting `path` in order."""
+    return float(matrix[path[:-1], path[1:]].sum())
+
+
+def nearest_neighbour_path(
+    matrix: np.ndarray, start: int = 0, end: Union[int, None] = None
+) -> np.ndarray:
+    """Greedy path from `start` that always visits the closest unvisited stop next,
+    finishing at `end`."""
+    n_stops = matrix.shape[0]
+    if end is None:
+        end = n_stops - 1
+    unvisited = np.ones(n_stops, dtype=bool)
+    unvisited[[start, end]] = False
+    path = [start]
+    for _ in range(n_stops - 2 if start != end else n_stops - 1):
+        costs = np.where(unvisited, matrix[path[-1]], np.inf)
+        closest = int(np.argmin(costs))
+        unvisited[closest] = False
+        path.append(closest)
+    if start != end:
+        path.append(end)
+    return np.array(path)
+
+
+def _best_two_opt_move(path: np.ndarray, matrix: np.ndarray) -> Tuple[float, int, int]:
+    """Best reversal of `path[i:j + 1]`, keeping the first and last stop fixed."""
+    forward = np.concatenate([[0], np.cumsum(matrix[path[:-1], path[1:]])])
+    backward = np.concatenate([[0], np.cumsum(matrix[path[1:], path[:-1]])])
+    positions = np.arange(1, path.shape[0] - 1)
+    i, j = positions[:, None], positions[None, :]
+    delta = (
+        matrix[path[i - 1], path[j]]
+        + matrix[path[i], path[j + 1]]
+        - matrix[path[i - 1], path[i]]
+        - matrix[path[j], path[j + 1]]
+        + (backward[j] - backward[i])
+        - (forward[j] - forward[i])
+    )
+    delta = np.where(j > i, delta, np.inf)
+    best = np.unravel_index(np.argmin(delta), delta.shape)
+    return float(delta[best]), int(positions[best[0]]), int(positions[best[1]])
+
+
+def two_opt(
+    path: np.ndarray,
+    matrix: np.ndarray,
+    max_iterations: int = LOCAL_TSP_MAX_ITERATIONS,
+) -> np.ndarray:
+    """Apply the best improving segment reversal until none is left."""
+    path = path.copy()
+    if path.shape[0] < 4:
+        return path
+    for _ in range(max_iterations):
+        delta, i, j = _best_two_opt_move(path, matrix)
+        if delta >= -_IMPROVEMENT_TOLERANCE:
+            break
+        path[i : j + 1] = path[i : j + 1][::-1]
+    return path
+
+
+def _best_or_opt_move(
+    path: np.ndarray, matrix: np.ndarray, segment_length: int
+) -> Tuple[float, int, int]:
+    """Best relocation of `path[i:i + segment_length]` between `path[k]` and
+    `path[k + 1]`, keeping the first and last stop fixed."""
+    n_stops = path.shape[0]
+    starts = np.arange(1, n_stops - segment_length)
+    gaps = np.arange(0, n_stops - 1)
+    i, k = starts[:, None], gaps[None, :]
+    first, last = path[i], path[i + segment_length - 1]
+    before, after = path[i - 1], path[i + segment_length]
+    removal_gain = (
+        matrix[before, first] + matrix[last, after] - matrix[before, after]
+    )
+    insertion_cost = (
+        matrix[path[k], first] + matrix[last, path[k + 1]] - matrix[path[k], path[k + 1]]
+    )
+    delta = insertion_cost - removal_gain
+    overlapping = (k >= i - 1) & (k <= i + segment_length - 1)
+    delta = np.where(overlapping, np.inf, delta)
+    best = np.unravel_index(np.argmin(delta), delta.shape)
+    return float(delta[best]), int(starts[best[0]]), int(gaps[best[1]])
+
+
+def or_opt(
+    path: np.ndarray,
+    matrix: np.ndarray,
+    segment_lengths: Tuple[int, ...] = LOCAL_TSP_OR_OPT_SEGMENTS,
+    max_iterations: int = LOCAL_TSP_MAX_ITERATIONS,
+) -> np.ndarray:
+    """Apply the best improving relocation of short segments until none is left."""
+    path = path.copy()
+    for _ in range(max_iterations):
+        moves = [
+            (*_best_or_opt_move(path, matrix, length), length)
+            for length in segment_lengths
+            if path.shape[0] - length > 2
+        ]
+        if not moves:
+            break
+        delta, i, k, length = min(moves)
+        if delta >= -_IMPROVEMENT_TOLERANCE:
+            break
+        segment = path[i : i + length]
+        remaining = np.concatenate([path[:i], path[i + length :]])
+        insert_at = k + 1 if k < i else k + 1 - length
+        path = np.concatenate(
+            [remaining[:insert_at], segment, remaining[insert_at:]]
+        )
+    return path
+
+
+def solve_open_tsp(
+    matrix: np.ndarray,
+    start: int = 0,
+    end: Union[int, None] = None,
+    max_iterations: int = LOCAL_TSP_MAX_ITERATIONS,
+) -> np.ndarray:
+    """
+    Sequence all stops of `matrix` from `start` to `end`.
+
+    Args:
+        matrix: travel cost from stop i (row) to stop j (column), may be asymmetric.
+        start: index of the first stop, e.g. the depot departure.
+        end: index of the last stop, defaults to the last row, e.g. the depot return.
+        max_iterations: maximum number of improvement rounds.
+    Returns:
+        stop indices in visiting order.
+    """
+    n_stops = matrix.shape[0]
+    if end is None:
+        end = n_stops - 1
+    matrix = np.asarray(matrix, dtype=float)
+    finite = np.isfinite(matrix)
+    # unroutable pairs get a large finite penalty, so move deltas stay well defined
+    penalty = (np.abs(matrix[finite]).max() if finite.any() else 1) * n_stops * 10
+    matrix = np.where(finite, matrix, penalty)
+    path = nearest_neighbour_path(matrix, start, end)
+    cost = path_cost(path, matrix)
+    logger.debug("Nearest neighbour path cost: %.1f", cost)
+    for _ in range(max_iterations):
+        path = or_opt(two_opt(path, matrix, max_iterations), matrix)
+        improved_cost = path_cost(path, matrix)
+        if improved_cost >= cost - _IMPROVEMENT_TOLERANCE:
+            break
+        cost = improved_cost
+    logger.debug("Improved path cost: %.1f", cost)
+    return path
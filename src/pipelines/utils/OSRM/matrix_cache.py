@@ -0,0 +1,359 @@
+"""
+Persistent, content-addressed cache of OSRM duration and distance matrices.
+
+Entries are keyed by a hash of the rounded coordinates, routing profile, endpoint and
+the value filled in for unroutable pairs, and stored as float32 `.npy` files that are
+memory-mapped when read. Entries are evicted least-recently-used first once the cache
+exceeds its size budget.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MATRIX_CACHE_DIR = "data/.cashed/osrm_tables"
+MATRIX_CACHE_MAX_SIZE_BYTES = 2 * 1024**3
+SNAP_PRECISION = 6  # decimals, ~0.1 meter and the precision OSRM works at
+
+FetchBlock = Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def match_coordinates(
+    coordinates: np.ndarray, known_coordinates: np.ndarray
+) -> np.ndarray:
+    """Position of every coordinate in `known_coordinates`, or -1 when it is not there."""
+    lookup = {tuple(point): i for i, point in enumerate(np.asarray(known_coordinates))}
+    return np.array(
+        [lookup.get(tuple(point), -1) for point in np.asarray(coordinates)], dtype=int
+    )
+
+
+def splice_time_dist_matrix(
+    positions: np.ndarray,
+    known_time_matrix: np.ndarray,
+    known_distance_matrix: np.ndarray,
+    fetch_block: FetchBlock,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the matrices of all stops from known matrices, fetching only what is missing.
+
+    Args:
+        positions: for every stop its row in the known matrices, or -1 when unknown.
+        known_time_matrix: durations between the known stops.
+        known_distance_matrix: distances between the known stops.
+        fetch_block: function returning durations and distances from source to
+            destination stop indices
+    Returns:
+        durations and distances of all stops; known stops that are not in `positions`
+        are dropped.
+    """
+    n_stops = positions.shape[0]
+    stops = np.arange(n_stops)
+    known = np.flatnonzero(positions >= 0)
+    missing = np.flatnonzero(positions < 0)
+    time_matrix = np.empty((n_stops, n_stops), dtype=np.float32)
+    distance_matrix = np.empty((n_stops, n_stops), dtype=np.float32)
+    known_block = np.ix_(positions[known], positions[known])
+    time_matrix[np.ix_(known, known)] = known_time_matrix[known_block]
+    distance_matrix[np.ix_(known, known)] = known_distance_matrix[known_block]
+    if missing.shape[0] > 0:
+        missing_rows = np.ix_(missing, stops)
+        time_matrix[missing_rows], distance_matrix[missing_rows] = fetch_block(
+            missing, stops
+        )
+        missing_columns = np.ix_(known, missing)
+        time_matrix[missing_columns], distance_matrix[missing_columns] = fetch_block(
+            known, missing
+        )
+    return time_matrix, distance_matrix
+
+
+def _null_token(null_value: float) -> str:
+    """Stable text form of the unroutable fill value, `nan` and `inf` included."""
+    return repr(float(null_value))
+
+
+class MatrixCache:
+    """On-disk LRU cache of OSRM time and distance matrices.
+
+    Args:
+        cache_dir: directory holding one sub-directory per cached matrix.
+        max_size_bytes: total size above which least recently used entries are evicted.
+        precision: number of decimals coordinates are rounded to before hashing.
+
+    Examples:
+
+        '''python
+        cache = MatrixCache()
+        matrices = get_time_dist_matrix(stops, endpoint=port, cache=cache)
+        '''
+    """
+
+    _cache_dir: Path
+    _max_size_bytes: int
+    _precision: int
+    _index: Dict[str, Dict]
+
+    def __init__(
+        self,
+        cache_dir: str = MATRIX_CACHE_DIR,
+        max_size_bytes: int = MATRIX_CACHE_MAX_SIZE_BYTES,
+        precision: int = SNAP_PRECISION,
+    ):
+        self._cache_dir = Path(cache_dir)
+        self._max_size_bytes = max_size_bytes
+        self._precision = precision
+        self._index = {}
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def round_coordinates(self, coordinates: np.ndarray) -> np.ndarray:
+        """Round `[lon, lat]` coordinates to the cache precision."""
+        return np.round(np.asarray(coordinates, dtype=float), self._precision)
+
+    def key(
+        self,
+        coordinates: np.ndarray,
+        endpoint: str,
+        profile: str,
+        null_value: float = np.nan,
+    ) -> str:
+        """Content hash of the rounded coordinates, profile, endpoint and null value."""
+        digest = hashlib.sha1(
+            f"{endpoint}|{profile}|{_null_token(null_value)}|".encode()
+        )
+        digest.update(np.ascontiguousarray(self.round_coordinates(coordinates)).data)
+        return digest.hexdigest()
+
+    def _entries(self):
+        return [
+            path
+            for path in self._cache_dir.iterdir()
+            if path.is_dir() and (path / "meta.json").exists()
+        ]
+
+    @staticmethod
+    def _touch(entry: Path):
+        os.utime(entry)
+
+    def load(self, entry: Path) -> Dict[str, np.ndarray]:
+        """Memory-map a cached entry."""
+        self._touch(entry)
+        return {
+            "coordinates": np.load(entry / "coordinates.npy"),
+            "time_matrix": np.load(entry / "time_matrix.npy", mmap_mode="r"),
+            "distance_matrix": np.load(entry / "distance_matrix.npy", mmap_mode="r"),
+        }
+
+    def get(
+        self,
+        coordinates: np.ndarray,
+        endpoint: str,
+        profile: str,
+        null_value: float = np.nan,
+    ) -> Union[Dict[str, np.ndarray], None]:
+        """Return the memory-mapped matrices of an exact hit, otherwise `None`."""
+        entry = self._cache_dir / self.key(coordinates, endpoint, profile, null_value)
+        if not (entry / "meta.json").exists():
+            return None
+        try:
+            return self.load(entry)
+        except FileNotFoundError:
+            logger.info("OSRM matrix `%s` was evicted while reading it", entry.name)
+            return None
+
+    @staticmethod
+    def _points(rounded: np.ndarray) -> FrozenSet[bytes]:
+        return frozenset(point.tobytes() for point in rounded)
+
+    def _index_entry(self, entry: Path) -> Dict:
+        """
+        Endpoint, profile, null value and coordinate set of an entry, read once per
+        entry.
+        """
+        if entry.name not in self._index:
+            with open(entry / "meta.json") as f:
+                meta = json.load(f)
+            self._index[entry.name] = {
+                "endpoint": meta["endpoint"],
+                "profile": meta["profile"],
+                "null_value": meta.get("null_value", _null_token(np.nan)),
+                "points": self._points(np.load(entry / "coordinates.npy")),
+            }
+        return self._index[entry.name]
+
+    def find_overlap(
+        self,
+        coordinates: np.ndarray,
+        endpoint: str,
+        profile: str,
+        null_value: float = np.nan,
+    ) -> Tuple[Union[Path, None], np.ndarray]:
+        """
+        Find the cached entry sharing the most coordinates with `coordinates`.
+
+        Entries are compared through an in-memory index of their coordinates, largest
+        first, and only the coordinates of the best entry are read back.
+
+        Returns:
+            the entry (or `None`) and, for every coordinate, its position in the entry
+            or -1 when the entry does not contain it.
+        """
+        rounded = self.round_coordinates(coordinates)
+        entries = self._entries()
+        self._index = {
+            entry.name: self._index[entry.name]
+            for entry in entries
+            if entry.name in self._index
+        }
+        namespace = (endpoint, profile, _null_token(null_value))
+        candidates = []
+        for entry in entries:
+            try:
+                index = self._index_entry(entry)
+            except FileNotFoundError:
+                continue
+            if (index["endpoint"], index["profile"], index["null_value"]) == namespace:
+                candidates.append((entry, index["points"]))
+        candidates.sort(key=lambda candidate: len(candidate[1]), reverse=True)
+
+        points = self._points(rounded)
+        best_entry, best_overlap = None, 0
+        for entry, entry_points in candidates:
+            if len(entry_points) <= best_overlap:
+                break
+            overlap = len(points & entry_points)
+            if overlap > best_overlap:
+                best_entry, best_overlap = entry, overlap
+        if best_entry is None:
+            return None, np.full(rounded.shape[0], -1)
+        try:
+            known_coordinates = np.load(best_entry / "coordinates.npy")
+        except FileNotFoundError:
+            return None, np.full(rounded.shape[0], -1)
+        return best_entry, match_coordinates(rounded, known_coordinates)
+
+    def put(
+        self,
+        coordinates: np.ndarray,
+        endpoint: str,
+        profile: str,
+        time_matrix: np.ndarray,
+        distance_matrix: np.ndarray,
+        null_value: float = np.nan,
+    ):
+        """Store matrices as float32 `.npy` files and evict old entries if needed."""
+        key = self.key(coordinates, endpoint, profile, null_value)
+        entry = self._cache_dir / key
+        if entry.exists():
+            self._touch(entry)
+            return
+        staging = self._cache_dir / f".{key}.{uuid.uuid4().hex}"
+        staging.mkdir()
+        np.save(staging / "coordinates.npy", self.round_coordinates(coordinates))
+        np.save(staging / "time_matrix.npy", time_matrix.astype(np.float32))
+        np.save(staging / "distance_matrix.npy", distance_matrix.astype(np.float32))
+        with open(staging / "meta.json", "w") as f:
+            json.dump(
+                {
+                    "endpoint": endpoint,
+                    "profile": profile,
+                    "null_value": _null_token(null_value),
+                    "n_stops": int(time_matrix.shape[0]),
+                    "created": time.time(),
+                },
+                f,
+            )
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            logger.info("OSRM matrix `%s` was cached by a concurrent writer", key)
+            return
+        logger.info("Cached %i x %i OSRM matrix as `%s`", *time_matrix.shape, key)
+        self.evict()
+
+    @staticmethod
+    def _entry_size(entry: Path) -> int:
+        return sum(file.stat().st_size for file in entry.iterdir())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size budget."""
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        sizes = {entry: self._entry_size(entry) for entry in entries}
+        total_size = sum(sizes.values())
+        for entry in entries:
+            if total_size <= self._max_size_bytes:
+                break
+            logger.info("Evicting OSRM matrix cache entry `%s`", entry.name)
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= sizes[entry]
+
+
+def cached_time_dist_matrix(
+    cache: MatrixCache,
+    coordinates: np.ndarray,
+    endpoint: str,
+    profile: str,
+    fetch_block: FetchBlock,
+    null_value: float = np.nan,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the duration and distance matrices of `coordinates`, reusing cached entries.
+
+    An exact hit is returned memory-mapped. On a partial hit only the rows and columns
+    of stops missing from the best overlapping entry are requested through
+    `fetch_block(sources, destinations)`; on a miss the full matrix is requested. New
+    results are written back to the cache. An entry evicted by another process while it
+is being read counts as a miss.
+
+    Args:
+        cache: matrix cache
+        coordinates: `[lon, lat]` coordinates of all stops
+        endpoint: port to OSRM RestAPI
+        profile: OSRM routing profile
+        fetch_block: function returning durations and distances from source to
+            destination stop indices
+        null_value: value `fetch_block` fills in for unroutable pairs
+    Returns:
+        durations and distances, not slowed down.
+    """
+    hit = cache.get(coordinates, endpoint, profile, null_value)
+    if hit is not None:
+        logger.info("OSRM matrix cache hit for %i stops", coordinates.shape[0])
+        return hit["time_matrix"], hit["distance_matrix"]
+
+    n_stops = coordinates.shape[0]
+    stops = np.arange(n_stops)
+    entry, positions = cache.find_overlap(coordinates, endpoint, profile, null_value)
+    cached = None
+    if entry is not None:
+        try:
+            cached = cache.load(entry)
+        except FileNotFoundError:
+            logger.info("OSRM matrix `%s` was evicted while reading it", entry.name)
+    if cached is None:
+        logger.info("OSRM matrix cache miss for %i stops", n_stops)
+        time_matrix, distance_matrix = fetch_block(stops, stops)
+    else:
+        logger.info(
+            "OSRM matrix cache partial hit, requesting %i of %i stops",
+            (positions < 0).sum(),
+            n_stops,
+        )
+        time_matrix, distance_matrix = splice_time_dist_matrix(
+            positions, cached["time_matrix"], cached["distance_matrix"], fetch_block
+        )
+
+    cache.put(
+        coordinates, endpoint, profile, time_matrix, distance_matrix, null_value
+    )
+    return time_matrix, distance_matrix
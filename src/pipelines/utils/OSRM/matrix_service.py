@@ -0,0 +1,510 @@
+"""
+Travel time and distance matrices from pluggable backends.
+
+`MatrixService` snaps and deduplicates stops, reuses cached matrices, applies
+`slow_down` and only asks its backend for the blocks it is missing. Backends are the
+OSRM `/table` service (see https://project-osrm.org/docs/v5.24.0/api/#table-service)
+and a straight-line estimator, and both give the same float32 `TravelMatrices`, so
+pipelines can switch between a cheap estimate and exact routing per run.
+"""
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from pipelines.utils.OSRM.client import OsrmClient, resolve_client
+from pipelines.utils.OSRM.haversine import (
+    HAVERSINE_CHUNK_SIZE,
+    HAVERSINE_SPEED_KMH,
+    haversine_time_dist_block,
+)
+from pipelines.utils.OSRM.matrix_cache import (
+    SNAP_PRECISION,
+    MatrixCache,
+    cached_time_dist_matrix,
+    match_coordinates,
+    splice_time_dist_matrix,
+)
+from pipelines.utils.OSRM.table_decoder import STREAM_CHUNK_SIZE, decode_table_response
+
+logger = logging.getLogger(__name__)
+
+PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT = 1000
+TABLE_MAX_WORKERS = 4
+
+
+def deduplicate_coordinates(
+    coordinates: np.ndarray, precision: Union[int, None] = SNAP_PRECISION
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Snap `[lon, lat]` coordinates to `precision` decimals and drop repeated points.
+
+    Returns:
+        unique snapped coordinates, in order of first appearance, and for every
+        coordinate the position of its unique point, so that
+        `matrix[np.ix_(inverse, inverse)]` expands a unique-point matrix to all stops.
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    if precision is not None:
+        coordinates = np.round(coordinates, precision)
+    _, first_index, inverse = np.unique(
+        coordinates, axis=0, return_index=True, return_inverse=True
+    )
+    order = np.argsort(first_index)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.shape[0])
+    return coordinates[first_index[order]], rank[inverse.reshape(-1)]
+
+
+def construct_coordinates(
+    data: pd.DataFrame, lon_col: str = "longitude", lat_col: str = "latitude"
+) -> np.ndarray:
+    """Format each stop as an OSRM `lon,lat` coordinate string."""
+    coordinates = data[lon_col].astype(str) + "," + data[lat_col].astype(str)
+    return coordinates.to_numpy()
+
+
+def construct_table_url(
+    endpoint: str,
+    coordinates: np.ndarray,
+    sources: Union[List[int], None] = None,
+    destinations: Union[List[int], None] = None,
+) -> str:
+    """
+    Function takes formatted coordinates & builds url request, optionally restricted
+    to a subset of sources and destinations.
+    """
+    url = f"{endpoint}{';'.join(coordinates)}?annotations=distance,duration"
+    if sources is not None:
+        url += "&sources=" + ";".join(map(str, sources))
+    if destinations is not None:
+        url += "&destinations=" + ";".join(map(str, destinations))
+    return url
+
+
+def send_get_request(url: str, timeout: float, client: OsrmClient) -> dict:
+    """Request a table url through the pooled OSRM client."""
+    return client.get_json(url, timeout=timeout)
+
+
+def get_time_matrix(api_response: dict, slow_down: Union[float, int]) -> np.ndarray:
+    """Durations of a table response, slowed down by `slow_down`."""
+    time_matrix = np.array(api_response["durations"], dtype=float) * slow_down
+    return time_matrix
+
+
+def get_distance_matrix(api_response) -> np.ndarray:
+    """Distances of a table response."""
+    distance_matrix = np.array(api_response["distances"], dtype=float)
+    return distance_matrix
+
+
+def _stream_table_response(
+    url: str,
+    timeout: float,
+    client: OsrmClient,
+    out: Dict[str, np.ndarray],
+    null_value: float,
+) -> Dict[str, np.ndarray]:
+    n_sources, n_destinations = out["durations"].shape
+    with client.stream(url, timeout=timeout) as response:
+        return decode_table_response(
+            response.iter_content(STREAM_CHUNK_SIZE),
+            n_sources,
+            n_destinations,
+            out=out,
+            null_value=null_value,
+        )
+
+
+def _generate_tiles(n_stops: int, tile_size: int) -> List[slice]:
+    """Split `n_stops` positions into blocks of at most `tile_size` stops."""
+    return [
+        slice(start, min(start + tile_size, n_stops))
+        for start in range(0, n_stops, tile_size)
+    ]
+
+
+def _construct_tile_url(
+    coordinates: np.ndarray,
+    table_end_point: str,
+    sources: np.ndarray,
+    destinations: np.ndarray,
+) -> str:
+    """
+    Build the request for a single block of the matrix. Diagonal blocks send their
+    coordinates once, off-diagonal blocks send sources followed by destinations and
+    select them with OSRM's `sources`/`destinations` parameters.
+    """
+    if np.array_equal(sources, destinations):
+        return construct_table_url(table_end_point, coordinates[sources])
+    n_sources = sources.shape[0]
+    n_destinations = destinations.shape[0]
+    return construct_table_url(
+        table_end_point,
+        np.concatenate([coordinates[sources], coordinates[destinations]]),
+        sources=list(range(n_sources)),
+        destinations=list(range(n_sources, n_sources + n_destinations)),
+    )
+
+
+def fetch_time_dist_block(
+    coordinates: np.ndarray,
+    endpoint: str,
+    sources: np.ndarray,
+    destinations: np.ndarray,
+    tile_size: int = PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT,
+    max_workers: int = TABLE_MAX_WORKERS,
+    timeout: float = 120,
+    profile: str = "driving",
+    streaming: bool = False,
+    null_value: float = np.nan,
+    client: Union[OsrmClient, None] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Retrieve the durations (seconds) and distances (meters) from `sources` to
+    `destinations`, tiling the request into blocks that are fetched concurrently.
+    Args:
+    coordinates: OSRM `lon,lat` coordinate strings of all stops
+    endpoint: port to OSRM RestAPI
+    sources: indices of the stops to route from
+    destinations: indices of the stops to route to
+    tile_size: maximum number of sources and destinations per request
+    max_workers: maximum number of blocks requested concurrently
+    timeout: time before time-out error occurs for API, per block
+    profile: OSRM routing profile
+    streaming: decode responses chunk by chunk straight into float32 matrices
+    null_value: value of unroutable pairs when streaming
+    client: pooled OSRM client, defaults to the process-wide client
+    Return:
+    durations: `len(sources)` x `len(destinations)` travel times, not slowed down.
+    distances: `len(sources)` x `len(destinations)` travel distances.
+    """
+    endpoint, client = resolve_client(endpoint, client)
+    table_end_point = f"{endpoint}/table/v1/{profile}/"
+    shape = (sources.shape[0], destinations.shape[0])
+    durations = np.empty(shape, dtype=np.float32)
+    distances = np.empty(shape, dtype=np.float32)
+
+    def _fetch_tile(rows: slice, columns: slice):
+        url = _construct_tile_url(
+            coordinates, table_end_point, sources[rows], destinations[columns]
+        )
+        if streaming:
+            out = {
+                "durations": durations[rows, columns],
+                "distances": distances[rows, columns],
+            }
+            _stream_table_response(url, timeout, client, out, null_value)
+        else:
+            api_response = send_get_request(url, timeout, client)
+            durations[rows, columns] = get_time_matrix(api_response, 1)
+            distances[rows, columns] = get_distance_matrix(api_response)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_fetch_tile, rows, columns)
+            for rows in _generate_tiles(shape[0], tile_size)
+            for columns in _generate_tiles(shape[1], tile_size)
+        ]
+        for future in as_completed(futures):
+            future.result()
+
+    return durations, distances
+
+
+class TravelMatrices:
+    """Float32 travel durations (seconds) and distances (meters) between stops.
+
+    Args:
+        time_matrix: travel time from stop i (row) to stop j (column).
+        distance_matrix: travel distance from stop i (row) to stop j (column).
+        coordinates: `[lon, lat]` coordinates of the stops, as used by the backend.
+        slow_down: factor the durations were slowed down by.
+    """
+
+    time_matrix: np.ndarray
+    distance_matrix: np.ndarray
+    coordinates: np.ndarray
+    slow_down: float
+
+    def __init__(
+        self,
+        time_matrix: np.ndarray,
+        distance_matrix: np.ndarray,
+        coordinates: np.ndarray,
+        slow_down: float = 1,
+    ):
+        self.time_matrix = time_matrix.astype(np.float32, copy=False)
+        self.distance_matrix = distance_matrix.astype(np.float32, copy=False)
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        self.slow_down = slow_down
+
+    @property
+    def n_stops(self) -> int:
+        return self.coordinates.shape[0]
+
+    def as_dict(self) -> Dict[str, np.ndarray]:
+        """Matrices as returned by `get_osrm_tables.get_time_dist_matrix`."""
+        return {"time_matrix": self.time_matrix, "distance_matrix": self.distance_matrix}
+
+    def as_tuple(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Matrices as returned by `get_table.get_time_dist_matrix`."""
+        return self.time_matrix, self.distance_matrix
+
+
+class MatrixBackend(ABC):
+    """Source of travel durations and distances between `[lon, lat]` points."""
+
+    cacheable: bool = True
+
+    @abstractmethod
+    def cache_namespace(self) -> Tuple[str, str, float]:
+        """Endpoint, profile and unroutable value under which results are cached."""
+
+    @abstractmethod
+    def fetch_block(
+        self, points: np.ndarray, sources: np.ndarray, destinations: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Durations (seconds, not slowed down) and distances (meters) from the `sources`
+        to the `destinations` indices of `points`, as float32 arrays.
+        """
+
+
+class OsrmBackend(MatrixBackend):
+    """Exact travel times and distances from the OSRM `/table` service.
+
+    Args:
+        endpoint: port to OSRM RestAPI, or a pooled `OsrmClient`.
+        client: pooled OSRM client, defaults to the process-wide client.
+        profile: OSRM routing profile.
+        tile_size: maximum number of sources and destinations per request.
+        max_workers: maximum number of blocks requested concurrently.
+        timeout: time before time-out error occurs for API, per block.
+        streaming: decode responses chunk by chunk straight into float32 matrices.
+        null_value: value of unroutable pairs when streaming.
+    """
+
+    _endpoint: str
+    _client: OsrmClient
+    _profile: str
+    _tile_size: int
+    _max_workers: int
+    _timeout: float
+    _streaming: bool
+    _null_value: float
+
+    def __init__(
+        self,
+        endpoint: Union[str, OsrmClient, None] = None,
+        client: Union[OsrmClient, None] = None,
+        profile: str = "driving",
+        tile_size: Union[int, None] = None,
+        max_workers: int = TABLE_MAX_WORKERS,
+        timeout: float = 120,
+        streaming: bool = False,
+        null_value: float = np.nan,
+    ):
+        self._endpoint, self._client = resolve_client(endpoint, client)
+        self._profile = profile
+        self._tile_size = tile_size or PORT_TYPE_MAPPING_DEFAULT_STOP_LIMIT
+        self._max_workers = max_workers
+        self._timeout = timeout
+        self._streaming = streaming
+        self._null_value = null_value
+
+    def cache_namespace(self) -> Tuple[str, str, float]:
+        # parsed JSON turns OSRM's `null` into NaN, only streaming fills `null_value`
+        null_value = self._null_value if self._streaming else np.nan
+        return self._endpoint, self._profile, null_value
+
+    def fetch_block(
+        self, points: np.ndarray, sources: np.ndarray, destinations: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        coordinates = construct_coordinates(
+            pd.DataFrame(points, columns=["longitude", "latitude"])
+        )
+        return fetch_time_dist_block(
+            coordinates,
+            self._endpoint,
+            sources,
+            destinations,
+            tile_size=self._tile_size,
+            max_workers=self._max_workers,
+            timeout=self._timeout,
+            profile=self._profile,
+            streaming=self._streaming,
+            null_value=self._null_value,
+            client=self._client,
+        )
+
+
+class HaversineBackend(MatrixBackend):
+    """Fast straight-line approximation: great-circle distances at an average speed.
+
+    Args:
+        speed_kmh: average travel speed.
+        chunk_size: number of rows computed at once, bounding temporary memory.
+    """
+
+    cacheable = False
+    _speed_kmh: float
+    _chunk_size: int
+
+    def __init__(
+        self,
+        speed_kmh: float = HAVERSINE_SPEED_KMH,
+        chunk_size: int = HAVERSINE_CHUNK_SIZE,
+    ):
+        self._speed_kmh = speed_kmh
+        self._chunk_size = chunk_size
+
+    def cache_namespace(self) -> Tuple[str, str, float]:
+        return "haversine", f"{self._speed_kmh}kmh", np.nan
+
+    def fetch_block(
+        self, points: np.ndarray, sources: np.ndarray, destinations: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return haversine_time_dist_block(
+            points[sources],
+            points[destinations],
+            speed_kmh=self._speed_kmh,
+            chunk_size=self._chunk_size,
+        )
+
+
+class MatrixService:
+    """Build travel matrices from a backend, sharing snapping, caching and slow-down.
+
+    Args:
+        backend: source of durations and distances.
+        cache: optional on-disk matrix cache; only stops missing from it are requested.
+        precision: decimals stops are snapped to before requesting; stops at the same
+            snapped point, e.g. several bins per site, are requested once and expanded
+            back afterwards. `None` only merges exactly equal coordinates.
+
+    Examples:
+
+        '''python
+        estimate = MatrixService(HaversineBackend(speed_kmh=25)).get_matrices(stops)
+        exact = MatrixService(OsrmBackend(port), cache=MatrixCache()).get_matrices(stops)
+        '''
+    """
+
+    _backend: MatrixBackend
+    _cache: Union[MatrixCache, None]
+    _precision: Union[int, None]
+
+    def __init__(
+        self,
+        backend: MatrixBackend,
+        cache: Union[MatrixCache, None] = None,
+        precision: Union[int, None] = SNAP_PRECISION,
+    ):
+        self._backend = backend
+        self._cache = cache if backend.cacheable else None
+        self._precision = precision
+
+    def _snap(self, data: pd.DataFrame, lon_col: str, lat_col: str) -> np.ndarray:
+        coordinates = data[[lon_col, lat_col]].to_numpy(dtype=float)
+        if self._precision is not None:
+            coordinates = np.round(coordinates, self._precision)
+        return coordinates
+
+    @staticmethod
+    def _slow_down(time_matrix: np.ndarray, slow_down: float) -> np.ndarray:
+        if slow_down == 1:
+            return time_matrix
+        if time_matrix.flags.writeable:
+            time_matrix *= slow_down
+            return time_matrix
+        return time_matrix * np.float32(slow_down)
+
+    def get_matrices(
+        self,
+        data: pd.DataFrame,
+        lon_col: str = "longitude",
+        lat_col: str = "latitude",
+        slow_down: float = 1,
+    ) -> TravelMatrices:
+        """
+        Calculate the travel time (seconds) and distance (meters) between all stops.
+        Args:
+        data: data-frame with lat-lon coordinates
+        lon_col: column name of longitude coordinate
+        lat_col: column name of latitude coordinate
+        slow_down: factor by which to slow-down travel speed and increase duration.
+        Return:
+        travel matrices of all stops. Exact cache hits without slow-down or repeated
+        stops are read-only memory-maps of the cache entry; copy them before writing.
+        """
+        coordinates = self._snap(data, lon_col, lat_col)
+        points, inverse = deduplicate_coordinates(coordinates, None)
+        n_stops, n_points = coordinates.shape[0], points.shape[0]
+        if n_points < n_stops:
+            logger.info("Requesting %i unique points for %i stops", n_points, n_stops)
+
+        def _fetch_block(
+            sources: np.ndarray, destinations: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray]:
+            return self._backend.fetch_block(points, sources, destinations)
+
+        if self._cache is None:
+            stops = np.arange(n_points)
+            time_matrix, distance_matrix = _fetch_block(stops, stops)
+        else:
+            endpoint, profile, null_value = self._backend.cache_namespace()
+            time_matrix, distance_matrix = cached_time_dist_matrix(
+                self._cache, points, endpoint, profile, _fetch_block, null_value
+            )
+        if n_points < n_stops:
+            expand = np.ix_(inverse, inverse)
+            time_matrix, distance_matrix = time_matrix[expand], distance_matrix[expand]
+        return TravelMatrices(
+            self._slow_down(time_matrix, slow_down),
+            distance_matrix,
+            coordinates,
+            slow_down,
+        )
+
+    def update_matrices(
+        self,
+        previous: TravelMatrices,
+        data: pd.DataFrame,
+        lon_col: str = "longitude",
+        lat_col: str = "latitude",
+    ) -> TravelMatrices:
+        """
+        Update matrices after stops were added or removed. Stops of `data` already in
+        `previous` keep their travel times and distances, only the rows and columns of
+        new stops are requested, and removed stops are dropped.
+        """
+        coordinates = self._snap(data, lon_col, lat_col)
+        previous_coordinates = previous.coordinates
+        if self._precision is not None:
+            previous_coordinates = np.round(previous_coordinates, self._precision)
+        positions = match_coordinates(coordinates, previous_coordinates)
+        logger.info(
+            "Updating travel matrices, requesting %i new of %i stops",
+            (positions < 0).sum(),
+            positions.shape[0],
+        )
+
+        def _fetch_block(
+            sources: np.ndarray, destinations: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray]:
+            durations, distances = self._backend.fetch_block(
+                coordinates, sources, destinations
+            )
+            return durations * np.float32(previous.slow_down), distances
+
+        time_matrix, distance_matrix = splice_time_dist_matrix(
+            positions, previous.time_matrix, previous.distance_matrix, _fetch_block
+        )
+        return TravelMatrices(
+            time_matrix, distance_matrix, coordinates, previous.slow_down
+        )
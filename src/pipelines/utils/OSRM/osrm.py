@@ -3,32 +3,114 @@ Wrapper for converting OSRM json results into pandas data-frames.
 """
 import json
 import logging
-from copy import deepcopy
-from typing import Dict, List
+from itertools import chain
+from typing import Dict, List, Tuple, Union
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-from shapely.geometry import LineString
+import shapely
+
+from pipelines.utils.OSRM.polyline import POLYLINE_PRECISION, decode_polylines
 
 EPSG = "EPSG:4326"
 
 
+def geometry_coordinates(
+    geometries: List[Union[Dict, str, None]], polyline_precision: int = 6
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gather the coordinates of OSRM geometries into one contiguous buffer.
+
+    Geometries are either GeoJSON (`geometries=geojson`) or encoded polylines
+    (`geometries=polyline` or `polyline6`), which are decoded in bulk. Missing
+    geometries, e.g. requested with `overview=false`, have no coordinates.
+
+    Returns:
+        `[lon, lat]` coordinates of all geometries, one after the other, and the number
+        of coordinates of every geometry.
+    """
+    if any(isinstance(geometry, str) for geometry in geometries):
+        return decode_polylines(
+            [geometry or "" for geometry in geometries], polyline_precision
+        )
+    paths = [
+        [] if geometry is None else geometry["coordinates"] for geometry in geometries
+    ]
+    counts = np.array([len(path) for path in paths], dtype=int)
+    coordinates = np.array(list(chain.from_iterable(paths)), dtype=float)
+    return coordinates.reshape(-1, 2), counts
+
+
+def _linestrings(coordinates: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Build `LineString`s in bulk from a coordinate buffer holding `counts` coordinates
+    per path. Paths with fewer than two coordinates get `None`.
+    """
+    geometry = np.full(counts.shape[0], None, dtype=object)
+    valid = counts >= 2
+    if not valid.any():
+        return geometry
+    indices = np.repeat(np.arange(valid.sum()), counts[valid])
+    coordinates = coordinates[np.repeat(valid, counts)]
+    geometry[valid] = shapely.linestrings(coordinates, indices=indices)
+    return geometry
+
+
+def leg_geometries(legs: List[Dict], polyline_precision: int = 6) -> np.ndarray:
+    """
+    Build the path of every leg from its step geometries in one vectorised pass.
+
+    The step coordinates of all legs are gathered into a single contiguous buffer, with
+    the leg of every coordinate as index, and turned into `LineString`s in bulk. Legs
+    without steps, e.g. requested with `steps=false`, get `None`.
+    """
+    leg_steps = [leg.get("steps", []) for leg in legs]
+    coordinates, step_counts = geometry_coordinates(
+        [step.get("geometry") for step in chain.from_iterable(leg_steps)],
+        polyline_precision,
+    )
+    n_steps = np.array([len(steps) for steps in leg_steps], dtype=int)
+    step_offsets = np.concatenate([[0], np.cumsum(n_steps)])
+    cumulative_counts = np.concatenate([[0], np.cumsum(step_counts)])
+    counts = cumulative_counts[step_offsets[1:]] - cumulative_counts[step_offsets[:-1]]
+    return _linestrings(coordinates, counts)
+
+
+def route_geometries(route_paths: List[Dict], polyline_precision: int = 6) -> np.ndarray:
+    """Build the overview path of every route or trip, `None` without overview."""
+    coordinates, counts = geometry_coordinates(
+        [route_path.get("geometry") for route_path in route_paths], polyline_precision
+    )
+    return _linestrings(coordinates, counts)
+
+
 class OsrmRoutePathNormalizer:
-    """Convert OSRM route and trip results into data-frames"""
+    """Convert OSRM route and trip results into data-frames.
+
+    `geometries` is the OSRM geometry encoding of the results: `"geojson"`, or
+    `"polyline"` / `"polyline6"` for encoded polylines.
+    """
 
     _osrm_json_results: Dict
     _route_path_type: str
     _route_path_info: dict
     _leg_info: List
     _order_sequence_flag: bool
+    _polyline_precision: int
 
     def __init__(
-        self, osrm_json_results: Dict, route_path_type: str, order_sequence: bool = True
+        self,
+        osrm_json_results: Dict,
+        route_path_type: str,
+        order_sequence: bool = True,
+        geometries: str = "geojson",
     ):
         self._osrm_json_results = osrm_json_results
         self._route_path_type = route_path_type
         self._check_route_path_type()
         self._order_sequence_flag = order_sequence
+        self._polyline_precision = POLYLINE_PRECISION.get(geometries, 6)
 
     def _check_route_path_type(self):
         if self._route_path_type not in self._osrm_json_results:
@@ -85,17 +167,8 @@ class OsrmRoutePathNormalizer:
 
     def extract_travel_leg_geometry(self) -> gpd.GeoSeries:
         """Extract the geometry path in WKT between all stops."""
-        legs = deepcopy(self._leg_info)
-        for i, leg in enumerate(legs):
-            leg["__id"] = i
-        leg_steps = pd.json_normalize(legs, record_path="steps", meta="__id")
-        leg_steps = (
-            leg_steps.groupby("__id")
-            .agg(geometry=("geometry.coordinates", "sum"))
-            .reset_index()
-        )
-        geometry = leg_steps["geometry"].apply(LineString)
-        return geometry
+        geometry = leg_geometries(self._leg_info, self._polyline_precision)
+        return gpd.GeoSeries(geometry, name="geometry")
 
     def extract_travel_leg_duration_distance(self) -> pd.DataFrame:
         """Extract the travel distance (km) and duration (seconds) between all stops"""
@@ -123,8 +196,7 @@ class OsrmRoutePathNormalizer:
         route_path_info = self._route_path_info
         total_distance_km = route_path_info["distance"] / 1000
         total_duration_hours = route_path_info["duration"] / 3600
-        route_path = route_path_info["geometry"]["coordinates"]
-        geometry = LineString(route_path)
+        geometry = route_geometries([route_path_info], self._polyline_precision)[0]
         route_summary = pd.DataFrame(
             [
                 {
@@ -138,3 +210,158 @@ class OsrmRoutePathNormalizer:
             route_summary, geometry=route_summary["geometry"], crs=EPSG
         )
         return route_summary
+
+
+class OsrmBatchRoutePathNormalizer:
+    """Convert many OSRM route or trip results into data-frames in one columnar pass.
+
+    Gives the same tables as concatenating the output of `OsrmRoutePathNormalizer`
+    per result, without building data-frames per route.
+
+    Args:
+        osrm_json_results: OSRM results, one per route.
+        route_ids: id of every result, attached to all rows derived from it.
+        route_path_type: `"routes"` or `"trips"`.
+        route_id_name: column name of the route ids.
+        order_sequence: order stops by travel sequence within every route.
+        geometries: OSRM geometry encoding of the results, `"geojson"`, `"polyline"`
+            or `"polyline6"`.
+
+    Examples:
+
+        '''python
+        normalizer = OsrmBatchRoutePathNormalizer(results, route_ids, "routes")
+        route_info = normalizer.normalize()
+        print(route_info["travel_leg_info"])
+        '''
+    """
+
+    _osrm_json_results: List[Dict]
+    _route_ids: pd.Index
+    _route_path_type: str
+    _route_id_name: str
+    _order_sequence_flag: bool
+    _route_paths: List[Dict]
+    _polyline_precision: int
+
+    def __init__(
+        self,
+        osrm_json_results: List[Dict],
+        route_ids: List,
+        route_path_type: str,
+        route_id_name: str = "route_id",
+        order_sequence: bool = True,
+        geometries: str = "geojson",
+    ):
+        if len(osrm_json_results) != len(route_ids):
+            raise ValueError(
+                f"Got {len(osrm_json_results)} OSRM results for {len(route_ids)} routes."
+            )
+        self._osrm_json_results = osrm_json_results
+        self._route_ids = pd.Index(route_ids)
+        self._route_path_type = route_path_type
+        self._route_id_name = route_id_name
+        self._order_sequence_flag = order_sequence
+        self._polyline_precision = POLYLINE_PRECISION.get(geometries, 6)
+        self._check_route_path_type()
+        self._route_paths = [
+            results[route_path_type][0] for results in self._osrm_json_results
+        ]
+
+    def _check_route_path_type(self):
+        for route_id, results in zip(self._route_ids, self._osrm_json_results):
+            if self._route_path_type not in results:
+                raise ValueError(
+                    f"Route path type `{self._route_path_type}` not in supplied OSRM "
+                    f"results of route `{route_id}`."
+                )
+            n_entries = len(results[self._route_path_type])
+            if n_entries > 1:
+                logging.warning(
+                    "Route path object of route `%s` has multiple %i legs. "
+                    "Only first one will be processed.",
+                    route_id,
+                    n_entries,
+                )
+
+    @staticmethod
+    def _positions_within(counts: np.ndarray) -> np.ndarray:
+        """Position of every row within its route, for routes of `counts` rows."""
+        offsets = np.cumsum(counts) - counts
+        return np.arange(counts.sum()) - np.repeat(offsets, counts)
+
+    def extract_road_snap_info(self) -> pd.DataFrame:
+        """Extract info on where stops were snapped to the road,
+        includes lat-lon snapping and distances."""
+        waypoints = [results["waypoints"] for results in self._osrm_json_results]
+        counts = np.array([len(route_waypoints) for route_waypoints in waypoints])
+        waypoint_info = pd.DataFrame(list(chain.from_iterable(waypoints)))
+        location = np.array(waypoint_info["location"].tolist(), dtype=float)
+        waypoint_info["road_snap_longitude"] = location[:, 0]
+        waypoint_info["road_snap_latitude"] = location[:, 1]
+        waypoint_info = waypoint_info.drop(
+            columns=["hint", "name", "location"], errors="ignore"
+        )
+        waypoint_info["original_index"] = self._positions_within(counts)
+        if "waypoint_index" not in waypoint_info.columns:
+            waypoint_info["waypoint_index"] = waypoint_info["original_index"]
+        waypoint_info = waypoint_info.rename(
+            columns={
+                "waypoint_index": "route_sequence",
+                "distance": "road_snap_distance_m",
+            }
+        )
+        waypoint_info[self._route_id_name] = self._route_ids.repeat(counts).values
+        if self._order_sequence_flag is True:
+            route_position = np.repeat(np.arange(counts.shape[0]), counts)
+            order = np.lexsort((waypoint_info["route_sequence"].values, route_position))
+            waypoint_info = waypoint_info.iloc[order].reset_index(drop=True)
+        return waypoint_info
+
+    def extract_travel_leg_info(self) -> gpd.GeoDataFrame:
+        """Extract travel metrix and path info of all legs."""
+        legs = [route_path["legs"] for route_path in self._route_paths]
+        counts = np.array([len(route_legs) for route_legs in legs])
+        legs = list(chain.from_iterable(legs))
+        leg_info = gpd.GeoDataFrame(
+            {
+                "duration_seconds": np.array(
+                    [leg["duration"] for leg in legs], dtype=float
+                ),
+                "distance_km": np.array([leg["distance"] for leg in legs], dtype=float)
+                / 1000,
+            },
+            geometry=leg_geometries(legs, self._polyline_precision),
+            crs=EPSG,
+        )
+        leg_info["travel_sequence"] = self._positions_within(counts)
+        leg_info[self._route_id_name] = self._route_ids.repeat(counts).values
+        return leg_info
+
+    def extract_travel_summary_info(self) -> gpd.GeoDataFrame:
+        """Extract route summary info, like total distance, duration and path."""
+        route_paths = self._route_paths
+        route_summary = gpd.GeoDataFrame(
+            {
+                "total_distance_km": np.array(
+                    [route_path["distance"] for route_path in route_paths], dtype=float
+                )
+                / 1000,
+                "total_travel_duration_hours": np.array(
+                    [route_path["duration"] for route_path in route_paths], dtype=float
+                )
+                / 3600,
+            },
+            geometry=route_geometries(route_paths, self._polyline_precision),
+            crs=EPSG,
+        )
+        route_summary[self._route_id_name] = self._route_ids.values
+        return route_summary
+
+    def normalize(self) -> Dict[str, pd.DataFrame]:
+        """Extract travel leg, stop sequence and route summary info of all routes."""
+        return {
+            "travel_leg_info": self.extract_travel_leg_info(),
+            "stop_sequence_info": self.extract_road_snap_info(),
+            "route_summary": self.extract_travel_summary_info(),
+        }
@@ -4,13 +4,15 @@ Get and format OSRM route info. See https://project-osrm.org/docs/v5.24.0/api/#r
 
 
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from typing import Callable, Dict, Tuple, Union
 
 import geopandas as gpd
 import pandas as pd
-import requests
 
-import src.pipelines.uitls.osrm.osrm as osrm
+from pipelines.utils.OSRM import osrm
+from pipelines.utils.OSRM.client import OsrmClient, resolve_client
 
 OSRM_DRIVING_DEFAULTS = {
     "steps": "true",
@@ -19,6 +21,14 @@ OSRM_DRIVING_DEFAULTS = {
     "geometries": "geojson",
     "continue_straight": "false",
 }
+# KPIs and an encoded overview path only, several times smaller to transfer and parse
+OSRM_COMPACT_DEFAULTS = {
+    "steps": "false",
+    "annotations": "false",
+    "overview": "full",
+    "geometries": "polyline6",
+    "continue_straight": "false",
+}
 BOUNDING_BOX = {
     "min_lon": -0.2432798003,
     "min_lat": 51.4463733546,
@@ -26,6 +36,8 @@ BOUNDING_BOX = {
     "max_lat": 51.5727989572,
 }
 TIMEOUT_LIMIT = 300  # seconds
+ROUTE_MAX_IN_FLIGHT = 8
+ROUTE_NORMALIZE_CHUNK_SIZE = 64  # routes normalised at once, bounds buffered responses
 
 
 def generate_osrm_defaults(osrm_driving_defaults: Union[Dict, None] = None) -> str:
@@ -46,13 +58,17 @@ def generate_osrm_point_inputs(
 
 
 def get_osrm_request(
-    port: str, coordinates: str, defaults: Callable, timeout: float = 30
+    port: Union[str, OsrmClient],
+    coordinates: str,
+    defaults: Callable,
+    timeout: float = 30,
+    client: Union[OsrmClient, None] = None,
 ) -> Union[Dict, str]:
     """Get OSRM response"""
+    port, client = resolve_client(port, client)
     request = f"{port}/route/v1/driving/{coordinates}?{defaults()}"
     logging.debug("OSRM request: `%s`" % request)
-    with requests.get(request, timeout=timeout) as req:
-        results = req.json()
+    results = client.get_json(request, timeout=timeout)
 
     if results["code"] != "Ok":
         message = results["message"]
@@ -62,7 +78,11 @@ def get_osrm_request(
 
 
 def generate_osrm_route(
-    route_stops: pd.DataFrame, vehicle_type: Union[str, None], port_mapping
+    route_stops: pd.DataFrame,
+    vehicle_type: Union[str, None],
+    port_mapping,
+    client: Union[OsrmClient, None] = None,
+    osrm_defaults: Union[Dict, None] = None,
 ) -> Union[Dict, str]:
     """Solve route using OSRM solver, based on route type."""
     # if vehicle_type is None:
@@ -71,7 +91,12 @@ def generate_osrm_route(
     #     port = port_mapping[vehicle_type]
     port = port_mapping
     coordinates = generate_osrm_point_inputs(route_stops)
-    results = get_osrm_request(port, coordinates, generate_osrm_defaults)
+    results = get_osrm_request(
+        port,
+        coordinates,
+        partial(generate_osrm_defaults, osrm_defaults),
+        client=client,
+    )
     return results
 
 
@@ -88,17 +113,55 @@ def generate_trip_info(
     return leg_info, stop_sequence_info, route_summary_info
 
 
+def _request_route(
+    route_id,
+    route_stops: pd.DataFrame,
+    port_mapping,
+    vehicle_type_name: str,
+    client: Union[OsrmClient, None],
+    osrm_defaults: Union[Dict, None],
+) -> Dict:
+    """Request a single route."""
+    logging.info("Processing %s" % route_id)
+    route_type = route_stops[vehicle_type_name].unique()
+    assert len(route_type) == 1
+    route_type = route_type[0]
+    return generate_osrm_route(
+        route_stops, route_type, port_mapping, client, osrm_defaults
+    )
+
+
 def return_route_osrm_info(
     assigned_stops: pd.DataFrame,
     port_mapping,
     route_id_name: str = "route_id",
     vehicle_type_name: str = "profile",
+    client: Union[OsrmClient, None] = None,
+    max_in_flight: int = ROUTE_MAX_IN_FLIGHT,
+    osrm_defaults: Union[Dict, None] = None,
+    chunk_size: int = ROUTE_NORMALIZE_CHUNK_SIZE,
 ) -> dict:
-    leg_info = []
-    stop_sequence_info = []
-    route_summary_info = []
-    vehicle_id_types = assigned_stops[route_id_name].unique()
-
+    """Request OSRM routes for all `route_id`s concurrently and normalise them.
+
+    Responses are normalised per chunk of `chunk_size` consecutive routes as soon as
+    the chunk has completed, so only the raw responses of unfinished chunks are held.
+
+    Args:
+        assigned_stops: stops with lat-lon coordinates, `route_id` and vehicle profile.
+        port_mapping: port to OSRM RestAPI, or a pooled `OsrmClient`.
+        route_id_name: column identifying routes.
+        vehicle_type_name: column with the vehicle profile, one per route.
+        client: pooled OSRM client shared between requests.
+        max_in_flight: maximum number of route requests sent concurrently.
+        osrm_defaults: OSRM route parameters, defaults to `OSRM_DRIVING_DEFAULTS`. Use
+            `OSRM_COMPACT_DEFAULTS` when only KPIs and overview paths are needed, leg
+            paths are then left empty.
+        chunk_size: number of routes normalised at once.
+
+    Returns:
+        travel leg, stop sequence and route summary info, in order of first
+        appearance of each `route_id`. Empty data-frames when there are no routes.
+    """
     n_nans_lon = assigned_stops["longitude"].isna().sum()
     n_nans_lat = assigned_stops["latitude"].isna().sum()
     if n_nans_lon > 0 or n_nans_lat > 0:
@@ -109,27 +172,56 @@ def return_route_osrm_info(
             subset=["longitude"]
         )
 
-    for route_id in vehicle_id_types:
-        logging.info("Processing %s" % route_id)
-        route_stops = assigned_stops.loc[assigned_stops[route_id_name] == route_id]
-        route_type = route_stops[vehicle_type_name].unique()
-        assert len(route_type) == 1
-        route_type = route_type[0]
-        results = generate_osrm_route(route_stops, route_type, port_mapping)
-        leg_info_i, stop_sequence_info_i, route_summary_info_i = generate_trip_info(
-            results
-        )
-        leg_info_i[route_id_name] = route_id
-        stop_sequence_info_i[route_id_name] = route_id
-        route_summary_info_i[route_id_name] = route_id
-        leg_info.append(leg_info_i)
-        stop_sequence_info.append(stop_sequence_info_i)
-        route_summary_info.append(route_summary_info_i)
-    leg_info = pd.concat(leg_info).reset_index(drop=True)
-    stop_sequence_info = pd.concat(stop_sequence_info).reset_index(drop=True)
-    route_summary_info = pd.concat(route_summary_info).reset_index(drop=True)
+    routes = list(assigned_stops.groupby(route_id_name, sort=False))
+    if not routes:
+        return {
+            name: pd.DataFrame(columns=[route_id_name])
+            for name in ("travel_leg_info", "stop_sequence_info", "route_summary")
+        }
+    chunks = [
+        routes[start : start + chunk_size] for start in range(0, len(routes), chunk_size)
+    ]
+    results = [[None] * len(chunk) for chunk in chunks]
+    n_pending = [len(chunk) for chunk in chunks]
+    chunk_info = [None] * len(chunks)
+    normalize = partial(
+        osrm.OsrmBatchRoutePathNormalizer,
+        route_path_type="routes",
+        route_id_name=route_id_name,
+        order_sequence=False,
+        geometries=(osrm_defaults or OSRM_DRIVING_DEFAULTS).get(
+            "geometries", "geojson"
+        ),
+    )
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {
+            executor.submit(
+                _request_route,
+                route_id,
+                route_stops,
+                port_mapping,
+                vehicle_type_name,
+                client,
+                osrm_defaults,
+            ): (i, j)
+            for i, chunk in enumerate(chunks)
+            for j, (route_id, route_stops) in enumerate(chunk)
+        }
+        try:
+            for future in as_completed(futures):
+                i, j = futures.pop(future)
+                results[i][j] = future.result()
+                n_pending[i] -= 1
+                if n_pending[i] == 0:
+                    route_ids = [route_id for route_id, _ in chunks[i]]
+                    chunk_info[i] = normalize(results[i], route_ids).normalize()
+                    results[i] = None
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
     return {
-        "travel_leg_info": leg_info,
-        "stop_sequence_info": stop_sequence_info,
-        "route_summary": route_summary_info,
+        name: pd.concat([info[name] for info in chunk_info], ignore_index=True)
+        for name in chunk_info[0]
     }
@@ -2,70 +2,154 @@
 Generate OSRM tsp routes.
 """
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Union
 
 import numpy as np
 import pandas as pd
 import requests
-from shapely.geometry import LineString
+
+from pipelines.utils.OSRM import get_osrm_tables
+from pipelines.utils.OSRM.client import (
+    OSRM_CLIENT_RETRY_STATUSES,
+    OsrmClient,
+    OsrmResponseError,
+    resolve_client,
+)
+from pipelines.utils.OSRM.local_tsp import solve_open_tsp
+from pipelines.utils.OSRM.matrix_cache import MatrixCache
+from pipelines.utils.OSRM.osrm import OsrmBatchRoutePathNormalizer
+from pipelines.utils.OSRM.osrm_get_routes import generate_osrm_defaults
 
 logger = logging.getLogger(__name__)
 
+TSP_MAX_IN_FLIGHT = 8
+TSP_RETRIES = 2
+TSP_RETRY_BACKOFF_SECONDS = 0.5
+TOO_FEW_COORDINATES_MESSAGE = "Number of coordinates needs to be at least two."
+TSP_BACKENDS = ("osrm", "local")
+OSRM_TRIP_DEFAULTS = {
+    "roundtrip": "false",
+    "source": "first",
+    "destination": "last",
+    "steps": "true",
+    "annotations": "true",
+    "overview": "full",
+    "geometries": "geojson",
+}
+# sequence and leg KPIs only, several times smaller to transfer and parse
+OSRM_TRIP_COMPACT_DEFAULTS = {
+    **OSRM_TRIP_DEFAULTS,
+    "steps": "false",
+    "annotations": "false",
+    "geometries": "polyline6",
+}
+
 
 def solve_single_tsp(
     route: pd.DataFrame,
     lon_col: str = "longitude",
     lat_col: str = "latitude",
-    osrm_port: str = "http://router.project-osrm.org",
+    osrm_port: Union[str, OsrmClient] = "http://router.project-osrm.org",
+    client: Union[OsrmClient, None] = None,
+    timeout: Union[float, None] = None,
+    osrm_defaults: Union[Dict, None] = None,
 ) -> dict:
-    if osrm_port[-1] == "/":
-        osrm_port = osrm_port[:-1]
+    osrm_port, client = resolve_client(osrm_port, client)
     coordinates = ";".join(route[[lon_col, lat_col]].astype(str).agg(",".join, axis=1))
-    request = f"{osrm_port}/trip/v1/driving/{coordinates}?roundtrip=false&source=first&destination=last&steps=true&annotations=true&overview=full&geometries=geojson"
-    with requests.get(request) as req:
-        results = req.json()
+    parameters = generate_osrm_defaults(osrm_defaults or OSRM_TRIP_DEFAULTS)
+    request = f"{osrm_port}/trip/v1/driving/{coordinates}?{parameters}"
+    try:
+        results = client.get_json(request, timeout=timeout)
+    except OsrmResponseError as error:
+        # routes without two distinct stops are rejected, and skipped by the caller
+        if error.message != TOO_FEW_COORDINATES_MESSAGE:
+            raise
+        results = {"code": error.code, "message": error.message}
     return results
 
 
-def assign_route_sequence_info_to_route(results: dict) -> np.array:
-    if (
-        "message" in results
-        and results["message"] == "Number of coordinates needs to be at least two."
-    ):
-        logger.warning("There should be more than one stop per route.")
-        waypoints = []
-    else:
-        route_sequence = pd.DataFrame(results["waypoints"])
-        n_trip = route_sequence["trips_index"].nunique()
-        if n_trip > 1:
-            logging.warning(
-                f"There are {n_trip} trips present. There were route segments that could not be linked."
-            )
-        waypoints = route_sequence["waypoint_index"].values
-    return waypoints
+def is_transient_error(error: Exception) -> bool:
+    """Connection errors, time-outs and 429 or 5xx responses may pass when retried."""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status_code = error.response.status_code
+        return status_code in OSRM_CLIENT_RETRY_STATUSES or status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
 
+def extract_trip_sequence_info(
+    results: dict, route_id=None, geometries: str = "geojson"
+) -> Dict[str, np.ndarray]:
+    """
+    Extract the sequence of a route from its OSRM trip results.
 
-def extract_travel_leg_duration_distance(results):
-    legs_info = pd.DataFrame(results["trips"][0]["legs"])[["duration", "distance"]]
-    duration_seconds = np.insert(legs_info["duration"].values, 0, 0)
-    distance_km = np.insert((legs_info["distance"] / 1000).values, 0, 0)
+    Returns:
+        `route_sequence` per stop, and `duration_seconds`, `distance_km` and `geometry`
+        of the travel leg to every stop in sequence order.
+    """
+    if results.get("code", "Ok") != "Ok":
+        raise ValueError(f"OSRM trip request failed: `{results.get('message')}`")
+    normalizer = OsrmBatchRoutePathNormalizer(
+        [results],
+        [route_id],
+        route_path_type="trips",
+        order_sequence=False,
+        geometries=geometries,
+    )
+    stop_info = normalizer.extract_road_snap_info()
+    n_trip = stop_info["trips_index"].nunique()
+    if n_trip > 1:
+        logging.warning(
+            f"There are {n_trip} trips present. There were route segments that could not be linked."
+        )
+    leg_info = normalizer.extract_travel_leg_info()
     return {
-        "duration_seconds": duration_seconds,
-        "distance_km": distance_km,
+        "route_sequence": stop_info["route_sequence"].values,
+        "duration_seconds": np.insert(leg_info["duration_seconds"].values, 0, 0),
+        "distance_km": np.insert(leg_info["distance_km"].values, 0, 0),
+        "geometry": np.insert(np.asarray(leg_info.geometry, dtype=object), 0, np.nan),
     }
 
 
-def extract_travel_leg_geometry(results):
-    legs = results["trips"][0]["legs"]
-    for i, leg in enumerate(legs):
-        leg["__id"] = i
-    leg_steps = pd.json_normalize(legs, record_path="steps", meta="__id")
-    leg_steps = (
-        leg_steps.groupby("__id")
-        .agg(geometry=("geometry.coordinates", "sum"))
-        .reset_index()
+def solve_local_tsp(
+    route: pd.DataFrame,
+    lon_col: str = "longitude",
+    lat_col: str = "latitude",
+    osrm_port: Union[str, OsrmClient] = "http://router.project-osrm.org",
+    client: Union[OsrmClient, None] = None,
+    timeout: Union[float, None] = None,
+    cache: Union[MatrixCache, None] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Sequence a route locally from its OSRM duration matrix, starting at the first stop
+    and finishing at the last one, so there is no limit on the number of stops.
+
+    Returns:
+        `route_sequence` per stop, and `duration_seconds` and `distance_km` of the
+        travel leg to every stop in sequence order.
+    """
+    matrices = get_osrm_tables.get_time_dist_matrix(
+        route,
+        endpoint=osrm_port,
+        lon_col=lon_col,
+        lat_col=lat_col,
+        timeout=timeout or 120,
+        cache=cache,
+        client=client,
     )
-    geometry = np.insert(leg_steps["geometry"].apply(LineString).values, 0, np.nan)
-    return geometry
+    n_stops = route.shape[0]
+    order = solve_open_tsp(matrices["time_matrix"], start=0, end=n_stops - 1)
+    route_sequence = np.empty(n_stops, dtype=int)
+    route_sequence[order] = np.arange(n_stops)
+    legs = (order[:-1], order[1:])
+    duration_seconds = np.insert(matrices["time_matrix"][legs].astype(float), 0, 0)
+    distance_km = np.insert(matrices["distance_matrix"][legs] / 1000, 0, 0)
+    return {
+        "route_sequence": route_sequence,
+        "duration_seconds": duration_seconds,
+        "distance_km": distance_km,
+    }
 
 
 class OsrmTspRoutes:
@@ -76,6 +160,13 @@ class OsrmTspRoutes:
         depot_df: data-frame with info on the depot where routes start and end at
         stops_limit: limit on how many stops can be sequenced, set at 100 with global OSRM API
         osrm_port: port for the osrm calls, default is "http://router.project-osrm.org", just no "/" at the end.
+        client: pooled OSRM client shared between requests, defaults to the process-wide client.
+        backend: `"osrm"` to sequence with the OSRM trip service, or `"local"` to sequence
+            from the OSRM duration matrix with `solve_open_tsp`, which has no stop limit
+            but returns no path geometries.
+        matrix_cache: optional on-disk cache of the matrices used by the local backend.
+        osrm_defaults: OSRM trip parameters, defaults to `OSRM_TRIP_DEFAULTS`. Use
+            `OSRM_TRIP_COMPACT_DEFAULTS` when leg paths are not needed.
 
     Examples:
 
@@ -108,18 +199,38 @@ class OsrmTspRoutes:
     _stops_limit: int
     _tsp_routes: pd.DataFrame
     _osrm_port: str
+    _client: OsrmClient
+    _failed_routes: Dict
+    _backend: str
+    _matrix_cache: Union[MatrixCache, None]
+    _osrm_defaults: Dict
 
     def __init__(
         self,
         assigned_stops_df: pd.DataFrame,
         depot_df: pd.DataFrame,
         stops_limit: int = 100,
-        osrm_port: str = "http://router.project-osrm.org",
+        osrm_port: Union[str, OsrmClient] = "http://router.project-osrm.org",
+        client: Union[OsrmClient, None] = None,
+        backend: str = "osrm",
+        matrix_cache: Union[MatrixCache, None] = None,
+        osrm_defaults: Union[Dict, None] = None,
     ):
+        if backend not in TSP_BACKENDS:
+            raise ValueError(f"Unknown TSP backend `{backend}`, use one of {TSP_BACKENDS}")
         self._assigned_stops_df = assigned_stops_df.copy()
         self._depot_stop_df = depot_df.copy()
         self._stops_limit = stops_limit
-        self._osrm_port = osrm_port
+        self._osrm_port, self._client = resolve_client(osrm_port, client)
+        self._failed_routes = {}
+        self._backend = backend
+        self._matrix_cache = matrix_cache
+        self._osrm_defaults = osrm_defaults or OSRM_TRIP_DEFAULTS
+
+    @property
+    def failed_routes(self) -> Dict:
+        """Errors of the routes that could not be sequenced, by `route_id`."""
+        return self._failed_routes
 
     def extract_first_depot(self):
         n_depots = self._depot_stop_df.shape[0]
@@ -161,12 +272,18 @@ class OsrmTspRoutes:
         full_route = pd.concat([depot_start_df, route_stops, depot_end_df])
         return full_route
 
-    def generate_tsp_route(self, route: pd.DataFrame, route_id=None) -> pd.DataFrame:
+    def generate_tsp_route(
+        self,
+        route: pd.DataFrame,
+        route_id=None,
+        timeout: Union[float, None] = None,
+    ) -> pd.DataFrame:
         """Calculate TSP sequence for single route
 
         Args:
             route: routes to sequence, with lat-lon coordinates and `"route_id"`.
             route_id: id over which routes can be filtered.
+            timeout: time before time-out error occurs for the OSRM trip request.
 
         Returns:
             route data-frame with `"route_sequence"` column based on the TSP routes.
@@ -186,36 +303,131 @@ class OsrmTspRoutes:
             f"Generating route sequence for `route_id` {route_id} with {n_stops} stops."
         )
 
-        if route.shape[0] > self._stops_limit:
-            logger.warning(
-                f"Route has {route.shape[0]} > {self._stops_limit} stops which may result in OSRM errors."
+        if self._backend == "local":
+            sequence_info = solve_local_tsp(
+                route,
+                osrm_port=self._osrm_port,
+                client=self._client,
+                timeout=timeout,
+                cache=self._matrix_cache,
+            )
+            sequence_info["geometry"] = None
+        else:
+            if route.shape[0] > self._stops_limit:
+                logger.warning(
+                    f"Route has {route.shape[0]} > {self._stops_limit} stops which may result in OSRM errors."
+                )
+            results = solve_single_tsp(
+                route,
+                osrm_port=self._osrm_port,
+                client=self._client,
+                timeout=timeout,
+                osrm_defaults=self._osrm_defaults,
+            )
+            if results.get("message") == TOO_FEW_COORDINATES_MESSAGE:
+                logger.warning(
+                    f"Route {route_id} has less than two distinct stops, "
+                    "so skipping sequence generation."
+                )
+                return route
+            sequence_info = extract_trip_sequence_info(
+                results, route_id, self._osrm_defaults.get("geometries", "geojson")
             )
 
-        results = solve_single_tsp(route, osrm_port=self._osrm_port)
-        tsp_sequence = assign_route_sequence_info_to_route(results)
         tsp_route = (
-            route.assign(route_sequence=tsp_sequence)
+            route.assign(route_sequence=sequence_info["route_sequence"])
             .sort_values("route_sequence")
-            .assign()
+            .assign(
+                duration_seconds=sequence_info["duration_seconds"],
+                distance_km=sequence_info["distance_km"],
+                geometry=sequence_info["geometry"],
+            )
         )
-        duration_distance = extract_travel_leg_duration_distance(results)
-        paths = extract_travel_leg_geometry(results)
+        return tsp_route
 
-        tsp_route = tsp_route.assign(
-            duration_seconds=duration_distance["duration_seconds"],
-            distance_km=duration_distance["distance_km"],
-            geometry=paths,
-        )
+    def _generate_tsp_route_with_retries(
+        self,
+        route: pd.DataFrame,
+        timeout: Union[float, None],
+        retries: int,
+        backoff_factor: float,
+    ) -> pd.DataFrame:
+        """
+        Sequence a route, retrying transient errors with exponential backoff until
+        `timeout`. Other errors, e.g. invalid OSRM results, are raised at once.
+        """
+        route_id = route["route_id"].iloc[0]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in range(retries + 1):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(
+                    f"Sequencing `route_id` {route_id} exceeded {timeout} seconds"
+                )
+            try:
+                return self.generate_tsp_route(route, timeout=remaining)
+            except Exception as error:
+                if attempt == retries or not is_transient_error(error):
+                    raise
+                logger.warning(
+                    f"Sequencing `route_id` {route_id} failed "
+                    f"(attempt {attempt + 1} of {retries + 1}): {error}"
+                )
+            backoff = backoff_factor * 2**attempt
+            if deadline is not None:
+                backoff = min(backoff, max(deadline - time.monotonic(), 0))
+            time.sleep(backoff)
 
-        return tsp_route
+    def generate_all_tsp_routes(
+        self,
+        max_in_flight: int = TSP_MAX_IN_FLIGHT,
+        timeout: Union[float, None] = None,
+        retries: int = TSP_RETRIES,
+        backoff_factor: float = TSP_RETRY_BACKOFF_SECONDS,
+    ) -> pd.DataFrame:
+        """Generate TSP sequences for all routes, requesting up to `max_in_flight`
+        routes concurrently. Routes that fail with a non-transient error, still fail
+        after `retries`, or are not sequenced within `timeout`, are left out of the
+        result and reported in `failed_routes`.
 
-    def generate_all_tsp_routes(self) -> pd.DataFrame:
-        """Generate TSP sequences for all routes."""
-        self._tsp_routes = (
-            self._assigned_stops_df.groupby(["route_id"])
-            .apply(self.generate_tsp_route)
-            .reset_index(drop=True)
-        )
+        Args:
+            max_in_flight: maximum number of trip requests sent concurrently.
+            timeout: time in seconds to sequence a route, including its retries.
+            retries: number of times a route failing with a transient error, see
+                `is_transient_error`, is retried.
+            backoff_factor: wait `backoff_factor * 2 ** attempt` seconds before
+                retrying.
+
+        Returns:
+            sequenced routes, ordered by `"route_id"`.
+        """
+        self._failed_routes = {}
+        routes = list(self._assigned_stops_df.groupby("route_id"))
+        tsp_routes = [None] * len(routes)
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            futures = {
+                executor.submit(
+                    self._generate_tsp_route_with_retries,
+                    route,
+                    timeout,
+                    retries,
+                    backoff_factor,
+                ): (position, route_id)
+                for position, (route_id, route) in enumerate(routes)
+            }
+            for future in as_completed(futures):
+                position, route_id = futures[future]
+                try:
+                    tsp_routes[position] = future.result()
+                except Exception as error:
+                    logger.error(f"Could not sequence `route_id` {route_id}: {error}")
+                    self._failed_routes[route_id] = str(error)
+
+        tsp_routes = [route for route in tsp_routes if route is not None]
+        if not tsp_routes:
+            self._tsp_routes = pd.DataFrame(columns=self._assigned_stops_df.columns)
+        else:
+            self._tsp_routes = pd.concat(tsp_routes).reset_index(drop=True)
         return self._tsp_routes
 
 
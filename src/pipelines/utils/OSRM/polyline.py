@@ -0,0 +1,68 @@
+"""
+Encoded polyline geometries as returned by OSRM with `geometries=polyline` (precision 5)
+or `geometries=polyline6` (precision 6). Many polylines are decoded at once into a single
+`[lon, lat]` coordinate buffer with NumPy, without a Python loop per character.
+"""
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+POLYLINE_PRECISION: Dict[str, int] = {"polyline": 5, "polyline6": 6}
+
+
+def decode_polylines(
+    encoded: Sequence[str], precision: int = 6
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode encoded polylines into one coordinate buffer.
+
+    Args:
+        encoded: encoded polylines.
+        precision: number of decimals the coordinates were encoded with.
+    Returns:
+        `[lon, lat]` coordinates of all polylines, one after the other, and the number of
+        coordinates of every polyline.
+    """
+    lengths = np.array([len(polyline) for polyline in encoded], dtype=int)
+    data = np.frombuffer("".join(encoded).encode("ascii"), dtype=np.uint8)
+    data = data.astype(np.int64) - 63
+    if data.shape[0] == 0:
+        return np.empty((0, 2)), np.zeros(lengths.shape[0], dtype=int)
+
+    # every value is a run of 5-bit chunks, the last one without the 0x20 flag
+    value_ends = (data & 0x20) == 0
+    value_starts = np.flatnonzero(np.concatenate([[True], value_ends[:-1]]))
+    value_id = np.cumsum(np.concatenate([[0], value_ends[:-1]]))
+    shift = 5 * (np.arange(data.shape[0]) - value_starts[value_id])
+    values = np.add.reduceat((data & 0x1F) << shift, value_starts)
+    values = (values >> 1) ^ -(values & 1)
+
+    # values alternate latitude and longitude deltas, restarting every polyline
+    n_ends = np.concatenate([[0], np.cumsum(value_ends)])
+    byte_offsets = np.concatenate([[0], np.cumsum(lengths)])
+    counts = (n_ends[byte_offsets[1:]] - n_ends[byte_offsets[:-1]]) // 2
+    deltas = values[: 2 * counts.sum()].reshape(-1, 2)
+    totals = np.cumsum(deltas, axis=0)
+    point_offsets = np.cumsum(counts) - counts
+    restart = np.concatenate([np.zeros((1, 2), dtype=np.int64), totals])[point_offsets]
+    coordinates = totals - np.repeat(restart, counts, axis=0)
+    return coordinates[:, ::-1] / 10**precision, counts
+
+
+def decode_polyline(encoded: str, precision: int = 6) -> np.ndarray:
+    """Decode a single encoded polyline into `[lon, lat]` coordinates."""
+    return decode_polylines([encoded], precision)[0]
+
+
+def encode_polyline(coordinates: np.ndarray, precision: int = 6) -> str:
+    """Encode `[lon, lat]` coordinates as a polyline."""
+    values = np.round(np.asarray(coordinates, dtype=float)[:, ::-1] * 10**precision)
+    values = values.astype(np.int64).reshape(-1)
+    deltas = np.diff(values.reshape(-1, 2), axis=0, prepend=0).reshape(-1)
+    encoded = []
+    for value in ((deltas << 1) ^ (deltas >> 63)).tolist():
+        while value >= 0x20:
+            encoded.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        encoded.append(chr(value + 63))
+    return "".join(encoded)
@@ -0,0 +1,171 @@
+"""
+Streaming decoder for OSRM table responses. The `durations` and `distances` arrays are
+parsed chunk by chunk straight into preallocated float32 buffers, so peak memory stays
+close to the size of the final matrices instead of holding the JSON as Python floats.
+"""
+import re
+from typing import Dict, Iterable, Tuple, Union
+
+import numpy as np
+
+TABLE_ANNOTATIONS = ("durations", "distances")
+STREAM_CHUNK_SIZE = 1024**2
+
+_ARRAY_START = re.compile(rb'"(durations|distances)"\s*:\s*\[')
+_ARRAY_END = re.compile(rb"\]\s*\]")
+_NULL_ARRAY = re.compile(rb'"(durations|distances)"\s*:\s*null')
+_VALUE = re.compile(rb"[^\[\],\s]+")
+_KEY_CARRY = 32  # longest key pattern that may be split across chunks
+_HEAD_SIZE = 1024
+
+
+class TableResponseDecoder:
+    """Incrementally decode the matrices of an OSRM `/table` response.
+
+    Args:
+        n_sources: number of rows of the response matrices.
+        n_destinations: number of columns of the response matrices.
+        out: optional preallocated `n_sources` x `n_destinations` arrays per
+            annotation, e.g. views into a larger matrix. Float32 buffers are
+            allocated for annotations without one.
+        null_value: value for unroutable pairs, which OSRM returns as `null`.
+
+    Examples:
+
+        '''python
+        decoder = TableResponseDecoder(n_sources, n_destinations)
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            decoder.feed(chunk)
+        matrices = decoder.close()
+        '''
+    """
+
+    _shape: Tuple[int, int]
+    _out: Dict[str, np.ndarray]
+    _null_value: float
+    _pending: bytes
+    _current: Union[str, None]
+    _offset: int
+    _decoded: set
+    _head: bytes
+
+    def __init__(
+        self,
+        n_sources: int,
+        n_destinations: int,
+        out: Union[Dict[str, np.ndarray], None] = None,
+        null_value: float = np.nan,
+    ):
+        self._shape = (n_sources, n_destinations)
+        self._out = {} if out is None else dict(out)
+        for annotation in TABLE_ANNOTATIONS:
+            if annotation not in self._out:
+                self._out[annotation] = np.empty(self._shape, dtype=np.float32)
+            elif self._out[annotation].shape != self._shape:
+                raise ValueError(
+                    f"Buffer for `{annotation}` has shape "
+                    f"{self._out[annotation].shape}, expected {self._shape}"
+                )
+        self._null_value = null_value
+        self._pending = b""
+        self._current = None
+        self._offset = 0
+        self._decoded = set()
+        self._head = b""
+
+    def _write(self, segment: bytes):
+        tokens = _VALUE.findall(segment)
+        if not tokens:
+            return
+        tokens = np.array(tokens)
+        nulls = tokens == b"null"
+        tokens[nulls] = b"nan"
+        values = tokens.astype(np.float32)
+        values[nulls] = self._null_value
+
+        out = self._out[self._current]
+        n_destinations = self._shape[1]
+        start, stop = self._offset, self._offset + values.shape[0]
+        if stop > out.size:
+            raise ValueError(
+                f"OSRM `{self._current}` has more than {self._shape} values"
+            )
+        if out.flags.c_contiguous:
+            out.reshape(-1)[start:stop] = values
+        else:
+            position = 0
+            while position < values.shape[0]:
+                row, column = divmod(start + position, n_destinations)
+                size = min(n_destinations - column, values.shape[0] - position)
+                out[row, column : column + size] = values[position : position + size]
+                position += size
+        self._offset = stop
+
+    def _finish_array(self):
+        if self._offset != self._out[self._current].size:
+            raise ValueError(
+                f"OSRM `{self._current}` has {self._offset} values, "
+                f"expected {self._shape}"
+            )
+        self._decoded.add(self._current)
+        self._current = None
+        self._offset = 0
+
+    def feed(self, chunk: bytes):
+        """Decode the next chunk of the response body."""
+        if len(self._head) < _HEAD_SIZE:
+            self._head += chunk[: _HEAD_SIZE - len(self._head)]
+        data = self._pending + chunk
+        self._pending = b""
+        while data:
+            if self._current is None:
+                for null_array in _NULL_ARRAY.finditer(data):
+                    self._out[null_array.group(1).decode()][:] = self._null_value
+                    self._decoded.add(null_array.group(1).decode())
+                start = _ARRAY_START.search(data)
+                if start is None:
+                    self._pending = data[-_KEY_CARRY:]
+                    return
+                self._current = start.group(1).decode()
+                data = data[start.end() :]
+            else:
+                end = _ARRAY_END.search(data)
+                if end is not None:
+                    self._write(data[: end.start() + 1])
+                    self._finish_array()
+                    data = data[end.end() :]
+                else:
+                    split = max(data.rfind(b","), data.rfind(b"["))
+                    if split < 0:
+                        self._pending = data
+                        return
+                    self._write(data[:split])
+                    self._pending = data[split:]
+                    return
+
+    def close(self) -> Dict[str, np.ndarray]:
+        """Return the decoded matrices, raising if the response was incomplete."""
+        missing = [a for a in TABLE_ANNOTATIONS if a not in self._decoded]
+        if self._current is not None or missing:
+            message = self._head.decode(errors="replace")
+            raise ValueError(
+                f"OSRM table response is missing {missing or self._current}: "
+                f"`{message}`"
+            )
+        return self._out
+
+
+def decode_table_response(
+    chunks: Iterable[bytes],
+    n_sources: int,
+    n_destinations: int,
+    out: Union[Dict[str, np.ndarray], None] = None,
+    null_value: float = np.nan,
+) -> Dict[str, np.ndarray]:
+    """Decode a chunked OSRM `/table` response body into float32 matrices."""
+    decoder = TableResponseDecoder(
+        n_sources, n_destinations, out=out, null_value=null_value
+    )
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
@@ -0,0 +1,291 @@
+"""
+Geocoding with a single indexed cache in front of the geocoder.
+
+Addresses are normalised and keyed by hash, looked up in one SQLite table in bulk, and
+only the misses are sent to the geocoder through a rate-limited thread pool. Results,
+including addresses the geocoder could not find, are written back in one transaction.
+
+The SQLite cache is the only store the service reads and writes. The older partitioned
+JSON caches, compacted by the `geocoding_cache` pipeline, are imported into it with
+`google_result_records`.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+GEOCODING_MAX_WORKERS = 8
+GEOCODING_MIN_INTERVAL_SECONDS = 0.02
+GEOCODING_TIMEOUT = 10
+GEOCODE_CACHE_BATCH_SIZE = 500
+GEOCODE_COLUMNS = [
+    "address",
+    "address_hash",
+    "latitude",
+    "longitude",
+    "formatted_address",
+    "failed",
+    "cached",
+]
+
+
+def normalise_address(address: str) -> str:
+    """Lower-case and collapse whitespace and separators, so trivially different
+    spellings of the same address share a cache entry."""
+    address = re.sub(r"\s*,\s*", ", ", str(address).strip().lower())
+    address = re.sub(r"\s+", " ", address)
+    return address.strip(" ,.")
+
+
+def address_hash(address: str) -> str:
+    """Cache key of an address, the SHA-1 of its normalised form."""
+    return hashlib.sha1(normalise_address(address).encode("utf-8")).hexdigest()
+
+
+class GeocodeCache:
+    """SQLite geocoding cache keyed by address hash.
+
+    Args:
+        filepath: location of the SQLite database, created when missing.
+    """
+
+    filepath: Path
+
+    def __init__(self, filepath: Union[str, Path]):
+        self.filepath = Path(filepath)
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS geocodes ("
+                "address_hash TEXT PRIMARY KEY, address TEXT, latitude REAL, "
+                "longitude REAL, formatted_address TEXT, failed INTEGER, raw TEXT, "
+                "geocoded_at REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection committing on success, closed afterwards."""
+        with closing(sqlite3.connect(self.filepath)) as connection:
+            with connection:
+                yield connection
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Cached results of the given address hashes, missing hashes are left out."""
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            for start in range(0, len(hashes), GEOCODE_CACHE_BATCH_SIZE):
+                batch = hashes[start : start + GEOCODE_CACHE_BATCH_SIZE]
+                rows = connection.execute(
+                    "SELECT address_hash, latitude, longitude, formatted_address, failed "
+                    f"FROM geocodes WHERE address_hash IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for row in rows:
+                    found[row["address_hash"]] = dict(row)
+        return found
+
+    def put_many(self, records: Sequence[Dict[str, Any]]):
+        """Write geocoding results in a single transaction, replacing older entries."""
+        if not records:
+            return
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        record["address_hash"],
+                        record["address"],
+                        record["latitude"],
+                        record["longitude"],
+                        record["formatted_address"],
+                        int(record["failed"]),
+                        json.dumps(record.get("raw")),
+                        now,
+                    )
+                    for record in records
+                ],
+            )
+
+    def __len__(self) -> int:
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+
+
+def google_result_records(
+    results: Dict[str, Any], failed: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Convert raw Google geocoding results, keyed by address, into `GeocodeCache`
+    records, e.g. the partitions of `geocoded_address_google_cash`.
+    Args:
+    results: raw Google result, or list of results of which the first is used, per
+        address
+    failed: whether these are addresses the geocoder could not find
+    Return:
+    records for `GeocodeCache.put_many`
+    """
+    records = []
+    for address, result in results.items():
+        if isinstance(result, list):
+            result = result[0] if result else None
+        location = ((result or {}).get("geometry") or {}).get("location") or {}
+        records.append(
+            {
+                "address_hash": address_hash(address),
+                "address": address,
+                "latitude": None if failed else location.get("lat"),
+                "longitude": None if failed else location.get("lng"),
+                "formatted_address": None
+                if failed
+                else (result or {}).get("formatted_address"),
+                "failed": failed or not location,
+                "raw": result,
+            }
+        )
+    return records
+
+
+class RateLimiter:
+    """Spaces calls at least `min_interval` seconds apart across threads."""
+
+    def __init__(self, min_interval: float):
+        self._min_interval = min_interval
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self._min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class GeocodingService:
+    """Geocode many addresses at once, requesting only those missing from the cache.
+
+    Args:
+        geocoder: geopy-style geocoder, e.g. `GoogleV3`, whose `geocode(query, timeout)`
+            returns a location with `latitude`, `longitude`, `address` and `raw`, or None.
+        cache: optional geocoding cache.
+        max_workers: maximum number of concurrent geocoding requests.
+        min_interval: minimum seconds between two geocoding requests, across workers.
+        timeout: time before time-out error occurs for a geocoding request.
+        retry_failed: geocode again addresses the geocoder did not find before.
+
+    Examples:
+
+        '''python
+        service = GeocodingService(GoogleV3(api_key=key), GeocodeCache("geocodes.sqlite"))
+        geocoded = service.geocode(stops["address"])
+        '''
+    """
+
+    geocoder: Any
+    cache: Union[GeocodeCache, None]
+
+    def __init__(
+        self,
+        geocoder: Any,
+        cache: Union[GeocodeCache, None] = None,
+        max_workers: int = GEOCODING_MAX_WORKERS,
+        min_interval: float = GEOCODING_MIN_INTERVAL_SECONDS,
+        timeout: float = GEOCODING_TIMEOUT,
+        retry_failed: bool = False,
+    ):
+        self.geocoder = geocoder
+        self.cache = cache
+        self._max_workers = max_workers
+        self._rate_limiter = RateLimiter(min_interval)
+        self._timeout = timeout
+        self._retry_failed = retry_failed
+
+    def _geocode_one(self, key: str, address: str) -> Union[Dict[str, Any], None]:
+        self._rate_limiter.wait()
+        try:
+            location = self.geocoder.geocode(address, timeout=self._timeout)
+        except Exception as error:
+            # transient errors are not cached, the address is requested again next time
+            logger.warning("Geocoding `%s` failed: %s", address, error)
+            return None
+        record = {"address_hash": key, "address": address, "raw": None}
+        if location is None:
+            record.update(
+                latitude=None, longitude=None, formatted_address=None, failed=True
+            )
+        else:
+            record.update(
+                latitude=location.latitude,
+                longitude=location.longitude,
+                formatted_address=location.address,
+                failed=False,
+                raw=getattr(location, "raw", None),
+            )
+        return record
+
+    def geocode(self, addresses: Iterable[str]) -> pd.DataFrame:
+        """
+        Geocode addresses, in bulk from the cache and concurrently for the rest.
+        Args:
+        addresses: addresses to geocode, duplicates are requested once
+        Return:
+        data-frame with one row per address in the given order and columns
+            `GEOCODE_COLUMNS`; `failed` marks addresses the geocoder did not find,
+            `cached` those answered from the cache. Addresses whose request raised have
+            missing coordinates and are neither failed nor cached.
+        """
+        addresses = list(addresses)
+        keys = [address_hash(address) for address in addresses]
+        unique: Dict[str, str] = {}
+        for key, address in zip(keys, addresses):
+            unique.setdefault(key, address)
+        results = self.cache.get_many(unique) if self.cache is not None else {}
+        if self._retry_failed:
+            results = {key: row for key, row in results.items() if not row["failed"]}
+        cached = set(results)
+        misses = [(key, address) for key, address in unique.items() if key not in cached]
+        logger.info(
+            "Geocoding %i addresses: %i cached, %i requested",
+            len(unique),
+            len(cached),
+            len(misses),
+        )
+
+        if misses:
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                records = list(executor.map(lambda miss: self._geocode_one(*miss), misses))
+            records = [record for record in records if record is not None]
+            if self.cache is not None:
+                self.cache.put_many(records)
+            results.update({record["address_hash"]: record for record in records})
+
+        rows: List[Dict[str, Any]] = []
+        for key, address in zip(keys, addresses):
+            result = results.get(key, {})
+            rows.append(
+                {
+                    "address": address,
+                    "address_hash": key,
+                    "latitude": result.get("latitude"),
+                    "longitude": result.get("longitude"),
+                    "formatted_address": result.get("formatted_address"),
+                    "failed": bool(result.get("failed", False)),
+                    "cached": key in cached,
+                }
+            )
+        return pd.DataFrame(rows, columns=GEOCODE_COLUMNS)
@@ -0,0 +1,140 @@
+"""
+OpenStreetMap layers extracted from a PBF file, cached as GeoParquet.
+
+Parsing a road network or POIs out of a multi-hundred-MB PBF takes minutes, reading
+the extracted layer back from GeoParquet takes seconds. Layers are keyed by the path,
+size and modification time of the PBF file, the bounding box, the layer and its
+arguments, so a changed file or area never returns stale data. The PBF itself is only
+opened on a cache miss.
+"""
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+import geopandas as gpd
+
+logger = logging.getLogger(__name__)
+
+BOUNDING_BOX_KEYS = ("min_lon", "min_lat", "max_lon", "max_lat")
+
+
+def bounding_box_list(
+    bounding_box: Union[Dict[str, float], Sequence[float], None]
+) -> Union[List[float], None]:
+    """`[min_lon, min_lat, max_lon, max_lat]` of a bounding box given as such a list or
+    as a dictionary like `osrm_get_routes.BOUNDING_BOX`."""
+    if bounding_box is None:
+        return None
+    if isinstance(bounding_box, dict):
+        bounding_box = [bounding_box[key] for key in BOUNDING_BOX_KEYS]
+    return [float(value) for value in bounding_box]
+
+
+def file_signature(filepath: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Absolute path, size and modification time of a file, which change whenever the
+    file is replaced, without reading the file like a content hash would.
+    """
+    stat = os.stat(filepath)
+    return {
+        "path": str(Path(filepath).resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+class CachedOsm:
+    """Lazy OSM reader whose extracted layers are cached as GeoParquet.
+
+    Args:
+        filepath: location of the PBF file.
+        osm_factory: builds the OSM reader, e.g. a `pyrosm.OSM`, only called on a miss.
+        cache_dir: directory holding the cached layers.
+        bounding_box: area the layers are extracted for, part of the cache key.
+
+    Examples:
+
+        '''python
+        osm = CachedOsm("greater-london.osm.pbf", lambda: OSM(...), "data/.cashed/osm")
+        roads = osm.get_network("driving")  # parsed once, then read from GeoParquet
+        '''
+    """
+
+    filepath: Path
+    cache_dir: Path
+    bounding_box: Union[List[float], None]
+    _osm_factory: Callable[[], Any]
+    _osm: Any
+    _signature: Union[Dict[str, Any], None]
+
+    def __init__(
+        self,
+        filepath: Union[str, Path],
+        osm_factory: Callable[[], Any],
+        cache_dir: Union[str, Path],
+        bounding_box: Union[Dict[str, float], Sequence[float], None] = None,
+    ):
+        self.filepath = Path(filepath)
+        self.cache_dir = Path(cache_dir)
+        self.bounding_box = bounding_box_list(bounding_box)
+        self._osm_factory = osm_factory
+        self._osm = None
+        self._signature = None
+
+    @property
+    def osm(self) -> Any:
+        """The OSM reader, opened on first use."""
+        if self._osm is None:
+            logger.info("Opening OSM file `%s`", self.filepath)
+            self._osm = self._osm_factory()
+        return self._osm
+
+    def layer_path(self, layer: str, **kwargs) -> Path:
+        """Location of the cached layer extracted with `kwargs`."""
+        if self._signature is None:
+            self._signature = file_signature(self.filepath)
+        key = json.dumps(
+            {
+                "file": self._signature,
+                "bounding_box": self.bounding_box,
+                "layer": layer,
+                "kwargs": kwargs,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        key = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"{self.filepath.stem}-{layer}-{key}.parquet"
+
+    def get_layer(self, layer: str, **kwargs) -> Union[gpd.GeoDataFrame, Any]:
+        """
+        Extract a layer with the reader's `get_<layer>` method, or read it from the
+        cache. Only GeoDataFrames are cached, e.g. not the `(nodes, edges)` tuple of
+        `get_network(nodes=True)`.
+        """
+        path = self.layer_path(layer, **kwargs)
+        if path.exists():
+            logger.info("Loading cached OSM `%s` from `%s`", layer, path)
+            return gpd.read_parquet(path)
+        data = getattr(self.osm, f"get_{layer}")(**kwargs)
+        if isinstance(data, gpd.GeoDataFrame):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # readers never see a partly written layer, it is staged and then moved
+            staging = path.with_name(f".{path.stem}.{uuid.uuid4().hex}.parquet")
+            data.to_parquet(staging)
+            os.replace(staging, path)
+            logger.info("Cached OSM `%s` at `%s`", layer, path)
+        return data
+
+    def get_network(self, network_type: str = "driving", **kwargs):
+        return self.get_layer("network", network_type=network_type, **kwargs)
+
+    def get_pois(self, **kwargs):
+        return self.get_layer("pois", **kwargs)
+
+    def get_buildings(self, **kwargs):
+        return self.get_layer("buildings", **kwargs)
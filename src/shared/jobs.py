@@ -0,0 +1,253 @@
+"""
+Background pipeline runs.
+
+`JobManager` submits pipeline runs to a thread pool and returns a `Job` handle right
+away. Per-node progress and timings are reported into the job by Kedro hooks, so a
+Streamlit page can poll a job, or attach to it again after a rerun, while the script
+thread stays responsive.
+"""
+import logging
+import threading
+import time
+import typing as tp
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from kedro.framework.hooks import hook_impl
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
+
+from . import runner
+from .memoise import PipelineResultCache
+
+logger = logging.getLogger(__name__)
+
+JOB_MAX_WORKERS = 2
+JOB_HISTORY_SIZE = 100
+JOB_STATUSES = ("pending", "running", "done", "failed")
+
+
+class Job:
+    """Handle of a submitted pipeline run, updated by the run's thread."""
+
+    job_id: str
+    pipeline_name: str
+    status: str
+    submitted_at: float
+    started_at: float | None
+    finished_at: float | None
+    total_nodes: int | None
+    nodes: dict[str, dict[str, tp.Any]]
+    result: dict[str, tp.Any] | None
+    error: BaseException | None
+
+    def __init__(self, pipeline_name: str):
+        self.job_id = uuid.uuid4().hex
+        self.pipeline_name = pipeline_name
+        self.status = "pending"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.total_nodes = None
+        self.nodes = {}
+        self.result = None
+        self.error = None
+        self.future: Future | None = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.status = "running"
+            self.started_at = time.time()
+
+    def finish(self, result: dict[str, tp.Any]):
+        with self._lock:
+            self.status = "done"
+            self.result = result
+            self.finished_at = time.time()
+
+    def fail(self, error: BaseException):
+        with self._lock:
+            self.status = "failed"
+            self.error = error
+            self.finished_at = time.time()
+
+    def node_started(self, name: str):
+        with self._lock:
+            self.nodes[name] = {
+                "status": "running",
+                "started_at": time.time(),
+                "duration": None,
+            }
+
+    def node_finished(self, name: str, status: str = "done"):
+        with self._lock:
+            node = self.nodes.setdefault(name, {"started_at": time.time()})
+            node["status"] = status
+            node["duration"] = time.time() - node["started_at"]
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def progress(self) -> float:
+        """Share of the pipeline's nodes finished, between 0 and 1."""
+        if self.status == "done":
+            return 1.0
+        with self._lock:
+            finished = sum(node["status"] == "done" for node in self.nodes.values())
+        if not self.total_nodes:
+            return 0.0
+        return finished / self.total_nodes
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def node_table(self) -> list[dict[str, tp.Any]]:
+        """Status and duration (seconds) of every node run so far, in start order."""
+        with self._lock:
+            return [{"node": name, **node} for name, node in self.nodes.items()]
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait at most `timeout` seconds for the job to finish, without raising while
+        it is still running. Returns whether it finished."""
+        if self.future is None:
+            return self.is_finished
+        wait([self.future], timeout=timeout)
+        return self.future.done()
+
+
+class NodeProgressHooks:
+    """Kedro hooks reporting node progress and timings of a run into its `Job`."""
+
+    def __init__(self, job: Job):
+        self._job = job
+
+    @hook_impl
+    def before_pipeline_run(self, pipeline: Pipeline):
+        self._job.total_nodes = len(pipeline.nodes)
+
+    @hook_impl
+    def before_node_run(self, node: Node):
+        self._job.node_started(node.name)
+
+    @hook_impl
+    def after_node_run(self, node: Node):
+        self._job.node_finished(node.name)
+
+    @hook_impl
+    def on_node_error(self, node: Node):
+        self._job.node_finished(node.name, status="failed")
+
+
+class JobManager:
+    """Runs pipelines in a thread pool, keeping the latest `history_size` jobs. Runs
+    submitted with a `cache` return the outputs of an earlier run with the same
+    parameters and inputs right away.
+
+    Threads rather than processes are used: the run reports progress into the same
+    `Job` objects the pages read, and its free outputs are handed back in memory.
+
+    Examples:
+
+        '''python
+        manager, cache = JobManager(), PipelineResultCache()
+        job = manager.submit(
+            "pipelines", project_dir, "iris_agg_v2", extra_params, cache=cache
+        )
+        if job.wait(timeout=60):
+            job.result["iris_aggregation"]
+        '''
+    """
+
+    def __init__(
+        self,
+        max_workers: int = JOB_MAX_WORKERS,
+        history_size: int = JOB_HISTORY_SIZE,
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pipeline-job"
+        )
+        self._history_size = history_size
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        package_name: str,
+        project_path: str,
+        pipeline_name: str,
+        extra_params: dict[str, tp.Any] | None = None,
+        inputs: dict[str, tp.Any] | None = None,
+        cache: PipelineResultCache | None = None,
+    ) -> Job:
+        """Queue a pipeline run and return its job handle immediately. `inputs` are
+        bound into the run's catalog and `cache` memoises its outputs, see
+        `runner.execute_pipeline`."""
+        job = Job(pipeline_name)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._forget_finished()
+        job.future = self._executor.submit(
+            self._run,
+            job,
+            package_name,
+            project_path,
+            extra_params or {},
+            inputs,
+            cache,
+        )
+        logger.info(f"Submitted pipeline `{pipeline_name}` as job {job.job_id}")
+        return job
+
+    def _run(
+        self,
+        job: Job,
+        package_name: str,
+        project_path: str,
+        extra_params: dict[str, tp.Any],
+        inputs: dict[str, tp.Any] | None,
+        cache: PipelineResultCache | None,
+    ):
+        job.start()
+        try:
+            result = runner.execute_pipeline(
+                package_name=package_name,
+                project_path=project_path,
+                extra_params=extra_params,
+                pipeline_name=job.pipeline_name,
+                hooks=[NodeProgressHooks(job)],
+                cache=cache,
+                inputs=inputs,
+            )
+        except Exception as error:
+            logger.exception(f"Job {job.job_id} of `{job.pipeline_name}` failed")
+            job.fail(error)
+        else:
+            logger.info(f"Job {job.job_id} finished in {job.elapsed:.1f}s")
+            job.finish(result)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[: max(0, len(self._jobs) - self._history_size)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, pipeline_name: str | None = None) -> list[Job]:
+        """Known jobs, oldest first, optionally of a single pipeline."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if pipeline_name is not None:
+            jobs = [job for job in jobs if job.pipeline_name == pipeline_name]
+        return jobs
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,116 @@
+"""
+Memoised pipeline results.
+
+Runs are keyed by the pipeline name and a content fingerprint of `extra_params` and the
+inputs bound into the catalog, in which data frames and arrays are hashed by value.
+Only use it for pipelines whose inputs are all passed in and whose outputs are all
+free, data read from or saved to the catalog is not part of the key or the result.
+Caching is opted into per run, see `runner.execute_pipeline`.
+"""
+import copy
+import hashlib
+import logging
+import pickle
+import threading
+import typing as tp
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_MAX_ENTRIES = 32
+
+
+def _update_fingerprint(digest: "hashlib._Hash", value: tp.Any):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(type(value).__name__.encode())
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr(list(value.columns)).encode())
+            digest.update(repr(list(value.dtypes.astype(str))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(f"ndarray{value.shape}{value.dtype}".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b"dict")
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _update_fingerprint(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_fingerprint(digest, item)
+    elif value is None or isinstance(value, (str, bytes, bool, int, float)):
+        digest.update(f"{type(value).__name__}:{value!r}".encode())
+    else:
+        digest.update(pickle.dumps(value))
+
+
+def fingerprint(value: tp.Any) -> str:
+    """Content hash of parameters, data frames, arrays and their containers."""
+    digest = hashlib.sha1()
+    _update_fingerprint(digest, value)
+    return digest.hexdigest()
+
+
+def run_key(
+    pipeline_name: str,
+    extra_params: dict[str, tp.Any],
+    inputs: dict[str, tp.Any] | None = None,
+) -> str:
+    return fingerprint(
+        {"pipeline": pipeline_name, "params": extra_params, "inputs": inputs or {}}
+    )
+
+
+class PipelineResultCache:
+    """Bounded in-memory LRU store of pipeline outputs, with hit and miss counts.
+
+    Outputs are copied in and out, so callers may modify what they get back.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, dict[str, tp.Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> dict[str, tp.Any] | None:
+        with self._lock:
+            outputs = self._entries.get(key)
+            if outputs is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(outputs)
+
+    def put(self, key: str, outputs: dict[str, tp.Any]):
+        outputs = copy.deepcopy(outputs)
+        with self._lock:
+            self._entries[key] = outputs
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
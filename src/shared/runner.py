@@ -1,6 +1,39 @@
+import logging
 import typing as tp
 
+from kedro.framework.hooks import hook_impl
+from kedro.framework.project import pipelines
 from kedro.framework.session import KedroSession
+from kedro.io import DataCatalog, MemoryDataSet
+
+from .memoise import PipelineResultCache, run_key
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogInputsHooks:
+    """Binds named inputs into the run's catalog as `MemoryDataSet`s with
+    `copy_mode="assign"`, so large data goes in without a copy and stays out of the
+    parameters."""
+
+    def __init__(self, inputs: dict[str, tp.Any]):
+        self._inputs = inputs
+
+    @hook_impl
+    def after_catalog_created(self, catalog: DataCatalog):
+        for name, data in self._inputs.items():
+            catalog.add(name, MemoryDataSet(data, copy_mode="assign"), replace=True)
+
+
+def _register_session_hooks(session: KedroSession, hooks: tp.Iterable[tp.Any]):
+    """Register hook implementations for the runs of `session` only.
+
+    Kedro 0.18 has no public API for this, hooks are registered project-wide through
+    `HOOKS` in `settings.py`. Every session creates its own hook manager though, so the
+    hooks are added to it here and nowhere else.
+    """
+    for hook in hooks:
+        session._hook_manager.register(hook)
 
 
 def execute_pipeline(
@@ -8,6 +41,9 @@ def execute_pipeline(
         project_path: str,
         extra_params: dict[str, tp.Any],
         pipeline_name: str,
+        hooks: tp.Iterable[tp.Any] = (),
+        cache: PipelineResultCache | None = None,
+        inputs: dict[str, tp.Any] | None = None,
 ) -> dict[str, tp.Any]:
     """
     Function organizing pipeline execution
@@ -18,14 +54,40 @@ def execute_pipeline(
         project_path (str): _description_
         extra_params (dict[str, tp.Any]): _description_
         pipeline_name (str): _description_
+        hooks (tp.Iterable[tp.Any]): extra hook implementations for this run only,
+            e.g. `jobs.NodeProgressHooks`
+        cache (PipelineResultCache | None): returns the outputs of an earlier run with
+            the same pipeline name, parameter values and inputs instead of running
+            again. Runs saving any output to the catalog are never cached, their
+            outputs would be missing from the result and not saved on a hit
+        inputs (dict[str, tp.Any] | None): data of the pipeline's input data sets by
+            name, e.g. data frames, bound into the catalog instead of `extra_params`
 
     Returns:
         dict[str, tp.Any]: _description_
     """
-    kedro_session = KedroSession.create(
+    if cache is not None:
+        key = run_key(pipeline_name, extra_params, inputs)
+        output = cache.get(key)
+        if output is not None:
+            logger.info(f"Pipeline `{pipeline_name}` outputs found in cache")
+            return output
+    if inputs:
+        hooks = [*hooks, CatalogInputsHooks(inputs)]
+    with KedroSession.create(
         package_name="pipelines",
         project_path=project_path,
         extra_params=extra_params,
-    )
-    output = kedro_session.run(pipeline_name=pipeline_name)
+    ) as kedro_session:
+        _register_session_hooks(kedro_session, hooks)
+        output = kedro_session.run(pipeline_name=pipeline_name)
+    if cache is not None:
+        persisted = pipelines[pipeline_name or "__default__"].outputs() - set(output)
+        if persisted:
+            logger.warning(
+                f"Pipeline `{pipeline_name}` outputs are not cached, "
+                f"{sorted(persisted)} are saved to the catalog"
+            )
+        else:
+            cache.put(key, output)
     return output
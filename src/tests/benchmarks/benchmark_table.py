@@ -0,0 +1,78 @@
+"""
+Benchmark OSRM table throughput (matrix cells per second) against the local stand-in
+server, for single-request and tiled retrieval.
+
+    python -m tests.benchmarks.benchmark_table --n-stops 1000 --tile-size 250
+"""
+import argparse
+import logging
+import time
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from pipelines.utils.OSRM.get_osrm_tables import get_time_dist_matrix
+from tests.benchmarks.stand_in_server import OsrmStandInServer
+
+logger = logging.getLogger(__name__)
+
+
+def generate_random_stops(n_stops: int, seed: int = 10) -> pd.DataFrame:
+    """Random stops around central London."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "longitude": -0.25 + 0.2 * rng.random(n_stops),
+            "latitude": 51.45 + 0.12 * rng.random(n_stops),
+        }
+    )
+
+
+def benchmark_table(
+    n_stops: int,
+    tile_size: Union[int, None] = None,
+    max_workers: int = 4,
+    repeats: int = 3,
+) -> Dict[str, float]:
+    """Time `get_time_dist_matrix` against the stand-in server."""
+    stops = generate_random_stops(n_stops)
+    timings = []
+    with OsrmStandInServer() as server:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            get_time_dist_matrix(
+                stops,
+                endpoint=server.endpoint,
+                tile_size=tile_size,
+                max_workers=max_workers,
+            )
+            timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "n_stops": n_stops,
+        "tile_size": tile_size,
+        "max_workers": max_workers,
+        "seconds": best,
+        "cells_per_second": n_stops**2 / best,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-stops", type=int, default=1000)
+    parser.add_argument("--tile-size", type=int, default=250)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    results = pd.DataFrame(
+        [
+            benchmark_table(args.n_stops, args.n_stops, 1, args.repeats),
+            benchmark_table(args.n_stops, args.tile_size, 1, args.repeats),
+            benchmark_table(
+                args.n_stops, args.tile_size, args.max_workers, args.repeats
+            ),
+        ]
+    )
+    print(results.to_string(index=False))
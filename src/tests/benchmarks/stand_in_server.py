@@ -0,0 +1,266 @@
+"""
+Local stand-in for the OSRM table, route and trip services, used for testing and
+benchmarking without a routing server. Durations and distances are straight-line
+(haversine) estimates, routes and trips visit the stops in the given order.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from pipelines.utils.OSRM.haversine import haversine_matrix
+from pipelines.utils.OSRM.matrix_service import (
+    MatrixBackend,
+    get_distance_matrix,
+    get_time_matrix,
+)
+from pipelines.utils.OSRM.polyline import POLYLINE_PRECISION, encode_polyline
+
+STAND_IN_SPEED_KMH = 30
+
+
+def _parse_indices(query: Dict[str, List[str]], name: str, n_coordinates: int):
+    if name not in query or query[name][0] == "all":
+        return list(range(n_coordinates))
+    return [int(i) for i in query[name][0].split(";")]
+
+
+def _waypoint(location: np.ndarray) -> dict:
+    return {"hint": "", "distance": 0.0, "name": "", "location": location.tolist()}
+
+
+def generate_table_response(
+    coordinates: np.ndarray,
+    sources: Union[List[int], None] = None,
+    destinations: Union[List[int], None] = None,
+    speed_kmh: float = STAND_IN_SPEED_KMH,
+) -> dict:
+    """Build an OSRM-like `/table` response for `[lon, lat]` coordinates."""
+    if sources is None:
+        sources = list(range(coordinates.shape[0]))
+    if destinations is None:
+        destinations = list(range(coordinates.shape[0]))
+    distances = haversine_matrix(coordinates[sources], coordinates[destinations])
+    durations = distances / (speed_kmh / 3.6)
+    return {
+        "code": "Ok",
+        "durations": np.round(durations, 1).tolist(),
+        "distances": np.round(distances, 1).tolist(),
+        "sources": [_waypoint(coordinates[i]) for i in sources],
+        "destinations": [_waypoint(coordinates[i]) for i in destinations],
+    }
+
+
+def _geometry(path: List[List[float]], geometries: str) -> Union[dict, str]:
+    if geometries in POLYLINE_PRECISION:
+        return encode_polyline(np.array(path), POLYLINE_PRECISION[geometries])
+    return {"type": "LineString", "coordinates": path}
+
+
+def _generate_route(
+    coordinates: np.ndarray,
+    speed_kmh: float,
+    steps: bool = True,
+    geometries: str = "geojson",
+    overview: bool = True,
+) -> dict:
+    legs = []
+    for start, end in zip(coordinates[:-1], coordinates[1:]):
+        midpoint = (start + end) / 2
+        distance = float(haversine_matrix(start[None], end[None])[0, 0])
+        leg_steps = [
+            {
+                "distance": distance / 2,
+                "duration": distance / 2 / (speed_kmh / 3.6),
+                "geometry": _geometry(path, geometries),
+            }
+            for path in (
+                [start.tolist(), midpoint.tolist()],
+                [midpoint.tolist(), end.tolist()],
+                [end.tolist(), end.tolist()],
+            )
+        ]
+        leg_steps[-1]["distance"] = leg_steps[-1]["duration"] = 0.0
+        legs.append(
+            {
+                "distance": distance,
+                "duration": distance / (speed_kmh / 3.6),
+                "summary": "",
+                "weight": distance / (speed_kmh / 3.6),
+                "steps": leg_steps if steps else [],
+            }
+        )
+    route = {
+        "distance": sum(leg["distance"] for leg in legs),
+        "duration": sum(leg["duration"] for leg in legs),
+        "weight_name": "routability",
+        "weight": sum(leg["weight"] for leg in legs),
+        "legs": legs,
+    }
+    if overview:
+        route["geometry"] = _geometry(coordinates.tolist(), geometries)
+    return route
+
+
+def generate_route_response(
+    coordinates: np.ndarray,
+    speed_kmh: float = STAND_IN_SPEED_KMH,
+    steps: bool = True,
+    geometries: str = "geojson",
+    overview: bool = True,
+) -> dict:
+    """Build an OSRM-like `/route` response visiting `[lon, lat]` coordinates in order."""
+    if coordinates.shape[0] < 2:
+        return {
+            "code": "InvalidValue",
+            "message": "Number of coordinates needs to be at least two.",
+        }
+    return {
+        "code": "Ok",
+        "routes": [
+            _generate_route(coordinates, speed_kmh, steps, geometries, overview)
+        ],
+        "waypoints": [_waypoint(point) for point in coordinates],
+    }
+
+
+def generate_trip_response(
+    coordinates: np.ndarray,
+    speed_kmh: float = STAND_IN_SPEED_KMH,
+    steps: bool = True,
+    geometries: str = "geojson",
+    overview: bool = True,
+) -> dict:
+    """Build an OSRM-like `/trip` response visiting `[lon, lat]` coordinates in order."""
+    if coordinates.shape[0] < 2:
+        return {
+            "code": "InvalidValue",
+            "message": "Number of coordinates needs to be at least two.",
+        }
+    waypoints = [_waypoint(point) for point in coordinates]
+    for i, waypoint in enumerate(waypoints):
+        waypoint.update({"waypoint_index": i, "trips_index": 0})
+    return {
+        "code": "Ok",
+        "trips": [
+            _generate_route(coordinates, speed_kmh, steps, geometries, overview)
+        ],
+        "waypoints": waypoints,
+    }
+
+
+class StandInBackend(MatrixBackend):
+    """The OSRM stand-in's straight-line tables, computed in-process.
+
+    Args:
+        speed_kmh: average travel speed.
+    """
+
+    _speed_kmh: float
+
+    def __init__(self, speed_kmh: float = STAND_IN_SPEED_KMH):
+        self._speed_kmh = speed_kmh
+
+    def cache_namespace(self) -> Tuple[str, str, float]:
+        return "stand-in", f"{self._speed_kmh}kmh", np.nan
+
+    def fetch_block(
+        self, points: np.ndarray, sources: np.ndarray, destinations: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        response = generate_table_response(
+            points, sources.tolist(), destinations.tolist(), self._speed_kmh
+        )
+        return get_time_matrix(response, 1), get_distance_matrix(response)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] not in ("table", "route", "trip"):
+            self._send(400, {"code": "InvalidUrl", "message": f"Unknown {url.path}"})
+            return
+        coordinates = np.array(
+            [point.split(",") for point in parts[3].split(";")], dtype=float
+        )
+        speed_kmh = self.server.speed_kmh
+        query = parse_qs(url.query)
+        if parts[0] in ("route", "trip"):
+            generate_response = (
+                generate_route_response
+                if parts[0] == "route"
+                else generate_trip_response
+            )
+            response = generate_response(
+                coordinates,
+                speed_kmh,
+                steps=query.get("steps", ["false"])[0] == "true",
+                geometries=query.get("geometries", ["polyline"])[0],
+                overview=query.get("overview", ["simplified"])[0] != "false",
+            )
+        else:
+            response = generate_table_response(
+                coordinates,
+                sources=_parse_indices(query, "sources", coordinates.shape[0]),
+                destinations=_parse_indices(
+                    query, "destinations", coordinates.shape[0]
+                ),
+                speed_kmh=speed_kmh,
+            )
+        self._send(200 if response["code"] == "Ok" else 400, response)
+
+    def _send(self, status: int, content: dict):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa: A002
+        return None
+
+
+class OsrmStandInServer:
+    """Serve the OSRM `/table`, `/route` and `/trip` services from a background thread.
+
+    Examples:
+
+        '''python
+        with OsrmStandInServer() as server:
+            matrices = get_time_dist_matrix(stops, endpoint=server.endpoint)
+        '''
+    """
+
+    _server: ThreadingHTTPServer
+    _thread: threading.Thread
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, speed_kmh=STAND_IN_SPEED_KMH
+    ):
+        self._server = ThreadingHTTPServer((host, port), _RequestHandler)
+        self._server.daemon_threads = True
+        self._server.speed_kmh = speed_kmh
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "OsrmStandInServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "OsrmStandInServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,10 @@
+import pytest
+
+from tests.benchmarks.stand_in_server import OsrmStandInServer
+
+
+@pytest.fixture(scope="session")
+def osrm_endpoint():
+    """Endpoint of a stand-in OSRM server shared by all tests."""
+    with OsrmStandInServer() as server:
+        yield server.endpoint
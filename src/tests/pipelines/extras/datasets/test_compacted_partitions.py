@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("pyarrow.parquet")
+
+from pipelines.extras.datasets.compacted_partitions import (  # noqa: E402
+    CompactedPartitionsDataSet,
+)
+from pipelines.geocoding_cache.nodes import compact_partitions  # noqa: E402
+
+
+def _lazy(partitions, calls):
+    def _loader(partition):
+        def _load():
+            calls.append(partition)
+            return partitions[partition]
+
+        return _load
+
+    return {partition: _loader(partition) for partition in partitions}
+
+
+def test_only_new_partitions_are_loaded_and_appended(tmp_path):
+    dataset = CompactedPartitionsDataSet(str(tmp_path / "compacted"))
+    assert not dataset.exists()
+    partitions = {"a": {"lat": 1.0}, "b": {"lat": 2.0}}
+    calls = []
+    dataset.save(compact_partitions(_lazy(partitions, calls)))
+    assert dataset.load() == partitions
+
+    partitions["c"] = {"lat": 3.0}
+    calls.clear()
+    dataset.save(compact_partitions(_lazy(partitions, calls)))
+    assert calls == ["c"]
+    assert dataset.load() == partitions
+    assert len(list((tmp_path / "compacted" / "segments").iterdir())) == 2
+    assert dataset.lookup(["c", "missing"]) == {"c": {"lat": 3.0}}
+
+
+def test_segments_are_merged(tmp_path):
+    dataset = CompactedPartitionsDataSet(str(tmp_path), max_segments=2)
+    for partition in ["a", "b", "c"]:
+        dataset.save({partition: [partition]})
+    assert len(list((tmp_path / "segments").iterdir())) == 1
+    assert dataset.load() == {"a": ["a"], "b": ["b"], "c": ["c"]}
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "index.parquet",
+        "segments",
+    ]
+
+
+def test_load_after_concurrent_merge(tmp_path, monkeypatch):
+    dataset = CompactedPartitionsDataSet(str(tmp_path), max_segments=2)
+    dataset.save({"a": 1})
+    dataset.save({"b": 2})
+    stale_indexes = [dataset._read_index()]
+    dataset.save({"c": 3})
+    read_index = dataset._read_index
+    monkeypatch.setattr(
+        dataset,
+        "_read_index",
+        lambda: stale_indexes.pop() if stale_indexes else read_index(),
+    )
+    assert dataset.load() == {"a": 1, "b": 2, "c": 3}
@@ -0,0 +1,46 @@
+from pipelines.extras.datasets.geocode_cache import GeocodeCacheDataSet
+from pipelines.geocoding_cache.nodes import import_geocodes
+from pipelines.utils.geocoding import address_hash
+
+
+def _lazy(partitions, calls):
+    def _loader(partition):
+        def _load():
+            calls.append(partition)
+            return partitions[partition]
+
+        return _load
+
+    return {partition: _loader(partition) for partition in partitions}
+
+
+def _result(lat, lng):
+    return [{"geometry": {"location": {"lat": lat, "lng": lng}}}]
+
+
+def test_exists_does_not_create_database(tmp_path):
+    filepath = tmp_path / "geocodes.sqlite"
+    data_set = GeocodeCacheDataSet(str(filepath))
+    assert not data_set.exists()
+    assert not filepath.exists()
+    data_set.save(import_geocodes({}, {"nowhere": lambda: {}}))
+    assert data_set.exists()
+
+
+def test_only_new_addresses_are_loaded_and_imported(tmp_path):
+    data_set = GeocodeCacheDataSet(str(tmp_path / "geocodes.sqlite"))
+    geocoded = {"1 Main St": _result(51.5, -0.1)}
+    failed = {"1 Main St": {}, "nowhere": {}}
+    calls = []
+    data_set.save(import_geocodes(_lazy(geocoded, calls), _lazy(failed, calls)))
+    assert sorted(calls) == ["1 Main St", "nowhere"]
+
+    geocoded["2 High St"] = _result(51.6, -0.2)
+    calls.clear()
+    data_set.save(import_geocodes(_lazy(geocoded, calls), _lazy(failed, calls)))
+    assert calls == ["2 High St"]
+    addresses = ["1 Main St", "2 High St", "nowhere"]
+    cached = data_set.load().get_many(address_hash(address) for address in addresses)
+    failed = [cached[address_hash(address)]["failed"] for address in addresses]
+    assert failed == [0, 0, 1]
+    assert cached[address_hash("2 High St")]["latitude"] == 51.6
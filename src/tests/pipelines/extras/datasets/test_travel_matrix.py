@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from pipelines.extras.datasets.travel_matrix import (
+    UNROUTABLE_UINT32,
+    TravelMatrixDataSet,
+)
+from pipelines.utils.OSRM.matrix_service import HaversineBackend, MatrixService
+from tests.benchmarks.benchmark_table import generate_random_stops
+
+
+@pytest.fixture
+def matrices():
+    stops = generate_random_stops(25)
+    return MatrixService(HaversineBackend()).get_matrices(stops)
+
+
+def test_save_and_load_memory_mapped(tmp_path, matrices):
+    dataset = TravelMatrixDataSet(str(tmp_path / "matrix"), chunk_rows=4)
+    assert not dataset.exists()
+    dataset.save(matrices)
+    assert dataset.exists()
+    loaded = dataset.load()
+    assert isinstance(loaded["time_matrix"], np.memmap)
+    assert loaded["time_matrix"].dtype == np.float32
+    np.testing.assert_array_equal(loaded["time_matrix"], matrices.time_matrix)
+    np.testing.assert_array_equal(loaded["distance_matrix"], matrices.distance_matrix)
+    np.testing.assert_array_equal(loaded["coordinates"], matrices.coordinates)
+
+
+def test_uint32_seconds(tmp_path, matrices):
+    time_matrix = matrices.time_matrix.copy()
+    time_matrix[3, 4] = np.nan
+    data = {**matrices.as_dict(), "coordinates": matrices.coordinates}
+    data["time_matrix"] = time_matrix
+    dataset = TravelMatrixDataSet(str(tmp_path), time_dtype="uint32", chunk_rows=7)
+    dataset.save(data)
+    loaded = dataset.load()["time_matrix"]
+    assert loaded.dtype == np.uint32
+    assert loaded[3, 4] == UNROUTABLE_UINT32
+    routable = np.isfinite(time_matrix)
+    np.testing.assert_allclose(loaded[routable], time_matrix[routable], atol=0.5)
+
+
+def test_save_requires_coordinates(tmp_path, matrices):
+    with pytest.raises(Exception):
+        TravelMatrixDataSet(str(tmp_path)).save(matrices.as_dict())
+
+
+def test_save_loaded_memory_maps_in_place(tmp_path, matrices):
+    dataset = TravelMatrixDataSet(str(tmp_path), chunk_rows=4)
+    dataset.save(matrices)
+    dataset.save(dataset.load())
+    loaded = dataset.load()
+    np.testing.assert_array_equal(loaded["time_matrix"], matrices.time_matrix)
+    np.testing.assert_array_equal(loaded["distance_matrix"], matrices.distance_matrix)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "coordinates.npy",
+        "distance_matrix.npy",
+        "meta.json",
+        "time_matrix.npy",
+    ]
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+import requests
+
+from pipelines.utils.OSRM.client import OsrmClient, OsrmResponseError
+from pipelines.utils.OSRM.osrm_tsp import TOO_FEW_COORDINATES_MESSAGE, solve_single_tsp
+
+
+def test_error_status_raises_osrm_code(osrm_endpoint):
+    with OsrmClient(osrm_endpoint, max_retries=0) as client:
+        with pytest.raises(OsrmResponseError, match="InvalidUrl") as error:
+            client.get_json(f"{osrm_endpoint}/nearest/v1/driving/-0.1,51.5")
+    assert error.value.code == "InvalidUrl"
+    assert error.value.response.status_code == 400
+    assert isinstance(error.value, requests.HTTPError)
+
+
+def test_single_stop_trip_returns_osrm_message(osrm_endpoint):
+    route = pd.DataFrame({"longitude": [-0.1], "latitude": [51.5]})
+    with OsrmClient(osrm_endpoint, max_retries=0) as client:
+        results = solve_single_tsp(route, osrm_port=osrm_endpoint, client=client)
+    assert results["message"] == TOO_FEW_COORDINATES_MESSAGE
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from pipelines.utils.OSRM.client import OsrmClient
+from pipelines.utils.OSRM.get_osrm_tables import (
+    deduplicate_coordinates,
+    get_time_dist_matrix,
+    update_time_dist_matrix,
+)
+from pipelines.utils.OSRM.matrix_cache import MatrixCache
+from tests.benchmarks.benchmark_table import generate_random_stops
+
+
+@pytest.fixture
+def stops():
+    return generate_random_stops(23)
+
+
+class TestGetTimeDistMatrix:
+    def test_single_request(self, osrm_endpoint, stops):
+        matrices = get_time_dist_matrix(stops, endpoint=osrm_endpoint)
+        assert matrices["time_matrix"].shape == (23, 23)
+        assert matrices["distance_matrix"].shape == (23, 23)
+        np.testing.assert_allclose(np.diag(matrices["distance_matrix"]), 0)
+
+    def test_tiled_matches_single_request(self, osrm_endpoint, stops):
+        single = get_time_dist_matrix(stops, endpoint=osrm_endpoint, slow_down=2)
+        tiled = get_time_dist_matrix(
+            stops, endpoint=osrm_endpoint, slow_down=2, tile_size=5, max_workers=3
+        )
+        np.testing.assert_allclose(tiled["time_matrix"], single["time_matrix"])
+        np.testing.assert_allclose(tiled["distance_matrix"], single["distance_matrix"])
+
+    def test_streaming_matches_json(self, osrm_endpoint, stops):
+        single = get_time_dist_matrix(stops, endpoint=osrm_endpoint)
+        streamed = get_time_dist_matrix(
+            stops, endpoint=osrm_endpoint, tile_size=7, streaming=True
+        )
+        assert streamed["time_matrix"].dtype == np.float32
+        np.testing.assert_allclose(streamed["time_matrix"], single["time_matrix"])
+        np.testing.assert_allclose(
+            streamed["distance_matrix"], single["distance_matrix"]
+        )
+
+    def test_client_as_endpoint(self, osrm_endpoint, stops):
+        with OsrmClient(osrm_endpoint, max_concurrency={"table": 1}) as client:
+            pooled = get_time_dist_matrix(stops, endpoint=client, tile_size=6)
+        single = get_time_dist_matrix(stops, endpoint=osrm_endpoint)
+        np.testing.assert_allclose(pooled["time_matrix"], single["time_matrix"])
+
+    def test_cache_hit_is_writable(self, osrm_endpoint, stops, tmp_path):
+        cache = MatrixCache(str(tmp_path))
+        get_time_dist_matrix(stops, endpoint=osrm_endpoint, cache=cache)
+        hit = get_time_dist_matrix(stops, endpoint=osrm_endpoint, cache=cache)
+        assert not isinstance(hit["time_matrix"], np.memmap)
+        hit["time_matrix"][0, 1] = -1
+        again = get_time_dist_matrix(stops, endpoint=osrm_endpoint, cache=cache)
+        assert again["time_matrix"][0, 1] >= 0
+
+    def test_repeated_stops_are_requested_once(self, osrm_endpoint, stops):
+        repeated = stops.iloc[[0, 1, 1, 2, 0, 3, 1]].reset_index(drop=True)
+        repeated.loc[4, "longitude"] += 1e-8
+        matrices = get_time_dist_matrix(repeated, endpoint=osrm_endpoint, tile_size=2)
+        expected = get_time_dist_matrix(stops.iloc[:4], endpoint=osrm_endpoint)
+        positions = np.ix_([0, 1, 1, 2, 0, 3, 1], [0, 1, 1, 2, 0, 3, 1])
+        np.testing.assert_allclose(
+            matrices["time_matrix"], expected["time_matrix"][positions]
+        )
+        np.testing.assert_allclose(
+            matrices["distance_matrix"], expected["distance_matrix"][positions]
+        )
+
+    def test_update_matches_full_recompute(self, osrm_endpoint, stops):
+        previous_data = stops.iloc[:15]
+        previous = get_time_dist_matrix(previous_data, endpoint=osrm_endpoint, slow_down=2)
+        data = stops.iloc[[20, 3, 14, 21, 0, 7, 22, 9]]
+        updated = update_time_dist_matrix(
+            previous, previous_data, data, endpoint=osrm_endpoint, slow_down=2
+        )
+        expected = get_time_dist_matrix(data, endpoint=osrm_endpoint, slow_down=2)
+        np.testing.assert_allclose(updated["time_matrix"], expected["time_matrix"])
+        np.testing.assert_allclose(
+            updated["distance_matrix"], expected["distance_matrix"]
+        )
+
+
+def test_deduplicate_coordinates_keeps_first_appearance():
+    coordinates = np.array([[1.0, 2.0], [0.5, 0.5], [1.0, 2.0000001], [0.5, 0.5]])
+    unique, inverse = deduplicate_coordinates(coordinates, precision=5)
+    np.testing.assert_allclose(unique, [[1.0, 2.0], [0.5, 0.5]])
+    assert list(inverse) == [0, 1, 0, 1]
+    unique, inverse = deduplicate_coordinates(coordinates, precision=None)
+    assert unique.shape[0] == 3
+    assert list(inverse) == [0, 1, 2, 1]
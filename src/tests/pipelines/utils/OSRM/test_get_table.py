@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from pipelines.utils.OSRM.get_table import (
+    get_interstops_time_distance,
+    get_routes_interstops_time_distance,
+)
+
+
+def test_routes_interstops_match_per_route_submatrices():
+    rng = np.random.default_rng(0)
+    time_matrix = rng.random((12, 12)).astype(np.float32)
+    distance_matrix = rng.random((12, 12)).astype(np.float32)
+    routes = [np.array([3, 1, 7]), np.array([0]), np.array([11, 2, 5, 9])]
+    stop_indices = np.concatenate(routes)
+    route_offsets = np.concatenate([[0], np.cumsum([len(route) for route in routes])])
+
+    travel_time, travel_dist = get_routes_interstops_time_distance(
+        time_matrix, distance_matrix, stop_indices, route_offsets
+    )
+
+    expected_time, expected_dist = [], []
+    for route in routes:
+        route_time, route_dist = get_interstops_time_distance(
+            time_matrix[np.ix_(route, route)], distance_matrix[np.ix_(route, route)]
+        )
+        expected_time += route_time
+        expected_dist += route_dist
+    np.testing.assert_array_equal(travel_time, expected_time)
+    np.testing.assert_array_equal(travel_dist, expected_dist)
+    assert travel_time.dtype == np.float32
+
+
+@pytest.mark.parametrize("route_offsets", [[1, 3, 5], [0, 4, 2, 5], [0, 3]])
+def test_routes_interstops_reject_invalid_offsets(route_offsets):
+    matrix = np.zeros((5, 5), dtype=np.float32)
+    with pytest.raises(ValueError, match="route_offsets"):
+        get_routes_interstops_time_distance(
+            matrix, matrix, np.arange(5), np.array(route_offsets)
+        )
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from pipelines.utils.OSRM.haversine import (
+    get_haversine_time_dist_matrix,
+    haversine_matrix,
+    haversine_time_dist_block,
+)
+from tests.benchmarks.benchmark_table import generate_random_stops
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_chunked_matrix_matches_broadcast(chunk_size):
+    stops = generate_random_stops(50)
+    matrices = get_haversine_time_dist_matrix(
+        stops, speed_kmh=36, slow_down=1.5, chunk_size=chunk_size
+    )
+    coordinates = stops[["longitude", "latitude"]].to_numpy()
+    distances = haversine_matrix(coordinates, coordinates)
+    assert matrices["distance_matrix"].dtype == np.float32
+    np.testing.assert_allclose(matrices["distance_matrix"], distances, rtol=1e-6)
+    np.testing.assert_allclose(
+        matrices["time_matrix"], distances / 10 * 1.5, rtol=1e-6, atol=1e-3
+    )
+
+
+def test_block_writes_into_given_buffers():
+    coordinates = generate_random_stops(20)[["longitude", "latitude"]].to_numpy()
+    out = {"durations": np.zeros((5, 20)), "distances": np.zeros((5, 20))}
+    durations, distances = haversine_time_dist_block(
+        coordinates[:5], coordinates, chunk_size=2, out=out
+    )
+    assert durations is out["durations"] and distances is out["distances"]
+    np.testing.assert_allclose(distances, haversine_matrix(coordinates[:5], coordinates))
+    np.testing.assert_allclose(np.diag(distances), 0, atol=1e-6)
+
+
+def test_matrix_fills_memory_maps(tmp_path):
+    stops = generate_random_stops(30)
+    out = {
+        name: np.lib.format.open_memmap(
+            tmp_path / f"{name}.npy", mode="w+", dtype=np.float32, shape=(30, 30)
+        )
+        for name in ("time_matrix", "distance_matrix")
+    }
+    matrices = get_haversine_time_dist_matrix(stops, chunk_size=4, out=out)
+    assert matrices["time_matrix"] is out["time_matrix"]
+    assert matrices["distance_matrix"] is out["distance_matrix"]
+    out["distance_matrix"].flush()
+    expected = get_haversine_time_dist_matrix(stops)
+    np.testing.assert_array_equal(
+        np.load(tmp_path / "distance_matrix.npy"), expected["distance_matrix"]
+    )
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from pipelines.utils.OSRM.get_osrm_tables import get_time_dist_matrix
+from pipelines.utils.OSRM.knn_tables import get_knn_time_dist_matrix
+from tests.benchmarks.benchmark_table import generate_random_stops
+
+
+@pytest.mark.parametrize("batch_size", [None, 7])
+def test_knn_matrix_matches_dense_matrix(osrm_endpoint, batch_size):
+    stops = generate_random_stops(60)
+    sparse_matrices = get_knn_time_dist_matrix(
+        stops, k=5, endpoint=osrm_endpoint, batch_size=batch_size, slow_down=2
+    )
+    dense = get_time_dist_matrix(
+        stops, endpoint=osrm_endpoint, slow_down=2, precision=None
+    )
+
+    time_matrix = sparse_matrices["time_matrix"]
+    assert time_matrix.shape == (60, 60)
+    assert np.all(np.diff(time_matrix.indptr) == 5)
+    rows = np.repeat(np.arange(60), 5)
+    assert not np.any(time_matrix.indices == rows)
+    np.testing.assert_allclose(
+        time_matrix.data, dense["time_matrix"][rows, time_matrix.indices]
+    )
+    distance_matrix = sparse_matrices["distance_matrix"]
+    np.testing.assert_allclose(
+        distance_matrix.data, dense["distance_matrix"][rows, distance_matrix.indices]
+    )
+    # candidates are the closest stops by distance
+    closest = np.sort(dense["distance_matrix"] + np.diag(np.full(60, np.inf)), axis=1)
+    np.testing.assert_allclose(
+        np.sort(distance_matrix.toarray(), axis=1)[:, -5:].max(axis=1),
+        closest[:, 4],
+    )
+
+
+def test_knn_matrix_with_fewer_stops_than_neighbours(osrm_endpoint):
+    stops = generate_random_stops(4)
+    matrices = get_knn_time_dist_matrix(stops, k=10, endpoint=osrm_endpoint)
+    assert matrices["time_matrix"].nnz == 12
@@ -0,0 +1,73 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipelines.utils.OSRM.local_tsp import (
+    nearest_neighbour_path,
+    path_cost,
+    solve_open_tsp,
+)
+from pipelines.utils.OSRM.osrm_tsp import OsrmTspRoutes
+from tests.benchmarks.benchmark_table import generate_random_stops
+
+
+def euclidean_matrix(n_stops, seed):
+    points = np.random.default_rng(seed).random((n_stops, 2))
+    return np.sqrt(((points[:, None] - points[None]) ** 2).sum(axis=-1))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_solve_open_tsp_keeps_start_and_end(seed):
+    matrix = euclidean_matrix(60, seed)
+    path = solve_open_tsp(matrix, start=3, end=7)
+    assert path[0] == 3 and path[-1] == 7
+    assert sorted(path) == list(range(60))
+    nearest_neighbour = nearest_neighbour_path(matrix, start=3, end=7)
+    assert path_cost(path, matrix) <= path_cost(nearest_neighbour, matrix)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_solve_open_tsp_close_to_optimum(seed):
+    matrix = euclidean_matrix(8, seed)
+    path = solve_open_tsp(matrix)
+    optimum = min(
+        path_cost(np.array((0,) + middle + (7,)), matrix)
+        for middle in itertools.permutations(range(1, 7))
+    )
+    assert path_cost(path, matrix) <= optimum * 1.05
+
+
+def test_solve_open_tsp_avoids_unroutable_pairs():
+    matrix = euclidean_matrix(10, 0)
+    matrix[0, 1:9] = np.nan
+    matrix[0, 4] = 1
+    path = solve_open_tsp(matrix)
+    assert path[1] == 4
+
+
+def test_local_backend_sequences_routes(osrm_endpoint):
+    stops = generate_random_stops(41)
+    stops["route_id"] = [i % 2 for i in range(41)]
+    stops["depot_id"] = "depot"
+    depot = pd.DataFrame(
+        {"longitude": [-0.1], "latitude": [51.5], "depot_id": ["depot"]}
+    )
+    tsp = OsrmTspRoutes(
+        stops, depot, stops_limit=10, osrm_port=osrm_endpoint, backend="local"
+    )
+    result = tsp.generate_all_tsp_routes()
+
+    assert tsp.failed_routes == {}
+    for _, route in result.groupby("route_id"):
+        assert list(route["route_sequence"]) == list(range(route.shape[0]))
+        assert route["activity_type"].iloc[0] == "START_AT_DEPOT"
+        assert route["activity_type"].iloc[-1] == "RETURN_TO_DEPOT"
+        assert route["duration_seconds"].iloc[0] == 0
+        assert (route["distance_km"].iloc[1:] >= 0).all()
+
+
+def test_unknown_backend_raises():
+    with pytest.raises(ValueError):
+        OsrmTspRoutes(pd.DataFrame(), pd.DataFrame(), backend="vroom")
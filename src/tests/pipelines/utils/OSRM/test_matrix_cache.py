@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from pipelines.utils.OSRM.matrix_cache import MatrixCache, cached_time_dist_matrix
+from pipelines.utils.OSRM.haversine import haversine_matrix
+
+
+@pytest.fixture
+def coordinates():
+    rng = np.random.default_rng(3)
+    return np.column_stack([-0.2 + 0.1 * rng.random(12), 51.5 + 0.1 * rng.random(12)])
+
+
+class CountingFetch:
+    def __init__(self, coordinates):
+        self.coordinates = coordinates
+        self.requested_cells = 0
+
+    def __call__(self, sources, destinations):
+        self.requested_cells += sources.shape[0] * destinations.shape[0]
+        distances = haversine_matrix(
+            self.coordinates[sources], self.coordinates[destinations]
+        )
+        return distances / 10, distances
+
+
+class TestCachedTimeDistMatrix:
+    def test_exact_hit_is_not_requested(self, tmp_path, coordinates):
+        cache = MatrixCache(str(tmp_path))
+        fetch = CountingFetch(coordinates)
+        cached_time_dist_matrix(cache, coordinates, "port", "driving", fetch)
+        fetch.requested_cells = 0
+        durations, distances = cached_time_dist_matrix(
+            cache, coordinates, "port", "driving", fetch
+        )
+        assert fetch.requested_cells == 0
+        assert isinstance(distances, np.memmap)
+        np.testing.assert_allclose(distances, fetch(np.arange(12), np.arange(12))[1])
+
+    def test_partial_hit_requests_missing_rows_and_columns(self, tmp_path, coordinates):
+        cache = MatrixCache(str(tmp_path))
+        cached_time_dist_matrix(
+            cache, coordinates[:10], "port", "driving", CountingFetch(coordinates[:10])
+        )
+        shuffled = coordinates[::-1]
+        fetch = CountingFetch(shuffled)
+        durations, distances = cached_time_dist_matrix(
+            cache, shuffled, "port", "driving", fetch
+        )
+        assert fetch.requested_cells == 2 * 12 + 10 * 2
+        expected = haversine_matrix(shuffled, shuffled)
+        np.testing.assert_allclose(distances, expected, rtol=1e-5)
+
+    def test_other_profile_is_a_miss(self, tmp_path, coordinates):
+        cache = MatrixCache(str(tmp_path))
+        cached_time_dist_matrix(
+            cache, coordinates, "port", "driving", CountingFetch(coordinates)
+        )
+        assert cache.get(coordinates, "port", "cycling") is None
+        assert cache.find_overlap(coordinates, "port", "cycling")[0] is None
+
+    def test_overlap_reads_only_best_entry(self, tmp_path, coordinates, monkeypatch):
+        cache = MatrixCache(str(tmp_path))
+        for subset in (coordinates[:4], coordinates[4:10], coordinates[2:6]):
+            cached_time_dist_matrix(
+                cache, subset, "port", "driving", CountingFetch(subset)
+            )
+        cache.find_overlap(coordinates, "port", "driving")
+        loaded = []
+        load = np.load
+        monkeypatch.setattr(
+            np, "load", lambda file, *args, **kwargs: loaded.append(file) or load(file)
+        )
+        entry, positions = cache.find_overlap(coordinates[3:9], "port", "driving")
+        assert loaded == [entry / "coordinates.npy"]
+        assert (positions >= 0).sum() == 5
+
+    def test_lost_rename_race_is_not_evicted(self, tmp_path, coordinates, monkeypatch):
+        def rename(source, target):
+            raise OSError("Directory not empty")
+
+        def evict():
+            raise AssertionError("evict must not run after a lost rename race")
+
+        cache = MatrixCache(str(tmp_path))
+        monkeypatch.setattr("os.rename", rename)
+        monkeypatch.setattr(cache, "evict", evict)
+        cached_time_dist_matrix(
+            cache, coordinates, "port", "driving", CountingFetch(coordinates)
+        )
+        assert list(tmp_path.iterdir()) == []
+
+    def test_evicts_least_recently_used(self, tmp_path, coordinates):
+        cache = MatrixCache(str(tmp_path), max_size_bytes=3000)
+        for n_stops in (8, 9, 10):
+            subset = coordinates[:n_stops]
+            cached_time_dist_matrix(
+                cache, subset, "port", "driving", CountingFetch(subset)
+            )
+        assert cache.get(coordinates[:10], "port", "driving") is not None
+        assert cache.get(coordinates[:8], "port", "driving") is None
+
+    def test_other_null_value_is_a_miss(self, tmp_path, coordinates):
+        cache = MatrixCache(str(tmp_path))
+        cached_time_dist_matrix(
+            cache, coordinates, "port", "driving", CountingFetch(coordinates)
+        )
+        assert cache.get(coordinates, "port", "driving", np.inf) is None
+        assert cache.find_overlap(coordinates, "port", "driving", np.inf)[0] is None
+        assert cache.get(coordinates, "port", "driving", np.nan) is not None
+
+    def test_evicted_overlap_is_a_miss(self, tmp_path, coordinates, monkeypatch):
+        cache = MatrixCache(str(tmp_path))
+        cached_time_dist_matrix(
+            cache, coordinates[:10], "port", "driving", CountingFetch(coordinates[:10])
+        )
+
+        def load(entry):
+            raise FileNotFoundError(entry / "time_matrix.npy")
+
+        monkeypatch.setattr(cache, "load", load)
+        fetch = CountingFetch(coordinates)
+        durations, distances = cached_time_dist_matrix(
+            cache, coordinates, "port", "driving", fetch
+        )
+        assert fetch.requested_cells == 12 * 12
+        np.testing.assert_allclose(
+            distances, haversine_matrix(coordinates, coordinates), rtol=1e-5
+        )
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from pipelines.utils.OSRM.matrix_cache import MatrixCache
+from pipelines.utils.OSRM.matrix_service import (
+    HaversineBackend,
+    MatrixService,
+    OsrmBackend,
+)
+from tests.benchmarks.benchmark_table import generate_random_stops
+from tests.benchmarks.stand_in_server import StandInBackend
+
+
+@pytest.fixture
+def stops():
+    return generate_random_stops(17)
+
+
+def test_backends_share_result_type(osrm_endpoint, stops):
+    osrm = MatrixService(OsrmBackend(osrm_endpoint, tile_size=6)).get_matrices(stops)
+    stand_in = MatrixService(StandInBackend()).get_matrices(stops)
+    estimate = MatrixService(HaversineBackend()).get_matrices(stops)
+    for matrices in (osrm, stand_in, estimate):
+        assert matrices.time_matrix.dtype == np.float32
+        assert matrices.distance_matrix.dtype == np.float32
+        assert matrices.n_stops == 17
+    np.testing.assert_array_equal(osrm.time_matrix, stand_in.time_matrix)
+    np.testing.assert_allclose(estimate.distance_matrix, osrm.distance_matrix, atol=0.1)
+
+
+def test_haversine_backend_skips_cache(tmp_path, stops):
+    cache = MatrixCache(str(tmp_path))
+    MatrixService(HaversineBackend(), cache=cache).get_matrices(stops)
+    MatrixService(StandInBackend(), cache=cache).get_matrices(stops)
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_update_keeps_slow_down(stops):
+    service = MatrixService(StandInBackend())
+    previous = service.get_matrices(stops.iloc[:10], slow_down=1.5)
+    updated = service.update_matrices(previous, stops.iloc[5:])
+    expected = service.get_matrices(stops.iloc[5:], slow_down=1.5)
+    assert updated.slow_down == 1.5
+    np.testing.assert_allclose(updated.time_matrix, expected.time_matrix, rtol=1e-6)
+    np.testing.assert_array_equal(updated.distance_matrix, expected.distance_matrix)
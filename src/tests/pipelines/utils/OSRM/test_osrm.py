@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import LineString
+
+from pipelines.utils.OSRM.osrm import (
+    OsrmBatchRoutePathNormalizer,
+    OsrmRoutePathNormalizer,
+    leg_geometries,
+)
+from tests.benchmarks.benchmark_table import generate_random_stops
+from tests.benchmarks.stand_in_server import (
+    generate_route_response,
+    generate_trip_response,
+)
+
+
+@pytest.fixture
+def route_results():
+    stops = generate_random_stops(12)
+    return generate_route_response(stops[["longitude", "latitude"]].values)
+
+
+def test_leg_geometries_concatenate_step_coordinates(route_results):
+    legs = route_results["routes"][0]["legs"]
+    expected = [
+        LineString(sum((step["geometry"]["coordinates"] for step in leg["steps"]), []))
+        for leg in legs
+    ]
+    geometry = leg_geometries(legs)
+    assert len(geometry) == len(expected) == 11
+    assert all(path.equals_exact(other, 0) for path, other in zip(geometry, expected))
+
+
+def test_leg_geometries_without_steps(route_results):
+    legs = route_results["routes"][0]["legs"]
+    legs = [{**leg, "steps": []} if i % 2 else leg for i, leg in enumerate(legs)]
+    geometry = leg_geometries(legs)
+    assert all(path is None for path in geometry[1::2])
+    assert all(isinstance(path, LineString) for path in geometry[::2])
+
+
+def test_normalizer_leg_info_leaves_results_untouched(route_results):
+    normalizer = OsrmRoutePathNormalizer(route_results, "routes")
+    leg_info = normalizer.extract_travel_leg_info()
+    assert leg_info.shape[0] == 11
+    assert leg_info.crs == "EPSG:4326"
+    np.testing.assert_allclose(
+        leg_info.geometry.length.values,
+        [path.length for path in leg_geometries(route_results["routes"][0]["legs"])],
+    )
+    assert "__id" not in route_results["routes"][0]["legs"][0]
+
+
+def test_batch_normalizer_matches_per_route_normalizer():
+    stops = generate_random_stops(30)[["longitude", "latitude"]].values
+    results = [
+        generate_trip_response(stops[start : start + size])
+        for start, size in [(0, 2), (2, 9), (11, 5), (16, 14)]
+    ]
+    for waypoint in results[1]["waypoints"]:
+        waypoint["waypoint_index"] = 8 - waypoint["waypoint_index"]
+    route_ids = ["a", "c", "b", "d"]
+
+    batch = OsrmBatchRoutePathNormalizer(results, route_ids, "trips").normalize()
+
+    expected = {"travel_leg_info": [], "stop_sequence_info": [], "route_summary": []}
+    for route_id, route_results in zip(route_ids, results):
+        normalizer = OsrmRoutePathNormalizer(route_results, "trips")
+        for name, info in zip(
+            expected,
+            [
+                normalizer.extract_travel_leg_info(),
+                normalizer.extract_road_snap_info(),
+                normalizer.extract_travel_summary_info(),
+            ],
+        ):
+            expected[name].append(info.assign(route_id=route_id))
+    for name, info in expected.items():
+        pd.testing.assert_frame_equal(batch[name], pd.concat(info).reset_index(drop=True))
+    assert list(batch["stop_sequence_info"]["route_sequence"][2:11]) == list(range(9))
+
+
+def test_batch_normalizer_checks_route_ids(route_results):
+    with pytest.raises(ValueError):
+        OsrmBatchRoutePathNormalizer([route_results], ["a", "b"], "routes")
@@ -0,0 +1,81 @@
+import time
+
+import pandas as pd
+import pytest
+
+from pipelines.utils.OSRM import osrm_get_routes
+from pipelines.utils.OSRM.osrm_get_routes import (
+    OSRM_COMPACT_DEFAULTS,
+    return_route_osrm_info,
+)
+from tests.benchmarks.benchmark_table import generate_random_stops
+
+
+@pytest.fixture
+def assigned_stops():
+    stops = generate_random_stops(40)
+    stops["route_id"] = [f"vehicle_{i % 7}" for i in range(40)][::-1]
+    stops["profile"] = "driving"
+    return stops
+
+
+def test_concurrent_routes_match_serial(osrm_endpoint, assigned_stops):
+    serial = return_route_osrm_info(assigned_stops, osrm_endpoint, max_in_flight=1)
+    concurrent = return_route_osrm_info(
+        assigned_stops, osrm_endpoint, max_in_flight=4
+    )
+    assert list(serial) == ["travel_leg_info", "stop_sequence_info", "route_summary"]
+    for name in serial:
+        pd.testing.assert_frame_equal(concurrent[name], serial[name])
+    assert (
+        list(concurrent["route_summary"]["route_id"])
+        == list(assigned_stops["route_id"].unique())
+    )
+    assert concurrent["travel_leg_info"].shape[0] == 40 - 7
+
+
+def test_chunked_normalisation_matches_single_chunk(osrm_endpoint, assigned_stops):
+    single = return_route_osrm_info(assigned_stops, osrm_endpoint)
+    chunked = return_route_osrm_info(assigned_stops, osrm_endpoint, chunk_size=3)
+    for name in single:
+        pd.testing.assert_frame_equal(chunked[name], single[name])
+
+
+def test_compact_routes_match_kpis(osrm_endpoint, assigned_stops):
+    full = return_route_osrm_info(assigned_stops, osrm_endpoint)
+    compact = return_route_osrm_info(
+        assigned_stops, osrm_endpoint, osrm_defaults=OSRM_COMPACT_DEFAULTS
+    )
+    columns = ["duration_seconds", "distance_km", "travel_sequence", "route_id"]
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(compact["travel_leg_info"][columns]),
+        pd.DataFrame(full["travel_leg_info"][columns]),
+    )
+    assert compact["travel_leg_info"].geometry.isna().all()
+    assert (
+        compact["route_summary"]
+        .geometry.geom_equals_exact(full["route_summary"].geometry, 1e-6)
+        .all()
+    )
+
+
+def test_no_routes_return_empty_info(osrm_endpoint, assigned_stops):
+    route_info = return_route_osrm_info(assigned_stops.iloc[:0], osrm_endpoint)
+    assert list(route_info) == ["travel_leg_info", "stop_sequence_info", "route_summary"]
+    assert all(info.empty for info in route_info.values())
+
+
+def test_failed_route_cancels_pending_requests(
+    osrm_endpoint, assigned_stops, monkeypatch
+):
+    requested = []
+
+    def request_route(route_id, *args):
+        requested.append(route_id)
+        time.sleep(0.05)
+        raise ValueError(f"route {route_id} failed")
+
+    monkeypatch.setattr(osrm_get_routes, "_request_route", request_route)
+    with pytest.raises(ValueError, match="failed"):
+        return_route_osrm_info(assigned_stops, osrm_endpoint, max_in_flight=1)
+    assert len(requested) < assigned_stops["route_id"].nunique()
@@ -0,0 +1,137 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from pipelines.utils.OSRM import osrm_tsp
+from pipelines.utils.OSRM.osrm_tsp import OSRM_TRIP_COMPACT_DEFAULTS, OsrmTspRoutes
+from tests.benchmarks.benchmark_table import generate_random_stops
+from tests.benchmarks.stand_in_server import generate_trip_response
+
+
+@pytest.fixture
+def stops():
+    stops = generate_random_stops(31)
+    stops["route_id"] = [i % 5 for i in range(31)]
+    stops["depot_id"] = "depot"
+    return stops
+
+
+@pytest.fixture
+def depot():
+    return pd.DataFrame({"longitude": [-0.1], "latitude": [51.5], "depot_id": ["depot"]})
+
+
+class FlakyTspRoutes(OsrmTspRoutes):
+    def __init__(self, *args, fail_route_id, fail_times, error=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_route_id = fail_route_id
+        self.fail_times = fail_times
+        self.error = error or requests.ConnectionError("trip service unavailable")
+        self.attempted_at = []
+
+    def generate_tsp_route(self, route, route_id=None, timeout=None):
+        if route["route_id"].iloc[0] == self.fail_route_id and self.fail_times > 0:
+            self.fail_times -= 1
+            self.attempted_at.append(time.monotonic())
+            raise self.error
+        return super().generate_tsp_route(route, route_id, timeout)
+
+
+def test_concurrent_matches_serial(osrm_endpoint, stops, depot):
+    serial = OsrmTspRoutes(stops, depot, osrm_port=osrm_endpoint)
+    concurrent = OsrmTspRoutes(stops, depot, osrm_port=osrm_endpoint)
+    expected = serial.generate_all_tsp_routes(max_in_flight=1)
+    result = concurrent.generate_all_tsp_routes(max_in_flight=4)
+    pd.testing.assert_frame_equal(result, expected)
+    assert list(result["route_id"].unique()) == [0, 1, 2, 3, 4]
+    assert (result["activity_type"] == "START_AT_DEPOT").sum() == 5
+
+
+def test_failed_route_is_retried(osrm_endpoint, stops, depot):
+    tsp = FlakyTspRoutes(
+        stops, depot, osrm_port=osrm_endpoint, fail_route_id=2, fail_times=1
+    )
+    result = tsp.generate_all_tsp_routes(retries=1, backoff_factor=0)
+    assert tsp.failed_routes == {}
+    assert 2 in set(result["route_id"])
+
+
+def test_invalid_result_is_not_retried(osrm_endpoint, stops, depot):
+    tsp = FlakyTspRoutes(
+        stops,
+        depot,
+        osrm_port=osrm_endpoint,
+        fail_route_id=2,
+        fail_times=1,
+        error=ValueError("OSRM trip request failed"),
+    )
+    result = tsp.generate_all_tsp_routes(retries=2, backoff_factor=0)
+    assert len(tsp.attempted_at) == 1
+    assert tsp.failed_routes == {2: "OSRM trip request failed"}
+    assert 2 not in set(result["route_id"])
+
+
+def test_retries_back_off_exponentially(osrm_endpoint, stops, depot):
+    tsp = FlakyTspRoutes(
+        stops, depot, osrm_port=osrm_endpoint, fail_route_id=2, fail_times=3
+    )
+    tsp.generate_all_tsp_routes(retries=2, backoff_factor=0.05)
+    waits = np.diff(tsp.attempted_at)
+    assert list(tsp.failed_routes) == [2]
+    assert waits[0] >= 0.05 and waits[1] >= 0.1
+
+
+def test_timeout_stops_retrying(osrm_endpoint, stops, depot):
+    tsp = FlakyTspRoutes(
+        stops, depot, osrm_port=osrm_endpoint, fail_route_id=2, fail_times=10
+    )
+    tsp.generate_all_tsp_routes(timeout=0.3, retries=10, backoff_factor=0.1)
+    assert "exceeded 0.3 seconds" in tsp.failed_routes[2]
+    assert len(tsp.attempted_at) < 5
+
+
+def test_single_stop_route_is_not_sequenced(osrm_endpoint, stops, depot, monkeypatch):
+    def solve_single_tsp(route, **kwargs):
+        if route["route_id"].iloc[0] == 2:
+            return generate_trip_response(np.empty((1, 2)))
+        return trip_service(route, **kwargs)
+
+    trip_service = osrm_tsp.solve_single_tsp
+    monkeypatch.setattr(osrm_tsp, "solve_single_tsp", solve_single_tsp)
+    tsp = OsrmTspRoutes(stops, depot, osrm_port=osrm_endpoint)
+    result = tsp.generate_all_tsp_routes(backoff_factor=0)
+    assert tsp.failed_routes == {}
+    assert result.loc[result["route_id"] == 2, "route_sequence"].isna().all()
+
+
+def test_failed_route_is_isolated(osrm_endpoint, stops, depot):
+    tsp = FlakyTspRoutes(
+        stops, depot, osrm_port=osrm_endpoint, fail_route_id=2, fail_times=5
+    )
+    result = tsp.generate_all_tsp_routes(retries=1, backoff_factor=0)
+    assert list(tsp.failed_routes) == [2]
+    assert list(result["route_id"].unique()) == [0, 1, 3, 4]
+
+
+def test_compact_trips_match_sequence(osrm_endpoint, stops, depot):
+    full = OsrmTspRoutes(stops, depot, osrm_port=osrm_endpoint)
+    compact = OsrmTspRoutes(
+        stops, depot, osrm_port=osrm_endpoint, osrm_defaults=OSRM_TRIP_COMPACT_DEFAULTS
+    )
+    expected = full.generate_all_tsp_routes().drop(columns="geometry")
+    result = compact.generate_all_tsp_routes()
+    assert result["geometry"].isna().all()
+    pd.testing.assert_frame_equal(result.drop(columns="geometry"), expected)
+
+
+@pytest.mark.parametrize(
+    "status_code, transient", [(429, True), (503, True), (400, False)]
+)
+def test_only_transient_statuses_are_retried(status_code, transient):
+    response = requests.Response()
+    response.status_code = status_code
+    error = requests.HTTPError(response=response)
+    assert osrm_tsp.is_transient_error(error) is transient
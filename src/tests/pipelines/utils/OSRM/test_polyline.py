@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from pipelines.utils.OSRM.polyline import (
+    decode_polyline,
+    decode_polylines,
+    encode_polyline,
+)
+
+
+def test_decode_reference_polyline():
+    coordinates = decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@", precision=5)
+    np.testing.assert_allclose(
+        coordinates, [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    )
+
+
+@pytest.mark.parametrize("precision", [5, 6])
+def test_decode_many_polylines_round_trip(precision):
+    rng = np.random.default_rng(precision)
+    paths = [
+        np.c_[rng.uniform(-180, 180, n), rng.uniform(-90, 90, n)].round(precision)
+        for n in [3, 0, 1, 50, 2]
+    ]
+    encoded = [encode_polyline(path, precision) for path in paths]
+    coordinates, counts = decode_polylines(encoded, precision)
+    assert list(counts) == [3, 0, 1, 50, 2]
+    np.testing.assert_allclose(coordinates, np.vstack(paths), atol=10**-precision)
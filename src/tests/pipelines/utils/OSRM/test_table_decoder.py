@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pytest
+
+from pipelines.utils.OSRM.table_decoder import decode_table_response
+
+
+def _chunked(body: bytes, size: int):
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+@pytest.fixture
+def response():
+    return {
+        "code": "Ok",
+        "sources": [{"name": "A [1]", "location": [0.1, 51.2]}] * 2,
+        "durations": [[0, 12.5, None], [13.25, 0, 7]],
+        "destinations": [{"name": "", "location": [0.1, 51.2]}] * 3,
+        "distances": [[0, 120.0, None], [131, 0, 1e3]],
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 4096])
+def test_decode_matches_json(response, chunk_size):
+    body = json.dumps(response).encode()
+    matrices = decode_table_response(_chunked(body, chunk_size), 2, 3)
+    assert matrices["durations"].dtype == np.float32
+    np.testing.assert_array_equal(
+        matrices["durations"], np.array(response["durations"], dtype=float)
+    )
+    np.testing.assert_array_equal(
+        matrices["distances"], np.array(response["distances"], dtype=float)
+    )
+
+
+def test_decode_into_strided_views(response):
+    body = json.dumps(response, indent=2).encode()
+    durations = np.zeros((4, 5), dtype=np.float32)
+    distances = np.zeros((4, 5), dtype=np.float32)
+    out = {"durations": durations[1:3, 2:5], "distances": distances[1:3, 2:5]}
+    decode_table_response(_chunked(body, 5), 2, 3, out=out, null_value=np.inf)
+    assert durations[1, 4] == np.inf
+    assert distances[2, 4] == 1000
+    assert durations[0].sum() == 0
+
+
+def test_error_response_raises():
+    body = json.dumps({"code": "TooBig", "message": "Too many table coordinates"})
+    with pytest.raises(ValueError, match="Too many table coordinates"):
+        decode_table_response([body.encode()], 2, 2)
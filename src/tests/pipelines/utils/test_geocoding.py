@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+from pipelines.utils.geocoding import (
+    GeocodeCache,
+    GeocodingService,
+    address_hash,
+    google_result_records,
+    normalise_address,
+)
+
+
+class FakeGeocoder:
+    def __init__(self):
+        self.queries = []
+
+    def geocode(self, query, timeout=None):
+        self.queries.append(query)
+        if "nowhere" in query:
+            return None
+        if "broken" in query:
+            raise ConnectionError("geocoder unavailable")
+        return SimpleNamespace(
+            latitude=51.5, longitude=-0.1, address=query.upper(), raw={"q": query}
+        )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeocodeCache(tmp_path / "geocodes.sqlite")
+
+
+def test_normalise_address():
+    assert normalise_address("  10 Downing St ,London. ") == "10 downing st, london"
+    assert address_hash("10 Downing St, London") == address_hash("10 downing st ,london")
+
+
+def test_only_misses_are_geocoded_and_cached(cache):
+    geocoder = FakeGeocoder()
+    service = GeocodingService(geocoder, cache, min_interval=0)
+    addresses = ["1 Main St", "1 main st ", "nowhere", "broken", "2 Main St"]
+
+    first = service.geocode(addresses)
+    assert sorted(geocoder.queries) == ["1 Main St", "2 Main St", "broken", "nowhere"]
+    assert first["address"].tolist() == addresses
+    assert first["latitude"].tolist()[:2] == [51.5, 51.5]
+    assert first["failed"].tolist() == [False, False, True, False, False]
+    assert not first["cached"].any()
+    assert len(cache) == 3
+
+    geocoder.queries.clear()
+    second = service.geocode(addresses)
+    assert geocoder.queries == ["broken"]
+    assert second["cached"].tolist() == [True, True, True, False, True]
+    assert second["failed"].tolist() == first["failed"].tolist()
+
+
+def test_retry_failed(cache):
+    geocoder = FakeGeocoder()
+    GeocodingService(geocoder, cache, min_interval=0).geocode(["nowhere"])
+    GeocodingService(geocoder, cache, min_interval=0, retry_failed=True).geocode(
+        ["nowhere"]
+    )
+    assert geocoder.queries == ["nowhere", "nowhere"]
+
+
+def test_imported_google_results_are_served_from_cache(cache):
+    found = {
+        "10 Downing St, London": [
+            {
+                "formatted_address": "10 Downing St, London SW1A 2AA, UK",
+                "geometry": {"location": {"lat": 51.5034, "lng": -0.1276}},
+            }
+        ]
+    }
+    cache.put_many(google_result_records({"nowhere": {}}, failed=True))
+    cache.put_many(google_result_records(found))
+    geocoder = FakeGeocoder()
+    geocoded = GeocodingService(geocoder, cache, min_interval=0).geocode(
+        ["10 downing st, london", "Nowhere"]
+    )
+    assert geocoder.queries == []
+    assert geocoded["cached"].all()
+    assert geocoded["latitude"].iloc[0] == 51.5034
+    assert list(geocoded["failed"]) == [False, True]
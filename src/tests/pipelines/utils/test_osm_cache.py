@@ -0,0 +1,67 @@
+import os
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point
+
+from pipelines.utils.OSRM.osrm_get_routes import BOUNDING_BOX
+from pipelines.utils.osm_cache import CachedOsm, bounding_box_list
+
+
+class FakeOsm:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def get_network(self, network_type):
+        self.calls.append(network_type)
+        return gpd.GeoDataFrame(
+            {"highway": ["primary"]}, geometry=[Point(-0.1, 51.5)], crs="EPSG:4326"
+        )
+
+
+def test_layers_are_extracted_once(tmp_path):
+    pytest.importorskip("pyarrow.parquet")
+    pbf = tmp_path / "area.osm.pbf"
+    pbf.write_bytes(b"pbf")
+    calls = []
+    opened = []
+
+    def _factory():
+        opened.append(True)
+        return FakeOsm(calls)
+
+    osm = CachedOsm(pbf, _factory, tmp_path / "cache", BOUNDING_BOX)
+    first = osm.get_network("driving")
+    osm = CachedOsm(pbf, _factory, tmp_path / "cache", BOUNDING_BOX)
+    second = osm.get_network("driving")
+    assert calls == ["driving"] and len(opened) == 1
+    assert second.equals(first)
+
+    osm.get_network("walking")
+    CachedOsm(pbf, _factory, tmp_path / "cache").get_network("driving")
+    pbf.write_bytes(b"changed pbf")
+    CachedOsm(pbf, _factory, tmp_path / "cache", BOUNDING_BOX).get_network("driving")
+    assert calls == ["driving", "walking", "driving", "driving"]
+    assert not [path for path in (tmp_path / "cache").iterdir() if path.name[0] == "."]
+
+
+def test_touched_file_is_a_miss(tmp_path):
+    pytest.importorskip("pyarrow.parquet")
+    pbf = tmp_path / "area.osm.pbf"
+    pbf.write_bytes(b"pbf")
+    calls = []
+    CachedOsm(pbf, lambda: FakeOsm(calls), tmp_path / "cache").get_network()
+    mtime_ns = pbf.stat().st_mtime_ns
+    os.utime(pbf, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    CachedOsm(pbf, lambda: FakeOsm(calls), tmp_path / "cache").get_network()
+    assert calls == ["driving", "driving"]
+
+
+def test_bounding_box_list():
+    assert bounding_box_list(BOUNDING_BOX) == [
+        BOUNDING_BOX["min_lon"],
+        BOUNDING_BOX["min_lat"],
+        BOUNDING_BOX["max_lon"],
+        BOUNDING_BOX["max_lat"],
+    ]
+    assert bounding_box_list(None) is None
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+from kedro.framework.hooks import _create_hook_manager
+from kedro.io import DataCatalog
+from kedro.pipeline import node, pipeline
+from kedro.runner import SequentialRunner
+
+from shared import jobs, runner
+
+
+def _double(x):
+    return x * 2
+
+
+def _fail(x):
+    raise ValueError("broken node")
+
+
+_release_slow_node = threading.Event()
+
+
+def _slow(x):
+    _release_slow_node.wait(timeout=10)
+    return x
+
+
+def _fake_execute_pipeline(
+    package_name,
+    project_path,
+    extra_params,
+    pipeline_name,
+    hooks,
+    cache=None,
+    inputs=None,
+):
+    second = {"broken": _fail, "slow": _slow}.get(pipeline_name, _double)
+    test_pipeline = pipeline(
+        [
+            node(_double, "params:x", "y", name="first"),
+            node(second, "y", "z", name="second"),
+        ]
+    )
+    catalog = DataCatalog(feed_dict={"params:x": extra_params["x"]})
+    hook_manager = _create_hook_manager()
+    for hook in hooks:
+        hook_manager.register(hook)
+    hook_manager.hook.before_pipeline_run(
+        run_params={}, pipeline=test_pipeline, catalog=catalog
+    )
+    return SequentialRunner().run(test_pipeline, catalog, hook_manager)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(runner, "execute_pipeline", _fake_execute_pipeline)
+    manager = jobs.JobManager(history_size=2)
+    yield manager
+    manager.shutdown()
+
+
+def test_job_reports_progress_and_result(manager):
+    job = manager.submit("pipelines", ".", "test", {"x": 3})
+    assert job.wait(timeout=10)
+    assert job.status == "done"
+    assert job.result == {"z": 12}
+    assert job.progress == 1.0
+    assert [row["node"] for row in job.node_table()] == ["first", "second"]
+    assert all(row["duration"] >= 0 for row in job.node_table())
+    assert manager.get(job.job_id) is job
+
+
+def test_failed_job_and_history(manager):
+    done = manager.submit("pipelines", ".", "test", {"x": 1})
+    failed = manager.submit("pipelines", ".", "broken", {"x": 1})
+    assert done.wait(timeout=10) and failed.wait(timeout=10)
+    assert failed.status == "failed"
+    assert isinstance(failed.error, ValueError)
+    assert failed.progress == 0.5
+    assert [row["status"] for row in failed.node_table()] == ["done", "failed"]
+    assert manager.submit("pipelines", ".", "test", {"x": 1}).wait(timeout=10)
+    assert manager.get(done.job_id) is None
+    assert [job.pipeline_name for job in manager.jobs("broken")] == ["broken"]
+
+
+def test_wait_times_out_while_node_runs(manager):
+    _release_slow_node.clear()
+    job = manager.submit("pipelines", ".", "slow", {"x": 1})
+    assert not job.wait(timeout=0.05)
+    assert job.status == "running"
+    _release_slow_node.set()
+    assert job.wait(timeout=10)
+    assert job.result == {"z": 2}
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+from kedro.pipeline import node, pipeline
+
+from shared import runner
+from shared.memoise import PipelineResultCache, fingerprint, run_key
+
+
+def _identity(x):
+    return x
+
+
+FAKE_PIPELINES = {
+    "iris_agg_v2": pipeline([node(_identity, "data", "output")]),
+    "iris_agg": pipeline([node(_identity, "data", "output")]),
+    "persisted": pipeline([node(_identity, "data", "output")]),
+}
+
+
+class FakeSession:
+    runs = []
+    closed = 0
+
+    def __init__(self, extra_params):
+        self._extra_params = extra_params
+        self._hook_manager = None
+
+    @classmethod
+    def create(cls, package_name, project_path, extra_params):
+        return cls(extra_params)
+
+    def run(self, pipeline_name):
+        FakeSession.runs.append(pipeline_name)
+        if pipeline_name == "persisted":
+            return {}
+        return {"output": self._extra_params["data"].sum()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        FakeSession.closed += 1
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({"a": [1.0, 2.0], "b": ["x", "y"]})
+
+
+def test_fingerprint_is_content_based(data):
+    assert fingerprint({"df": data, "k": [1, 2]}) == fingerprint(
+        {"k": [1, 2], "df": data.copy()}
+    )
+    changed = data.copy()
+    changed.loc[1, "a"] = 3.0
+    assert fingerprint(changed) != fingerprint(data)
+    assert fingerprint(data.rename(columns={"a": "c"})) != fingerprint(data)
+    assert fingerprint(np.arange(3)) != fingerprint(np.arange(3.0))
+    assert run_key("a", {"x": 1}) != run_key("b", {"x": 1})
+
+
+def test_execute_pipeline_memoises_outputs(monkeypatch, data):
+    monkeypatch.setattr(runner, "KedroSession", FakeSession)
+    monkeypatch.setattr(runner, "pipelines", FAKE_PIPELINES)
+    FakeSession.runs = []
+    cache = PipelineResultCache(max_entries=1)
+    params = {"data": data, "agg.group_columns": ["b"]}
+
+    first = runner.execute_pipeline("pipelines", ".", params, "iris_agg_v2", cache=cache)
+    first["output"]["a"] = -1
+    second = runner.execute_pipeline(
+        "pipelines", ".", {**params, "data": data.copy()}, "iris_agg_v2", cache=cache
+    )
+    assert FakeSession.runs == ["iris_agg_v2"]
+    assert second["output"]["a"] == 3.0
+
+    runner.execute_pipeline("pipelines", ".", params, "iris_agg", cache=cache)
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "evictions": 1,
+        "entries": 1,
+        "max_entries": 1,
+    }
+
+
+def test_execute_pipeline_closes_session(monkeypatch, data):
+    monkeypatch.setattr(runner, "KedroSession", FakeSession)
+    FakeSession.closed = 0
+    runner.execute_pipeline("pipelines", ".", {"data": data}, "iris_agg_v2")
+    with pytest.raises(KeyError):
+        runner.execute_pipeline("pipelines", ".", {}, "iris_agg_v2")
+    assert FakeSession.closed == 2
+
+
+def test_persisted_outputs_are_not_memoised(monkeypatch, data):
+    monkeypatch.setattr(runner, "KedroSession", FakeSession)
+    monkeypatch.setattr(runner, "pipelines", FAKE_PIPELINES)
+    FakeSession.runs = []
+    cache = PipelineResultCache()
+    for _ in range(2):
+        runner.execute_pipeline(
+            "pipelines", ".", {"data": data}, "persisted", cache=cache
+        )
+    assert FakeSession.runs == ["persisted", "persisted"]
+    assert len(cache) == 0
@@ -0,0 +1,32 @@
+import pandas as pd
+from kedro.framework.hooks import _create_hook_manager
+from kedro.io import DataCatalog
+from kedro.runner import SequentialRunner
+
+from pipelines import iris_agg_v2
+from shared.runner import CatalogInputsHooks
+
+
+def test_inputs_are_bound_without_copy():
+    iris = pd.DataFrame({"species": ["a", "a", "b"], "sepal_width": [1.0, 3.0, 5.0]})
+    hook_manager = _create_hook_manager()
+    hook_manager.register(CatalogInputsHooks({"iris_dataset": iris}))
+    catalog = DataCatalog(
+        feed_dict={
+            "params:agg.agg_columns": ["sepal_width"],
+            "params:agg.agg_params": ["mean"],
+            "params:agg.group_columns": ["species"],
+        }
+    )
+    hook_manager.hook.after_catalog_created(
+        catalog=catalog,
+        conf_catalog={},
+        conf_creds={},
+        feed_dict={},
+        save_version=None,
+        load_versions={},
+    )
+    assert catalog.load("iris_dataset") is iris
+
+    outputs = SequentialRunner().run(iris_agg_v2.create_pipeline(), catalog, hook_manager)
+    assert outputs["iris_aggregation"]["sepal_width_mean"].tolist() == [2.0, 5.0]